@@ -0,0 +1,126 @@
+import os
+import streamlit as st
+import pandas as pd
+import pyarrow as pa
+from snowflake_connector import run_query, run_query_arrow, source_version, ACCOUNT_TABLES, HISTORY_TABLES
+
+# --- ACCOUNT HISTORY SETTINGS ---
+LOOKUP_LIMIT = 50
+LOOKUP_CACHE_TTL = 600    # Cache lookups for 10 minutes (or until DIM_ACCOUNT changes)
+HISTORY_PAGE_SIZE = 100   # History rows per fetch; "load more" adds the next page
+HISTORY_CACHE_TTL = 600
+LOOKUP_COLUMNS = ['ACCOUNT_ID', 'NAME', 'FF_ID', 'SF_ID']
+
+# History is shown newest first, one HISTORY_PAGE_SIZE page at a time. By default
+# pages are LIMIT/OFFSET over EVENT_DATE DESC. Setting C360_HISTORY_KEY to a unique,
+# non-null column of ACCOUNT_HISTORY switches to keyset pages on (EVENT_DATE, key),
+# which don't rescan the skipped rows and stay stable when dates tie; count_history
+# checks that the key really is unique per account, since a repeated key skips rows.
+HISTORY_KEY = os.environ.get("C360_HISTORY_KEY") or None
+HISTORY_ORDER = f"EVENT_DATE DESC NULLS LAST, {HISTORY_KEY} DESC" if HISTORY_KEY else "EVENT_DATE DESC"
+
+# --- ACCOUNT LOOKUP ---
+def _lookup_filter(name, ff_id, sf_id):
+    """Returns: (where_clauses, params) - substring matches on each given input, bound rather than inlined"""
+    where_clauses = []
+    params = []
+
+    if name:
+        where_clauses.append("LOWER(NAME) LIKE %s")
+        params.append(f"%{name}%")
+    if ff_id:
+        where_clauses.append("FF_ID ILIKE %s")
+        params.append(f"%{ff_id}%")
+    if sf_id:
+        where_clauses.append("SF_ID ILIKE %s")
+        params.append(f"%{sf_id}%")
+
+    return where_clauses, params
+
+@st.cache_data(ttl=LOOKUP_CACHE_TTL)
+def _lookup(name, ff_id, sf_id, version=None) -> pd.DataFrame:
+    where_clauses, params = _lookup_filter(name, ff_id, sf_id)
+    sql = f"""
+        SELECT {', '.join(LOOKUP_COLUMNS)}
+        FROM PROD_DWH.DWH.DIM_ACCOUNT
+        WHERE {' AND '.join(where_clauses)}
+        ORDER BY NAME
+        LIMIT {LOOKUP_LIMIT}
+    """
+    return run_query(sql, tuple(params), name='account_lookup')
+
+def lookup_accounts(name='', ff_id='', sf_id='') -> pd.DataFrame:
+    """
+    Up to LOOKUP_LIMIT accounts matching every non-empty input, ordered by name.
+    Returns: DataFrame of ACCOUNT_ID, NAME, FF_ID, SF_ID (empty when no input is given)
+    """
+    name, ff_id, sf_id = ((value or '').strip() for value in (name, ff_id, sf_id))
+    if not (name or ff_id or sf_id):
+        return pd.DataFrame(columns=LOOKUP_COLUMNS)
+    return _lookup(name.lower(), ff_id, sf_id, source_version(ACCOUNT_TABLES))
+
+# --- HISTORY ---
+@st.cache_data(ttl=HISTORY_CACHE_TTL)
+def _history_count(account_id, version=None) -> int:
+    keys_sql = f', COUNT(DISTINCT {HISTORY_KEY}) AS "KEYS"' if HISTORY_KEY else ""
+    df = run_query(f"""
+        SELECT COUNT(*) AS "TOTAL"{keys_sql}
+        FROM PROD_DWH.DWH.ACCOUNT_HISTORY
+        WHERE ACCOUNT_ID = %s
+    """, (account_id,), name='history_count')
+    total = int(df['TOTAL'].iloc[0])
+    if HISTORY_KEY and int(df['KEYS'].iloc[0]) != total:
+        raise ValueError(f"ACCOUNT_HISTORY.{HISTORY_KEY} is not a unique, non-null key for account {account_id} "
+                         f"({int(df['KEYS'].iloc[0]):,} distinct of {total:,} rows) - set C360_HISTORY_KEY "
+                         f"to one that is, or unset it to page by OFFSET")
+    return total
+
+def _keyset_after(after):
+    """Returns: (sql, params) for rows past `after` - (EVENT_DATE, key) of the last loaded row - in HISTORY_ORDER"""
+    event_date, key = after
+    if event_date is None:
+        return f"(EVENT_DATE IS NULL AND {HISTORY_KEY} < %s)", [key]
+    return (f"(EVENT_DATE < %s OR (EVENT_DATE = %s AND {HISTORY_KEY} < %s) OR EVENT_DATE IS NULL)",
+            [event_date, event_date, key])
+
+@st.cache_data(ttl=HISTORY_CACHE_TTL)
+def _history_page(account_id, after=None, version=None) -> pa.Table:
+    keyset_sql, keyset_params = ("", []) if after is None else _keyset_after(after)
+    return run_query_arrow(f"""
+        SELECT *
+        FROM PROD_DWH.DWH.ACCOUNT_HISTORY
+        WHERE ACCOUNT_ID = %s
+          {f"AND {keyset_sql}" if keyset_sql else ""}
+        ORDER BY {HISTORY_ORDER}
+        LIMIT {HISTORY_PAGE_SIZE}
+    """, (account_id, *keyset_params), name='history')
+
+@st.cache_data(ttl=HISTORY_CACHE_TTL)
+def _history_offset_page(account_id, page: int, version=None) -> pa.Table:
+    return run_query_arrow(f"""
+        SELECT *
+        FROM PROD_DWH.DWH.ACCOUNT_HISTORY
+        WHERE ACCOUNT_ID = %s
+        ORDER BY {HISTORY_ORDER}
+        LIMIT {HISTORY_PAGE_SIZE} OFFSET {int(page) * HISTORY_PAGE_SIZE}
+    """, (account_id,), name='history')
+
+def count_history(account_id) -> int:
+    """Total history rows of an account. Raises ValueError when C360_HISTORY_KEY isn't unique for it"""
+    return _history_count(account_id, source_version(HISTORY_TABLES))
+
+def load_history(account_id, pages: int = 1) -> pa.Table:
+    """
+    The account's newest `pages` * HISTORY_PAGE_SIZE history rows. Each page is
+    fetched and cached on its own - keyed by the previous page's last row with
+    C360_HISTORY_KEY, else by page number - so loading more only queries the new page.
+    """
+    version = source_version(HISTORY_TABLES)
+    if not HISTORY_KEY:
+        tables = [_history_offset_page(account_id, page, version) for page in range(max(pages, 1))]
+        return pa.concat_tables(tables, promote_options="default")
+    tables = [_history_page(account_id, None, version)]
+    while len(tables) < pages and tables[-1].num_rows == HISTORY_PAGE_SIZE:
+        last = tables[-1].slice(tables[-1].num_rows - 1).to_pylist()[0]
+        tables.append(_history_page(account_id, (last['EVENT_DATE'], last[HISTORY_KEY]), version))
+    return pa.concat_tables(tables, promote_options="default")
@@ -0,0 +1,375 @@
+import os
+from typing import NamedTuple
+import numpy as np
+import streamlit as st
+import pandas as pd
+from snowflake_connector import (
+    run_query, run_query_arrow, get_identity_graph, pooled_connection, bind_id_list,
+    source_version, ACCOUNT_TABLES
+)
+from name_index import TrigramIndex
+from location_index import LocationIndex
+from result_transforms import rank_accounts, bin_map_points, MAP_BIN_COLUMNS
+from search_cache import SearchResultCache
+import query_trace
+
+# --- SEARCH SETTINGS ---
+RESULTS_PER_PAGE = 50
+SEARCH_CACHE_TTL = 600  # Cache search pages/counts for 10 minutes
+LOCAL_RESULT_LIMIT = 2000  # Results up to this size are fetched whole, cached and paged in memory
+SEARCH_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# --- TYPEAHEAD ---
+# A newer search in the same session cancels the one still running on the warehouse
+SEARCH_CANCEL_KEY = 'search'
+# Optional pause before querying a new term, so fast typists skip intermediate terms
+SEARCH_DEBOUNCE_SECONDS = float(os.environ.get("C360_SEARCH_DEBOUNCE", "0"))
+
+# --- LOCAL NAME INDEX (optional) ---
+USE_NAME_INDEX = os.environ.get("C360_NAME_INDEX", "0") == "1"
+NAME_INDEX_TTL = 3600  # Re-snapshot account names hourly
+
+# FF_IDs that have at least one AMP customer. The consolidated "1226698, 1794016"
+# lists themselves come from the in-memory identity graph, so the search no
+# longer LISTAGGs the whole dimension table on every keystroke.
+FF_WITH_AMP_CTE = """
+    ff_with_amp AS (
+        SELECT DISTINCT FF_ID
+        FROM PROD_DWH.DWH.DIM_ACCOUNT
+        WHERE AMP_AMPCUSTOMER_ID IS NOT NULL
+          AND FF_ID IS NOT NULL
+    )
+"""
+
+# Priority 1: Has all 3 IDs (Gamechanger + AMP Customer + Firefly)
+# Priority 2: Has Gamechanger + AMP Customer (no Firefly)
+# Priority 3: Has only Gamechanger
+# Priority 4: Everything else
+PRIORITY_SQL = """
+    CASE
+        WHEN NULLIF(TRIM("Gamechanger ID"), '') IS NULL THEN 4
+        WHEN NOT "_FF_HAS_AMP" AND COALESCE("_OWN_AMP_ID", 0) = 0 THEN 3
+        WHEN NULLIF(TRIM("Firefly ID"), '') IS NULL THEN 2
+        ELSE 1
+    END
+"""
+
+FILTER_OPTIONS_TTL = 3600
+
+class SearchKey(NamedTuple):
+    """One search: normalized name term ('' = no name filter) plus optional exact city/state"""
+    term: str
+    city: str = None
+    state: str = None
+
+def normalize_search_term(search_term: str) -> str:
+    """Cache key / LIKE pattern body for a search term"""
+    return search_term.strip().lower()
+
+def make_search_key(search_term: str, city=None, state=None) -> SearchKey:
+    """Terms under 2 characters don't filter by name"""
+    term = normalize_search_term(search_term)
+    return SearchKey(term if len(term) >= 2 else '', city or None, state or None)
+
+# LIKE escape character: '!' reads the same in Snowflake and DuckDB string literals (a backslash does not)
+_LIKE_ESCAPES = str.maketrans({'!': '!!', '%': '!%', '_': '!_'})
+
+def _like_contains(term: str) -> str:
+    """LIKE pattern (with ESCAPE '!') matching names that contain `term` literally"""
+    return f"%{term.translate(_LIKE_ESCAPES)}%"
+
+def _search_filter(key: SearchKey):
+    """
+    Returns: (where_clauses, params) pushing the name and location filters into DIM_ACCOUNT.
+    The name term is a literal substring, like the in-memory refinements and name index.
+    """
+    where_clauses = []
+    params = []
+
+    if key.term:
+        where_clauses.append("LOWER(a.NAME) LIKE %s ESCAPE '!'")
+        params.append(_like_contains(key.term))
+    if key.city:
+        where_clauses.append("a.CITY = %s")
+        params.append(key.city)
+    if key.state:
+        where_clauses.append("a.STATE = %s")
+        params.append(key.state)
+
+    return where_clauses, params
+
+def _matches_sql(where_clauses, params):
+    """
+    Ranked, de-duplicated matches for the given DIM_ACCOUNT predicates.
+    Returns: (sql, params) for a `matches` CTE with _PRIORITY and a unique _ROW_ID
+    (the smallest ACCOUNT_UUID behind each distinct display row) for keyset paging.
+    "AMP Customer ID" is filled in afterwards by consolidate_amp_ids().
+    """
+    where_sql = " AND ".join(where_clauses)
+
+    sql = f"""
+        WITH {FF_WITH_AMP_CTE},
+        grouped AS (
+            SELECT
+                a.SF_ACCOUNT18_ID__C AS "Gamechanger ID",
+                fa.FF_ID IS NOT NULL AS "_FF_HAS_AMP",
+                -- Own AMP ID only matters when the FF_ID has no consolidated list
+                IFF(fa.FF_ID IS NULL, CAST(a.AMP_AMPCUSTOMER_ID AS INTEGER), NULL) AS "_OWN_AMP_ID",
+                a.FF_ID AS "Firefly ID",
+                a.SF_PRIMARY_EMPLOYEE_NAME__C AS "Primary Employee",
+                a.NAME AS "Name",
+                a.ADDRESS AS "Address",
+                a.CITY AS "City",
+                a.STATE AS "State",
+                a.SF_ZIP__C AS "Zip",
+                a.SF_TF_PRIMARYDISTRIBUTORNAME__C AS "Primary Distributor",
+                a.SF_LARGELEVERAGEOPERATOR__C AS "LLO",
+                a.SF_GEOMARKET_NAME__C AS "Market",
+                a.SF_GEOZONE_NAME__C AS "Zone",
+                a.DS_LATITUDE AS "LATITUDE",
+                a.DS_LONGITUDE AS "LONGITUDE",
+                a.DS_ACCOUNT_TYPE AS "Account Type",
+                MIN(a.ACCOUNT_UUID) AS "_ROW_ID"
+            FROM PROD_DWH.DWH.DIM_ACCOUNT a
+            LEFT JOIN ff_with_amp fa
+                ON a.FF_ID = fa.FF_ID
+            WHERE {where_sql}
+            GROUP BY ALL
+        ),
+        matches AS (
+            SELECT g.*, {PRIORITY_SQL} AS "_PRIORITY"
+            FROM grouped g
+        )
+    """
+    return sql, list(params)
+
+@st.cache_resource
+def get_search_cache() -> SearchResultCache:
+    """Process-wide prefix-reuse cache of complete search results"""
+    cache = SearchResultCache(max_bytes=SEARCH_CACHE_MAX_BYTES, max_age=SEARCH_CACHE_TTL)
+    query_trace.register_cache('search_results', cache)
+    return cache
+
+def _search_version():
+    """DIM_ACCOUNT version; part of every search cache key so a load invalidates them"""
+    return source_version(ACCOUNT_TABLES)
+
+def get_name_index() -> TrigramIndex:
+    """Trigram index over a snapshot of every account name (rebuilt hourly or when DIM_ACCOUNT changes)"""
+    return _build_name_index(_search_version())
+
+@st.cache_resource(ttl=NAME_INDEX_TTL, max_entries=1)
+def _build_name_index(version) -> TrigramIndex:
+    snapshot = run_query_arrow("""
+        SELECT ACCOUNT_UUID, NAME
+        FROM PROD_DWH.DWH.DIM_ACCOUNT
+        WHERE NAME IS NOT NULL
+    """, cache_ttl=NAME_INDEX_TTL, tables=ACCOUNT_TABLES, name='name_index')
+    return TrigramIndex(
+        snapshot.column('ACCOUNT_UUID').to_numpy(zero_copy_only=False),
+        snapshot.column('NAME').to_numpy(zero_copy_only=False)
+    )
+
+def _fetch_all_matches(where_clauses, params, conn=None) -> pd.DataFrame:
+    """Every ranked match in one round trip (only used once the result is known to be small)"""
+    sql, params = _matches_sql(where_clauses, params)
+    df = run_query(sql + "SELECT * FROM matches", tuple(params), conn=conn, cancel_key=SEARCH_CANCEL_KEY,
+                   name='search_all')
+    return rank_accounts(consolidate_amp_ids(df)).reset_index(drop=True)
+
+def _index_matches(key: SearchKey):
+    """
+    Ranked matches resolved through the local name index.
+    Candidates come from posting-list intersection; only those rows are hydrated
+    from Snowflake (by ACCOUNT_UUID, no name scan), location filters applied there.
+    Returns: None when the index is disabled or the term is too broad to hydrate
+    """
+    if not USE_NAME_INDEX or not key.term:
+        return None
+
+    account_uuids = get_name_index().search(key.term).tolist()
+    if len(account_uuids) > LOCAL_RESULT_LIMIT:
+        return None
+    if not account_uuids:
+        return pd.DataFrame()
+
+    # One array-bound parameter: the statement text no longer varies with the candidate count
+    get_identity_graph()  # warm before borrowing, so ranking never waits on a second session
+    with pooled_connection() as conn:
+        id_sql, id_params = bind_id_list(conn, account_uuids)
+        where_clauses, params = _search_filter(key._replace(term=''))
+        return _fetch_all_matches([f"a.ACCOUNT_UUID IN {id_sql}"] + where_clauses, id_params + params, conn)
+
+def _local_matches(key: SearchKey):
+    """
+    The complete ranked result for a search, when it is small enough to hold in memory.
+    Tried in order: exact cache hit, local refinement of a cached result for a
+    broader search ("mar" -> "mari", or no state -> one state), the name index,
+    and finally one full fetch when the server-side count is at most LOCAL_RESULT_LIMIT.
+    Returns: None for broad searches - those are paged server-side instead
+    """
+    version = _search_version()
+    cache = get_search_cache()
+    cache.sync_version(version)
+
+    df = cache.get(key)
+    if df is None:
+        df = cache.refine(key)
+    if df is not None:
+        return df
+
+    df = _index_matches(key)
+    if df is None:
+        if _server_count(key, version) > LOCAL_RESULT_LIMIT:
+            return None
+        df = _fetch_all_matches(*_search_filter(key))
+
+    cache.put(key, df)
+    return df
+
+@st.cache_data(ttl=SEARCH_CACHE_TTL)
+def _server_count(key: SearchKey, version=None) -> int:
+    """Total number of ranked matches (one row back, not the whole result)"""
+    sql, params = _matches_sql(*_search_filter(key))
+    df = run_query(sql + 'SELECT COUNT(*) AS "TOTAL" FROM matches', tuple(params), cancel_key=SEARCH_CANCEL_KEY,
+                   name='search_count')
+    return int(df['TOTAL'].iloc[0]) if not df.empty else 0
+
+def count_search_results(key: SearchKey) -> int:
+    """Total number of ranked matches for a search"""
+    local = _local_matches(key)
+    if local is not None:
+        return len(local)
+    return _server_count(key, _search_version())
+
+@st.cache_data(ttl=SEARCH_CACHE_TTL)
+def _server_page(key: SearchKey, after, page_size: int, version=None) -> pd.DataFrame:
+    """One keyset page straight from Snowflake (broad searches only)"""
+    sql, params = _matches_sql(*_search_filter(key))
+
+    keyset_sql = ""
+    if after is not None:
+        keyset_sql = """
+            WHERE "_PRIORITY" > %s
+               OR ("_PRIORITY" = %s AND ("Name" > %s
+                   OR ("Name" = %s AND "_ROW_ID" > %s)))
+        """
+        priority, name, row_id = after
+        params = params + [priority, priority, name, name, row_id]
+
+    sql += f"""
+        SELECT *
+        FROM matches
+        {keyset_sql}
+        ORDER BY "_PRIORITY", "Name", "_ROW_ID"
+        LIMIT {int(page_size)}
+    """
+    return consolidate_amp_ids(run_query(sql, tuple(params), cancel_key=SEARCH_CANCEL_KEY, name='search_page'))
+
+def search_accounts_page(key: SearchKey, after=None, page_size: int = RESULTS_PER_PAGE) -> pd.DataFrame:
+    """
+    One page of ranked matches, ordered by (priority, name, row id).
+    `after` is the keyset cursor of the previous page's last row (None for page 1).
+    Returns: DataFrame including the _PRIORITY and _ROW_ID helper columns
+    """
+    local = _local_matches(key)
+    if local is not None:
+        start = 0
+        if after is not None:
+            hits = np.flatnonzero(local['_ROW_ID'].astype(str).to_numpy() == after[2])
+            start = int(hits[0]) + 1 if len(hits) else 0
+        return local.iloc[start:start + page_size]
+
+    return _server_page(key, after, page_size, _search_version())
+
+def consolidate_amp_ids(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Build the "AMP Customer ID" column from the identity graph:
+    every AMP ID under the row's FF_ID, or the row's own AMP ID when the FF_ID has none.
+    """
+    consolidated = get_identity_graph().consolidate_column(df['Firefly ID'])
+    own = df['_OWN_AMP_ID'].astype('Int64').astype(str).where(df['_OWN_AMP_ID'].notna(), None)
+    amp_ids = consolidated.where(consolidated.notna(), own)
+
+    out = df.drop(columns=['_FF_HAS_AMP', '_OWN_AMP_ID'])
+    out.insert(out.columns.get_loc('Gamechanger ID') + 1, 'AMP Customer ID', amp_ids.astype(object))
+    return out
+
+def page_cursor(page_df: pd.DataFrame):
+    """Keyset cursor (priority, name, row id) pointing just past the page's last row"""
+    last = page_df.iloc[-1]
+    return (int(last['_PRIORITY']), str(last['Name']), str(last['_ROW_ID']))
+
+MAP_COLUMNS = ["Name", "City", "State", "Market", "Zone", "LATITUDE", "LONGITUDE"]
+
+@st.cache_data(ttl=SEARCH_CACHE_TTL)
+def _server_map_points(key: SearchKey, version=None) -> pd.DataFrame:
+    sql, params = _matches_sql(*_search_filter(key))
+    sql += f"""
+        SELECT {', '.join(f'"{column}"' for column in MAP_COLUMNS)}
+        FROM matches
+        WHERE "LATITUDE" IS NOT NULL
+          AND "LONGITUDE" IS NOT NULL
+    """
+    return run_query(sql, tuple(params), cancel_key=SEARCH_CANCEL_KEY, name='search_map')
+
+def get_search_map_points(key: SearchKey) -> pd.DataFrame:
+    """Only the columns the Territory Map needs, for every match with coordinates"""
+    local = _local_matches(key)
+    if local is not None:
+        if local.empty:
+            return pd.DataFrame(columns=MAP_COLUMNS)
+        return local.loc[local['LATITUDE'].notna() & local['LONGITUDE'].notna(), MAP_COLUMNS]
+    return _server_map_points(key, _search_version())
+
+@st.cache_data(ttl=SEARCH_CACHE_TTL)
+def _server_map_bins(key: SearchKey, cell_degrees: float, version=None) -> pd.DataFrame:
+    """Grid-binned map markers aggregated in Snowflake - one row per occupied cell"""
+    sql, params = _matches_sql(*_search_filter(key))
+    sql += """
+        SELECT
+            AVG("LATITUDE") AS "LATITUDE",
+            AVG("LONGITUDE") AS "LONGITUDE",
+            COUNT(*) AS "COUNT",
+            MIN("Name") AS "Name"
+        FROM matches
+        WHERE "LATITUDE" IS NOT NULL
+          AND "LONGITUDE" IS NOT NULL
+        GROUP BY FLOOR("LATITUDE" / %s), FLOOR("LONGITUDE" / %s)
+    """
+    return run_query(sql, tuple(params + [cell_degrees, cell_degrees]), cancel_key=SEARCH_CANCEL_KEY,
+                     name='search_map_bins')
+
+def get_search_map_bins(key: SearchKey, cell_degrees: float) -> pd.DataFrame:
+    """
+    Map markers for broad searches: matches grouped into cell_degrees x cell_degrees
+    grid cells (centroid, count, first name) - binned in NumPy when the result is
+    held locally, in Snowflake otherwise. Only the markers travel, never every point.
+    """
+    local = _local_matches(key)
+    if local is not None:
+        if local.empty:
+            return pd.DataFrame(columns=MAP_BIN_COLUMNS)
+        return bin_map_points(local.loc[local['LATITUDE'].notna() & local['LONGITUDE'].notna()], cell_degrees)
+    return _server_map_bins(key, cell_degrees, _search_version())
+
+# --- LOCATION FILTER OPTIONS ---
+def get_location_index() -> LocationIndex:
+    """State -> city options for the filter (built on first use, rebuilt when DIM_ACCOUNT changes)"""
+    return _build_location_index(_search_version())
+
+@st.cache_resource(ttl=FILTER_OPTIONS_TTL, max_entries=1)
+def _build_location_index(version) -> LocationIndex:
+    options = run_query_arrow("""
+        SELECT DISTINCT CITY, STATE
+        FROM PROD_DWH.DWH.DIM_ACCOUNT
+        WHERE (FF_ID IS NOT NULL 
+               OR SF_ACCOUNT18_ID__C IS NOT NULL 
+               OR AMP_SOURCE_CUSTOMER_ID IS NOT NULL)
+          AND CITY IS NOT NULL 
+          AND STATE IS NOT NULL
+    """, cache_ttl=FILTER_OPTIONS_TTL, tables=ACCOUNT_TABLES, name='filter_options')
+    return LocationIndex(
+        options.column('STATE').to_numpy(zero_copy_only=False),
+        options.column('CITY').to_numpy(zero_copy_only=False)
+    )
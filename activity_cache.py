@@ -0,0 +1,135 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+import pandas as pd
+from freshness import is_fresh, expires_at
+
+# --- PER-ID ACTIVITY FRAME CACHE ---
+# The batch activity loaders cache one frame per account ID, so a batch that is
+# partly cached only queries Snowflake for the IDs it has not seen recently.
+# Stale-while-revalidate: past its TTL an entry is still served (up to
+# max_stale) while exactly one caller refreshes it in the background.
+# Entries hold the rows loaded so far - the first page, plus any pages "load
+# more" appended (extend) - with the account's total row count.
+
+class ActivityPage(NamedTuple):
+    """The leading rows of one account's activity, in display order"""
+    frame: pd.DataFrame
+    total: Optional[int]  # rows the account has in all (None when unknown)
+
+    @property
+    def complete(self) -> bool:
+        return self.total is not None and len(self.frame) >= self.total
+
+class ActivityFrameCache:
+    """
+    Thread-safe LRU of ActivityPages keyed by (source, account ID), bounded by
+    entry count, and by entry age or source-table version (see freshness.is_fresh).
+    Entries that only outlived their TTL (or FRESH_MAX_AGE, when version-tagged) are
+    served stale for up to `max_stale` seconds past that expiry (0 turns this off);
+    entries whose source tables changed never are.
+    """
+
+    def __init__(self, max_entries=5000, max_age=1800, max_stale=0):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.max_stale = max_stale
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (source, id) -> (ActivityPage, fetched_at, source version)
+        self._refreshing = set()       # (source, id) keys claimed by a background refresh
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def _servable_stale(self, entry, version, now) -> bool:
+        """An expired entry that may still be served while it is refreshed"""
+        _, fetched_at, stored_version = entry
+        if stored_version is not None and version is not None and stored_version != version:
+            return False  # a load changed its tables - never serve it
+        # Staleness counts from expiry - TTL for untagged entries, FRESH_MAX_AGE for tagged ones
+        return now - expires_at(fetched_at, stored_version, version, self.max_age) <= self.max_stale
+
+    def get_many(self, source, ids, version=None):
+        """
+        Look up several IDs of one source at once; `version` is the source tables' current version.
+        Returns: ({id: ActivityPage} for every servable hit, [ids still to fetch],
+                  [stale ids this caller has claimed and must refresh, then release()])
+        """
+        found, missing, refresh = {}, [], []
+        now = time.time()
+        with self._lock:
+            for account_id in ids:
+                key = (source, account_id)
+                entry = self._entries.get(key)
+                if entry is not None and not is_fresh(entry[1], entry[2], version, self.max_age):
+                    if not self._servable_stale(entry, version, now):
+                        del self._entries[key]
+                        entry = None
+                    else:
+                        self.stale_hits += 1
+                        if key not in self._refreshing:
+                            self._refreshing.add(key)
+                            refresh.append(account_id)
+                if entry is None:
+                    missing.append(account_id)
+                    continue
+                self._entries.move_to_end(key)
+                found[account_id] = entry[0]
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing, refresh
+
+    def release(self, source, ids):
+        """Drop refresh claims (after the refresh stored its frames, or failed)"""
+        with self._lock:
+            for account_id in ids:
+                self._refreshing.discard((source, account_id))
+
+    def put_many(self, source, pages: dict, version=None):
+        """
+        Store freshly fetched first pages, tagged with the source version read before the fetch.
+        Evicts least-recently-used entries past max_entries.
+        """
+        now = time.time()
+        with self._lock:
+            for account_id, page in pages.items():
+                key = (source, account_id)
+                self._entries[key] = (page, now, version)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def extend(self, source, account_id, base: ActivityPage, rows: pd.DataFrame, total=None) -> ActivityPage:
+        """
+        Append the rows fetched after `base` (a page get_many returned) to its entry,
+        keeping the entry's age and version; `total` replaces the page's row count if given.
+        If the entry moved on meanwhile - another caller extended it, or it was
+        refreshed or evicted - it is left alone.
+        Returns: `base` with `rows` appended, or the entry when it already covers them
+        """
+        frame = pd.concat([base.frame, rows], ignore_index=True) if len(rows) else base.frame
+        extended = ActivityPage(frame, base.total if total is None else total)
+        key = (source, account_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return extended
+            if entry[0] is base:
+                self._entries[key] = (extended, entry[1], entry[2])
+                return extended
+            if len(entry[0].frame) >= len(extended.frame) and entry[0].total == base.total:
+                return entry[0]
+        return extended
+
+    def stats(self) -> dict:
+        """Returns: entry count and hit/stale-hit/miss counters"""
+        with self._lock:
+            return {
+                'entries': len(self._entries), 'hits': self.hits,
+                'stale_hits': self.stale_hits, 'misses': self.misses
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,152 @@
+import argparse
+import json
+import logging
+import os
+import statistics
+import time
+import synthetic_data
+
+# --- OFFLINE BENCHMARKS ---
+# Times the search page's data paths end to end - name search, the activity
+# indicators (check_activity_exists) and opening an account
+# (load_activities_parallel) - against the local DuckDB backend, so changes can
+# be measured without production Snowflake. Usage:
+#     python benchmarks.py --accounts 1000000 --repeat 5 [--json results.json]
+#
+# Every case runs once cold (all Streamlit caches cleared, so identity graph,
+# activity index and per-ID caches are rebuilt) and `repeat` times warm.
+# The disk cache is off unless --disk-cache is given.
+
+DEFAULT_ACCOUNTS = 100_000
+DEFAULT_REPEAT = 5
+# (label, term, city, state): broad, medium and narrow name terms, and a location-filtered one
+SEARCH_CASES = (
+    ('broad', 'grill', None, None),
+    ('medium', 'blue gr', None, None),
+    ('narrow', "mario's pizzeria llc", None, None),
+    ('state', 'cafe', None, 'TX'),
+)
+
+def _configure_backend(db_path, disk_cache):
+    """Point snowflake_connector at the local file - before it is first imported"""
+    os.environ['C360_BACKEND'] = 'local'
+    os.environ['C360_LOCAL_DB'] = db_path
+    if not disk_cache:
+        os.environ['C360_DISK_CACHE'] = '0'
+    # Outside `streamlit run` every cache call warns about the missing script context.
+    # Streamlit sets a level on each of its module loggers, so the parent's level
+    # doesn't reach them - drop warnings process-wide instead (errors still show).
+    logging.disable(logging.WARNING)
+
+def _clear_caches():
+    import streamlit as st
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+def _timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - started) * 1000, result
+
+def run_case(name, fn, repeat, detail=None):
+    """
+    Time `fn` once on cold caches and `repeat` times warm.
+    Returns: {'case', 'cold_ms', 'warm_p50_ms', 'warm_max_ms', 'detail'}
+    """
+    _clear_caches()
+    cold_ms, result = _timed(fn)
+    warm = [_timed(fn)[0] for _ in range(repeat)]
+    return {
+        'case': name,
+        'cold_ms': round(cold_ms, 1),
+        'warm_p50_ms': round(statistics.median(warm), 1) if warm else None,
+        'warm_max_ms': round(max(warm), 1) if warm else None,
+        'detail': detail(result) if detail else '',
+    }
+
+def _activity_workload(run_query):
+    """Accounts to open: a typical one and the one with the most activity rows"""
+    heaviest = run_query("""
+        SELECT a.SF_ACCOUNT18_ID__C AS "SF_ID", MAX(a.AMP_AMPCUSTOMER_ID) AS "AMP_ID", COUNT(*) AS "ROWS"
+        FROM PROD_DWH.DWH.DIM_ACCOUNT a
+        JOIN PROD_DWH.DWH.DIM_PRODUCTACTIVITY p
+            ON a.ACCOUNT_UUID = p.ACCOUNT_OPPERATOR_UUID
+        WHERE a.SF_ACCOUNT18_ID__C IS NOT NULL
+        GROUP BY a.SF_ACCOUNT18_ID__C
+        ORDER BY "ROWS" DESC
+        LIMIT 1
+    """)
+    typical = run_query("""
+        SELECT SF_ACCOUNT18_ID__C AS "SF_ID", AMP_AMPCUSTOMER_ID AS "AMP_ID"
+        FROM PROD_DWH.DWH.DIM_ACCOUNT
+        WHERE SF_ACCOUNT18_ID__C IS NOT NULL
+          AND AMP_AMPCUSTOMER_ID IS NOT NULL
+        ORDER BY ACCOUNT_UUID
+        LIMIT 1
+    """)
+    return {
+        'typical': (typical['SF_ID'].iloc[0], typical['AMP_ID'].iloc[0]),
+        'heaviest': (heaviest['SF_ID'].iloc[0], heaviest['AMP_ID'].iloc[0]),
+    }
+
+def run_benchmarks(repeat=DEFAULT_REPEAT) -> list:
+    """Run every case against the configured backend. Returns: one result row per case"""
+    from snowflake_connector import run_query, check_activity_exists, load_activities_parallel
+    from account_search import make_search_key, count_search_results, search_accounts_page, page_cursor
+
+    results = []
+    first_pages = {}
+    for label, term, city, state in SEARCH_CASES:
+        key = make_search_key(term, city, state)
+
+        def search(key=key):
+            total = count_search_results(key)
+            return total, search_accounts_page(key)
+
+        results.append(run_case(f'search:{label}', search, repeat,
+                                lambda r: f'{r[0]:,} matches, {len(r[1])} on page 1'))
+        first_pages[label] = search()[1]
+
+        if len(first_pages[label]):
+            cursor = page_cursor(first_pages[label])
+            results.append(run_case(f'search_page2:{label}', lambda key=key, cursor=cursor: search_accounts_page(key, cursor),
+                                    repeat, lambda page: f'{len(page)} rows'))
+
+    page = first_pages['broad']
+    account_ids = [{'sf_id': row['Gamechanger ID'], 'amp_id': row['AMP Customer ID']} for _, row in page.iterrows()]
+    results.append(run_case('check_activity_exists', lambda: check_activity_exists(account_ids), repeat,
+                            lambda r: f"{sum(v['has_sf'] or v['has_amp'] for v in r.values())} of {len(r)} IDs active"))
+
+    for label, (sf_id, amp_id) in _activity_workload(run_query).items():
+        results.append(run_case(f'load_activities:{label}', lambda sf_id=sf_id, amp_id=amp_id: load_activities_parallel(sf_id, amp_id),
+                                repeat, lambda r: f'{len(r[0])} SF rows, {len(r[1])} AMP rows'))
+    return results
+
+def format_results(results) -> str:
+    lines = [f"{'case':<30}{'cold ms':>10}{'warm p50':>10}{'warm max':>10}  detail"]
+    for row in results:
+        warm_p50 = '-' if row['warm_p50_ms'] is None else f"{row['warm_p50_ms']:.1f}"
+        warm_max = '-' if row['warm_max_ms'] is None else f"{row['warm_max_ms']:.1f}"
+        lines.append(f"{row['case']:<30}{row['cold_ms']:>10.1f}{warm_p50:>10}{warm_max:>10}  {row['detail']}")
+    return '\n'.join(lines)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the search page data paths on a synthetic warehouse')
+    parser.add_argument('--accounts', type=int, default=DEFAULT_ACCOUNTS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db', default=None, help='DuckDB file (default: c360_bench_<accounts>.duckdb)')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--disk-cache', action='store_true', help='leave the on-disk result cache enabled')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    db_path = args.db or f'c360_bench_{args.accounts}.duckdb'
+    synthetic_data.ensure(db_path, args.accounts, args.seed)
+    _configure_backend(db_path, args.disk_cache)
+
+    results = run_benchmarks(args.repeat)
+    print(f"\n{args.accounts:,} accounts, seed {args.seed}, {args.repeat} warm runs per case\n")
+    print(format_results(results))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'accounts': args.accounts, 'seed': args.seed, 'results': results}, f, indent=2)
@@ -0,0 +1,53 @@
+import os
+import streamlit as st
+
+# --- QUERY DIAGNOSTICS PANEL ---
+# Sidebar view of the statements behind the current rerun (see query_trace):
+# a waterfall of connect / execute / fetch per statement plus the raw numbers.
+# Off unless C360_DIAGNOSTICS=1, so it can be switched on in production for a
+# slow page without attaching a profiler.
+DIAGNOSTICS_ENABLED = os.environ.get("C360_DIAGNOSTICS", "0") == "1"
+PHASE_COLORS = {'connect': '#00a3e0', 'execute': '#003366', 'fetch': '#7fb3d5'}
+TABLE_COLUMNS = ['name', 'start_ms', 'total_ms', 'connect_ms', 'execute_ms', 'fetch_ms', 'rows', 'bytes',
+                 'cache', 'query_id', 'thread', 'error', 'sql']
+
+def waterfall_figure(rows):
+    """Horizontal bars per statement: connect, execute and fetch laid end to end from its start"""
+    import plotly.graph_objects as go
+
+    labels = [f"{i + 1}. {row['name']}" for i, row in enumerate(rows)]
+    offsets = [row['start_ms'] for row in rows]
+    fig = go.Figure()
+    for phase, color in PHASE_COLORS.items():
+        widths = [row[f'{phase}_ms'] for row in rows]
+        fig.add_bar(y=labels, x=widths, base=offsets, orientation='h', name=phase, marker_color=color,
+                    hovertemplate='%{y}<br>' + phase + ': %{x:.1f} ms<extra></extra>')
+        offsets = [offset + width for offset, width in zip(offsets, widths)]
+    fig.update_layout(
+        barmode='overlay',
+        height=max(160, 28 * len(rows) + 80),
+        margin={"r": 0, "t": 0, "l": 0, "b": 0},
+        xaxis_title='ms since rerun start',
+        legend={'orientation': 'h', 'y': -0.25}
+    )
+    fig.update_yaxes(autorange='reversed')
+    return fig
+
+def render_query_diagnostics(trace):
+    """Sidebar panel for one RerunTrace; call at the end of the page script"""
+    if not DIAGNOSTICS_ENABLED or trace is None:
+        return
+    duration_ms = trace.duration_ms if trace.duration_ms is not None else trace.finish()
+    rows = [record.to_dict(trace.started) for record in trace.records()]
+    sent = [row for row in rows if row['cache'] not in ('disk', 'memory')]
+
+    with st.sidebar.expander("🩺 Query diagnostics", expanded=False):
+        st.caption(
+            f"Rerun {duration_ms:,.0f} ms · {len(sent)} statement(s) sent, "
+            f"{len(rows) - len(sent)} cache hit(s) · {sum(row['total_ms'] for row in sent):,.0f} ms in queries"
+        )
+        if not rows:
+            st.write("No statements in this rerun.")
+            return
+        st.plotly_chart(waterfall_figure(rows), use_container_width=True)
+        st.dataframe([{column: row[column] for column in TABLE_COLUMNS} for row in rows], hide_index=True)
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+from freshness import is_fresh
+
+# --- PERSISTENT QUERY RESULT CACHE ---
+# Query results stored as zstd-compressed Arrow IPC files on local disk, so a
+# restart, a redeploy or an extra replica on the same host starts warm.
+# Files are written to a temp name and renamed into place, so concurrent
+# readers in other processes only ever see complete files.
+# Results are customer data: the directory is private to the app's user (0700,
+# and it must be ours) and entries are written 0600.
+
+_FETCHED_AT = b'c360.fetched_at'
+_SOURCE_VERSION = b'c360.source_version'
+_SUFFIX = '.arrow'
+_TEMP_MAX_AGE = 3600  # Abandoned temp files (crashed writers) are removed after this
+
+def statement_fingerprint(query: str, params=None) -> str:
+    """Stable cache key: whitespace-normalized SQL text plus its parameters"""
+    text = ' '.join(query.split())
+    payload = json.dumps([text, list(params) if params is not None else None], default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _private_directory(directory):
+    """Create `directory` as 0700, or tighten an existing one; raises PermissionError if another user owns it"""
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if not hasattr(os, 'getuid'):
+        return  # No POSIX owners or modes (Windows) - the user profile directory is private already
+    info = os.stat(directory)
+    if info.st_uid != os.getuid():
+        raise PermissionError(f"Cache directory {directory} belongs to another user")
+    if info.st_mode & 0o077:
+        os.chmod(directory, 0o700)
+
+class DiskResultCache:
+    """
+    Size-bounded LRU of Arrow tables in one directory, shared by every process using it.
+    Entry age and source-table version come from the file's metadata (validity);
+    recency from its mtime, which every hit bumps (LRU eviction).
+    """
+
+    def __init__(self, directory, max_bytes=1024 * 1024 * 1024, evict_every=50):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        _private_directory(directory)
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key) -> str:
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def get(self, key, max_age, version=None):
+        """
+        `version` is the current version of the entry's source tables (see freshness.is_fresh).
+        Returns: the cached pa.Table, or None when missing, unreadable or no longer valid
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                table = ipc.open_file(f).read_all()
+        except (OSError, pa.ArrowException):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        metadata = dict(table.schema.metadata or {})
+        fetched_at = float(metadata.pop(_FETCHED_AT, b'0'))
+        stored_version = metadata.pop(_SOURCE_VERSION, None)
+        stored_version = int(stored_version) if stored_version else None
+        if not is_fresh(fetched_at, stored_version, version, max_age):
+            self._remove(path)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        try:
+            os.utime(path)  # LRU recency
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return table.replace_schema_metadata(metadata or None)
+
+    def put(self, key, data, version=None):
+        """
+        Store a pa.Table or DataFrame, tagged with its source tables' version when known. Best effort - a result that cannot be
+        converted or written (disk full, odd object column) is simply not cached.
+        """
+        try:
+            table = pa.Table.from_pandas(data, preserve_index=False) if isinstance(data, pd.DataFrame) else data
+            metadata = dict(table.schema.metadata or {})
+            metadata[_FETCHED_AT] = repr(time.time()).encode()
+            if version is not None:
+                metadata[_SOURCE_VERSION] = str(version).encode()
+            table = table.replace_schema_metadata(metadata)
+
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')  # created 0600
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    options = ipc.IpcWriteOptions(compression='zstd')
+                    with ipc.new_file(f, table.schema, options=options) as writer:
+                        writer.write_table(table)
+                os.replace(temp_path, self._path(key))
+            except BaseException:
+                self._remove(temp_path)
+                raise
+        except Exception:
+            return
+
+        with self._lock:
+            self._puts += 1
+            evict = (self._puts - 1) % self.evict_every == 0  # first put, then every evict_every-th
+        if evict:
+            self.evict()
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _entries(self):
+        """[(mtime, size, path)] for every cache file; removes abandoned temp files"""
+        entries = []
+        now = time.time()
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if entry.name.endswith(_SUFFIX):
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                elif entry.name.endswith('.tmp') and now - stat.st_mtime > _TEMP_MAX_AGE:
+                    self._remove(entry.path)
+        return entries
+
+    def evict(self):
+        """Delete least-recently-used files until the directory fits in max_bytes"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def stats(self) -> dict:
+        """Returns: file count, bytes on disk and this process's hit/miss counters"""
+        entries = self._entries()
+        with self._lock:
+            return {
+                'entries': len(entries), 'bytes': sum(size for _, size, _ in entries),
+                'hits': self.hits, 'misses': self.misses
+            }
+
+    def clear(self):
+        for _, _, path in self._entries():
+            self._remove(path)
@@ -0,0 +1,77 @@
+import threading
+import time
+
+# --- SOURCE TABLE FRESHNESS ---
+# Cached results are tagged with the version of the tables they read (the
+# newest LAST_ALTERED among them). An entry stays valid while that version is
+# unchanged - up to FRESH_MAX_AGE instead of the short wall-clock TTL - and is
+# dropped as soon as a load alters one of its tables.
+
+FRESH_MAX_AGE = 12 * 3600  # Hard cap for entries whose source tables have not changed
+
+def expires_at(fetched_at, stored_version, current_version, ttl) -> float:
+    """
+    When an entry stops being fresh (epoch seconds) - FRESH_MAX_AGE after fetching for
+    tagged entries, `ttl` after for untagged ones. Says nothing about version changes.
+    """
+    if stored_version is not None and current_version is not None:
+        return fetched_at + FRESH_MAX_AGE
+    return fetched_at + ttl
+
+def is_fresh(fetched_at, stored_version, current_version, ttl) -> bool:
+    """
+    Validity rule shared by every cache tier.
+    Tagged entries: valid while their tables' version is unchanged (up to FRESH_MAX_AGE).
+    Untagged entries, or no probe result yet: the plain `ttl`.
+    """
+    if stored_version is not None and current_version is not None and stored_version != current_version:
+        return False
+    return time.time() <= expires_at(fetched_at, stored_version, current_version, ttl)
+
+class TableVersions:
+    """
+    Last-altered timestamps of the source tables, refreshed by `probe_fn`
+    (-> {table name: epoch milliseconds}) at most every `probe_interval` seconds.
+    Only the very first lookup waits for a probe; later stale lookups return the
+    previous snapshot while one background probe refreshes it.
+    """
+
+    def __init__(self, probe_fn, probe_interval=60):
+        self._probe_fn = probe_fn
+        self.probe_interval = probe_interval
+        self._lock = threading.Lock()
+        self._versions = None  # {table: last altered ms}, None until the first successful probe
+        self._probed_at = 0.0
+        self._probing = False
+
+    def _probe(self):
+        try:
+            versions = self._probe_fn()
+        except Exception:
+            versions = None  # keep the last snapshot; entries fall back to their TTLs if there is none
+        with self._lock:
+            if versions is not None:
+                self._versions = versions
+            self._probed_at = time.time()
+            self._probing = False
+
+    def snapshot(self) -> dict:
+        """Returns: {table: last altered ms} (empty when no probe has succeeded)"""
+        with self._lock:
+            due = time.time() - self._probed_at > self.probe_interval and not self._probing
+            first = self._versions is None and self._probed_at == 0.0
+            if due:
+                self._probing = True
+        if due and first:
+            self._probe()
+        elif due:
+            threading.Thread(target=self._probe, name='table-version-probe', daemon=True).start()
+        with self._lock:
+            return dict(self._versions or {})
+
+    def version(self, tables):
+        """Version token for a set of tables: their newest last-altered time, or None if unknown"""
+        versions = self.snapshot()
+        if not tables or any(table not in versions for table in tables):
+            return None
+        return max(versions[table] for table in tables)
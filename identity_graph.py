@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+# --- FF_ID <-> AMP CUSTOMER IDENTITY GRAPH ---
+# In-memory replacement for the DIM_ACCOUNT self-joins / LISTAGG that used to
+# resolve related AMP customers on every query. Stored as two CSR adjacency
+# structures (FF group -> AMP IDs, AMP ID -> FF groups) over sorted int arrays.
+
+class IdentityGraph:
+    """
+    Bipartite FF_ID <-> AMP_AMPCUSTOMER_ID graph.
+    Two AMP IDs are related when they share an FF_ID (one hop - the same
+    semantics as the a1.FF_ID = a2.FF_ID self-join it replaces).
+    """
+
+    def __init__(self, ff_ids, amp_ids):
+        ff_codes, ff_keys = pd.factorize(pd.Series(ff_ids, dtype=object), sort=True)
+        amp_ids = np.asarray(amp_ids, dtype=np.int64)
+
+        # Drop duplicate edges, then sort by (FF group, AMP ID)
+        edges = np.unique(np.column_stack([ff_codes.astype(np.int64), amp_ids]), axis=0) \
+            if len(amp_ids) else np.empty((0, 2), dtype=np.int64)
+        edge_ff, edge_amp = edges[:, 0], edges[:, 1]
+
+        # FF group -> AMP IDs (already sorted by AMP within each group)
+        self._ff_index = pd.Index(ff_keys)
+        self._ff_offsets = np.searchsorted(edge_ff, np.arange(len(ff_keys) + 1))
+        self._ff_members = edge_amp
+
+        # AMP ID -> FF groups
+        by_amp = np.argsort(edge_amp, kind='stable')
+        self._amp_keys, amp_starts = np.unique(edge_amp[by_amp], return_index=True)
+        self._amp_offsets = np.append(amp_starts, len(by_amp))
+        self._amp_groups = edge_ff[by_amp]
+
+        self.edge_count = len(edge_amp)
+
+    def _group_code(self, ff_id) -> int:
+        if ff_id is None or pd.isna(ff_id):
+            return -1
+        return self._ff_index.get_indexer([ff_id])[0]
+
+    def amp_ids_for_ff(self, ff_id) -> np.ndarray:
+        """Sorted AMP customer IDs that belong to an FF_ID (empty if none)"""
+        code = self._group_code(ff_id)
+        if code < 0:
+            return self._ff_members[:0]
+        return self._ff_members[self._ff_offsets[code]:self._ff_offsets[code + 1]]
+
+    def consolidated_amp_ids(self, ff_id):
+        """
+        "1226698, 1794016" for an FF_ID - same format as the old LISTAGG.
+        Returns None when the FF_ID has no AMP customers.
+        """
+        members = self.amp_ids_for_ff(ff_id)
+        if len(members) == 0:
+            return None
+        return ', '.join(map(str, members.tolist()))
+
+    def related_amp_ids(self, amp_id) -> np.ndarray:
+        """
+        Every AMP ID sharing an FF_ID with `amp_id` (including itself).
+        Empty when the AMP ID has no FF_ID, matching the old self-join.
+        """
+        amp_id = int(amp_id)
+        pos = np.searchsorted(self._amp_keys, amp_id)
+        if pos >= len(self._amp_keys) or self._amp_keys[pos] != amp_id:
+            return self._ff_members[:0]
+
+        groups = self._amp_groups[self._amp_offsets[pos]:self._amp_offsets[pos + 1]]
+        if len(groups) == 1:
+            code = groups[0]
+            return self._ff_members[self._ff_offsets[code]:self._ff_offsets[code + 1]]
+        return np.unique(np.concatenate([
+            self._ff_members[self._ff_offsets[code]:self._ff_offsets[code + 1]] for code in groups
+        ]))
+
+    def related_amp_map(self, amp_ids) -> dict:
+        """Returns: {original AMP ID: array of related AMP IDs} for several IDs at once"""
+        return {int(amp_id): self.related_amp_ids(amp_id) for amp_id in amp_ids}
+
+    def consolidate_column(self, ff_ids: pd.Series) -> pd.Series:
+        """Vectorized consolidated_amp_ids over a column of FF_IDs (None where no AMP)"""
+        lookup = {ff_id: self.consolidated_amp_ids(ff_id) for ff_id in ff_ids.dropna().unique()}
+        return ff_ids.map(lookup).astype(object).where(ff_ids.notna(), None)
@@ -0,0 +1,322 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import threading
+import time
+import traceback
+from collections import Counter
+import numpy as np
+import synthetic_data
+
+# --- CONCURRENT SESSION LOAD TEST ---
+# Simulates N sales reps on one replica: each session is a thread that replays
+# what a rerun of 1_Search_By_Name_city.py asks the server for - search (count,
+# territory map, first page, activity indicators), paging, then opening an
+# account's activity - against the local DuckDB
+# backend, optionally with recorded warehouse latencies added (stub mode).
+# Usage:
+#     python load_test.py --sessions 40 --iterations 5 [--latency-profile prod_latency.json]
+#     python load_test.py --sessions 80 --processes 2   # two replicas of 40 sessions
+#
+# Sessions call the page's data layer directly: streamlit.testing's AppTest
+# cannot run several scripts concurrently in one process, and widget rendering
+# is not what limits a replica. Every process starts with cold caches, like a
+# fresh replica.
+
+DEFAULT_SESSIONS = 20
+DEFAULT_ITERATIONS = 3
+DEFAULT_THINK = 1.0     # Mean pause between a session's steps (seconds, exponential)
+SAMPLE_INTERVAL = 0.05  # Pool / memory sampling period (seconds)
+STEPS = ('search', 'paginate', 'open_activity', 'flow')
+# (term, city, state, weight): what reps type, broad prefixes to exact names
+SEARCH_MIX = (
+    ('grill', None, None, 3),
+    ('blue', None, None, 2),
+    ('cafe', None, 'TX', 2),
+    ('mario', None, None, 2),
+    ("rosa's bakery", None, None, 1),
+    ('school district', None, None, 1),
+)
+
+def _configure_backend(db_path, latency_profile):
+    """Point snowflake_connector at the local file - before it is first imported"""
+    os.environ['C360_BACKEND'] = 'local'
+    os.environ['C360_LOCAL_DB'] = db_path
+    os.environ['C360_DISK_CACHE'] = '0'
+    if latency_profile:
+        os.environ['C360_LOCAL_LATENCY'] = os.path.abspath(latency_profile)
+    # Missing-script-context warnings from every cache call; errors still show
+    logging.disable(logging.WARNING)
+
+def _rss_mb() -> float:
+    """Current resident set size of this process (Linux), else its peak"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class ReplicaMonitor:
+    """Samples the connection pool and memory of this process in the background"""
+
+    def __init__(self, pool, interval=SAMPLE_INTERVAL):
+        self._pool = pool
+        self._interval = interval
+        self._stop = threading.Event()
+        self.peak_connections = 0
+        self.peak_in_use = 0
+        self.peak_rss_mb = _rss_mb()
+        self.samples = 0
+        self.saturated = 0  # samples with every session of a full pool checked out
+        self._thread = threading.Thread(target=self._run, name='load-monitor', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            stats = self._pool.stats()
+            self.peak_connections = max(self.peak_connections, stats['size'])
+            self.peak_in_use = max(self.peak_in_use, stats['in_use'])
+            self.peak_rss_mb = max(self.peak_rss_mb, _rss_mb())
+            self.samples += 1
+            if stats['in_use'] >= self._pool.max_size:
+                self.saturated += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+class SimulatedSession:
+    """One rep: search -> page through results -> open an account, `iterations` times"""
+
+    def __init__(self, number, iterations, pages, think, include_map, seed):
+        self.number = number
+        self.iterations = iterations
+        self.pages = pages
+        self.think = think
+        self.include_map = include_map
+        self.rng = random.Random(seed * 100_003 + number)
+        self.timings = {step: [] for step in STEPS}
+        self.errors = {step: 0 for step in STEPS}
+        self.error_types = {step: Counter() for step in STEPS}  # exception class name -> count
+        self.first_traceback = {}                                # step -> traceback of its first error
+
+    def _pause(self):
+        if self.think > 0:
+            time.sleep(self.rng.expovariate(1 / self.think))
+
+    def _step(self, step, fn):
+        started = time.perf_counter()
+        try:
+            result = fn()
+        except Exception as e:
+            self.errors[step] += 1
+            self.error_types[step][type(e).__name__] += 1
+            self.first_traceback.setdefault(step, traceback.format_exc())
+            raise
+        self.timings[step].append((time.perf_counter() - started) * 1000)
+        return result
+
+    def _indicators(self, page_df):
+        """The page's green-circle lookup (in-memory activity index)"""
+        from snowflake_connector import check_activity_exists
+        from result_transforms import activity_lookup_ids
+
+        check_activity_exists(activity_lookup_ids(page_df))
+
+    def _show_page(self, key, cursor):
+        from account_search import search_accounts_page, page_cursor
+
+        page_df = search_accounts_page(key, cursor)
+        next_cursor = page_cursor(page_df) if not page_df.empty else None
+        if not page_df.empty:
+            self._indicators(page_df)
+        return page_df, next_cursor
+
+    def _search(self, key):
+        from account_search import count_search_results
+
+        total = count_search_results(key)
+        if total and self.include_map:
+            from territory_map import get_territory_figure
+            get_territory_figure(key, total)
+        page_df, next_cursor = self._show_page(key, None)
+        return page_df, next_cursor
+
+    def _open_activity(self, page_df):
+        from snowflake_connector import load_activities_parallel
+
+        candidates = page_df[page_df['Gamechanger ID'].notna() | page_df['AMP Customer ID'].notna()]
+        if candidates.empty:
+            return None
+        row = candidates.iloc[self.rng.randrange(len(candidates))]
+        return load_activities_parallel(row['Gamechanger ID'], row['AMP Customer ID'])
+
+    def run(self):
+        from account_search import make_search_key
+
+        terms = [case[:3] for case in SEARCH_MIX]
+        weights = [case[3] for case in SEARCH_MIX]
+        for _ in range(self.iterations):
+            key = make_search_key(*self.rng.choices(terms, weights)[0])
+            flow_started = time.perf_counter()
+            try:
+                page_df, cursor = self._step('search', lambda: self._search(key))
+                for _ in range(self.pages):
+                    if cursor is None:
+                        break
+                    self._pause()
+                    page_df, cursor = self._step('paginate', lambda cursor=cursor: self._show_page(key, cursor))
+                self._pause()
+                self._step('open_activity', lambda page_df=page_df: self._open_activity(page_df))
+            except Exception as e:
+                # The step that raised kept its traceback; the flow just counts as failed
+                self.errors['flow'] += 1
+                self.error_types['flow'][type(e).__name__] += 1
+                continue
+            self.timings['flow'].append((time.perf_counter() - flow_started) * 1000)
+            self._pause()
+
+def run_replica(db_path, sessions, iterations=DEFAULT_ITERATIONS, pages=2, think=DEFAULT_THINK,
+                include_map=True, ramp=0.0, seed=0, latency_profile=None, replica=0) -> dict:
+    """
+    Run `sessions` concurrent simulated sessions in this process (one replica).
+    Returns: latency samples per step (ms), error counts, pool and memory peaks
+    """
+    _configure_backend(db_path, latency_profile)
+    from snowflake_connector import get_connection_pool
+
+    pool = get_connection_pool()
+    monitor = ReplicaMonitor(pool)
+    monitor.start()
+    simulated = [SimulatedSession(replica * sessions + i, iterations, pages, think, include_map, seed)
+                 for i in range(sessions)]
+    threads = [threading.Thread(target=session.run, name=f'session-{session.number}') for session in simulated]
+    started = time.perf_counter()
+    for i, thread in enumerate(threads):
+        if ramp > 0 and i:
+            time.sleep(ramp / sessions)
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    monitor.stop()
+
+    return {
+        'replica': replica,
+        'sessions': sessions,
+        'elapsed_s': round(elapsed, 2),
+        'timings': {step: [t for session in simulated for t in session.timings[step]] for step in STEPS},
+        'errors': {step: sum(session.errors[step] for session in simulated) for step in STEPS},
+        'error_types': {step: dict(sum((session.error_types[step] for session in simulated), Counter()))
+                        for step in STEPS},
+        'first_tracebacks': _first_tracebacks(simulated),
+        'pool_max_size': pool.max_size,
+        'peak_connections': monitor.peak_connections,
+        'peak_in_use': monitor.peak_in_use,
+        'pool_saturated_pct': round(100 * monitor.saturated / max(monitor.samples, 1), 1),
+        'peak_rss_mb': round(max(monitor.peak_rss_mb, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024), 1),
+    }
+
+def _first_tracebacks(simulated) -> dict:
+    """Returns: {step: traceback} of the earliest-numbered session's first error in each step"""
+    tracebacks = {}
+    for session in simulated:
+        for step, text in session.first_traceback.items():
+            tracebacks.setdefault(step, text)
+    return tracebacks
+
+def _replica_worker(kwargs):
+    return run_replica(**kwargs)
+
+def run_load_test(db_path, sessions, processes=1, **options) -> list:
+    """Spread `sessions` over `processes` replicas (fresh interpreters). Returns: one result per replica"""
+    per_replica = [sessions // processes + (1 if i < sessions % processes else 0) for i in range(processes)]
+    jobs = [dict(options, db_path=db_path, sessions=n, replica=i) for i, n in enumerate(per_replica) if n]
+    if len(jobs) == 1:
+        return [run_replica(**jobs[0])]
+    with multiprocessing.get_context('spawn').Pool(len(jobs)) as workers:
+        return workers.map(_replica_worker, jobs)
+
+def summarize(replicas) -> dict:
+    """Returns: {step: {'count', 'p50', 'p95', 'p99', 'max', 'errors'}} over every replica"""
+    summary = {}
+    for step in STEPS:
+        samples = np.array([t for replica in replicas for t in replica['timings'][step]], dtype=np.float64)
+        errors = sum(replica['errors'][step] for replica in replicas)
+        if len(samples):
+            p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+            summary[step] = {'count': len(samples), 'p50': p50, 'p95': p95, 'p99': p99,
+                             'max': samples.max(), 'errors': errors}
+        else:
+            summary[step] = {'count': 0, 'p50': None, 'p95': None, 'p99': None, 'max': None, 'errors': errors}
+    return summary
+
+def _format_errors(replicas) -> list:
+    """Report lines: error counts per step and exception type, then each step's first traceback"""
+    types = {step: Counter() for step in STEPS}
+    tracebacks = {}
+    for replica in replicas:
+        for step in STEPS:
+            types[step].update(replica['error_types'][step])
+            if step in replica['first_tracebacks']:
+                tracebacks.setdefault(step, replica['first_tracebacks'][step])
+    if not any(types.values()):
+        return []
+    lines = ['', f"{'step':<16}{'exception':<40}{'count':>8}"]
+    for step, counts in types.items():
+        lines += [f"{step:<16}{name:<40}{count:>8}" for name, count in counts.most_common()]
+    for step, text in tracebacks.items():
+        lines += ['', f"First {step} error:", text.rstrip()]
+    return lines
+
+def format_report(replicas) -> str:
+    def ms(value):
+        return f'{value:>10.1f}' if value is not None else f"{'-':>10}"
+
+    lines = [f"{'step':<16}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'errors':>8}"]
+    for step, row in summarize(replicas).items():
+        lines.append(f"{step:<16}{row['count']:>8}{ms(row['p50'])}{ms(row['p95'])}{ms(row['p99'])}{ms(row['max'])}{row['errors']:>8}")
+    lines += _format_errors(replicas)
+    lines += ['', f"{'replica':<10}{'sessions':>10}{'flows/s':>10}{'peak conns':>12}{'peak in use':>13}{'saturated':>11}{'peak RSS MB':>13}"]
+    for replica in replicas:
+        flows = len(replica['timings']['flow']) / max(replica['elapsed_s'], 1e-9)
+        lines.append(f"{replica['replica']:<10}{replica['sessions']:>10}{flows:>10.2f}"
+                     f"{replica['peak_connections']:>7} / {replica['pool_max_size']:<2}{replica['peak_in_use']:>13}"
+                     f"{replica['pool_saturated_pct']:>10.1f}%{replica['peak_rss_mb']:>13.1f}")
+    return '\n'.join(lines)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Concurrent-session load test of the search page data paths')
+    parser.add_argument('--sessions', type=int, default=DEFAULT_SESSIONS)
+    parser.add_argument('--processes', type=int, default=1, help='replicas to spread the sessions over')
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS, help='search -> page -> open flows per session')
+    parser.add_argument('--pages', type=int, default=2, help='pages clicked through per search')
+    parser.add_argument('--think', type=float, default=DEFAULT_THINK, help='mean pause between steps (s)')
+    parser.add_argument('--ramp', type=float, default=0.0, help='seconds over which sessions start')
+    parser.add_argument('--no-map', action='store_true', help='skip building the territory map')
+    parser.add_argument('--latency-profile', help='JSON of recorded latencies per statement kind (stub mode)')
+    parser.add_argument('--accounts', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db', default=None, help='DuckDB file (default: c360_bench_<accounts>.duckdb)')
+    parser.add_argument('--json', help='also write per-replica results to this file')
+    args = parser.parse_args()
+
+    db_path = os.path.abspath(args.db or f'c360_bench_{args.accounts}.duckdb')
+    synthetic_data.ensure(db_path, args.accounts, args.seed)
+    replicas = run_load_test(
+        db_path, args.sessions, args.processes, iterations=args.iterations, pages=args.pages,
+        think=args.think, include_map=not args.no_map, ramp=args.ramp, seed=args.seed,
+        latency_profile=args.latency_profile
+    )
+    mode = f'stub latencies from {args.latency_profile}' if args.latency_profile else 'local backend'
+    print(f"\n{args.sessions} sessions on {len(replicas)} replica(s), {mode}, {args.accounts:,} accounts\n")
+    print(format_report(replicas))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(replicas, f, indent=2)
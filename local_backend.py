@@ -0,0 +1,392 @@
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+import duckdb
+import pyarrow as pa
+
+# --- LOCAL SNOWFLAKE STAND-IN ---
+# Implements the part of the snowflake.connector API that snowflake_connector
+# uses (connect, cursors, execute_async, query status, errors) on top of an
+# embedded DuckDB file built by synthetic_data.py, so every page and loader runs
+# their real SQL offline. Select it with C360_BACKEND=local.
+#
+# The file is attached read-only as PROD_DWH, so PROD_DWH.DWH.<table> resolves
+# unchanged; the few Snowflake-only constructs the app uses are rewritten by
+# translate().
+
+LOCAL_CATALOG = 'PROD_DWH'
+RESULT_RETENTION = 256  # Finished async results kept for get_results_from_sfqid
+
+class errors:
+    """Exception hierarchy mirroring snowflake.connector.errors"""
+
+    class Error(Exception):
+        def __init__(self, msg=None, sfqid=None):
+            super().__init__(msg)
+            self.msg = msg
+            self.sfqid = sfqid
+
+    class InterfaceError(Error):
+        pass
+
+    class DatabaseError(Error):
+        pass
+
+    class OperationalError(DatabaseError):
+        pass
+
+    class ProgrammingError(DatabaseError):
+        pass
+
+    class NotSupportedError(DatabaseError):
+        pass
+
+# --- DIALECT TRANSLATION ---
+_QUOTED_OR_PARAM = re.compile(r"'(?:[^']|'')*'|\"[^\"]*\"|%s")
+_FLATTEN_JSON = re.compile(
+    r"SELECT\s+VALUE::(\w+)\s+FROM\s+TABLE\(\s*FLATTEN\(\s*INPUT\s*=>\s*PARSE_JSON\((\?)\)\s*\)\s*\)",
+    re.IGNORECASE)
+_IFF = re.compile(r"\bIFF\s*\(", re.IGNORECASE)
+_EPOCH_MS = re.compile(r"DATE_PART\(\s*EPOCH_MILLISECOND\s*,", re.IGNORECASE)
+_INFORMATION_SCHEMA = re.compile(rf"\b{LOCAL_CATALOG}\.INFORMATION_SCHEMA\.TABLES\b", re.IGNORECASE)
+_CREATE_TEMP = re.compile(r"CREATE\s+TEMPORARY\s+TABLE\s+(IF\s+NOT\s+EXISTS\s+)?(\w+)", re.IGNORECASE)
+_CANCEL = re.compile(r"SYSTEM\$CANCEL_QUERY", re.IGNORECASE)
+
+def translate(sql: str) -> str:
+    """
+    Snowflake SQL -> DuckDB SQL for the constructs this app uses.
+    QUALIFY, GROUP BY ALL, ILIKE and `::` casts are shared by both dialects.
+    """
+    # pyformat %s -> positional ? (qmark SQL passes through), leaving string literals and quoted names alone
+    sql = _QUOTED_OR_PARAM.sub(lambda m: '?' if m.group(0) == '%s' else m.group(0), sql)
+    sql = _FLATTEN_JSON.sub(r"SELECT UNNEST(CAST(CAST(\2 AS JSON) AS \1[])) AS VALUE", sql)
+    sql = _IFF.sub('IF(', sql)
+    sql = _EPOCH_MS.sub('epoch_ms(', sql)
+    # synthetic_data.py keeps LAST_ALTERED per table in C360_META.TABLES
+    return _INFORMATION_SCHEMA.sub(f'{LOCAL_CATALOG}.C360_META.TABLES', sql)
+
+# --- ASYNC STATEMENTS ---
+class QueryStatus:
+    RUNNING = 'RUNNING'
+    SUCCESS = 'SUCCESS'
+    FAILED_WITH_ERROR = 'FAILED_WITH_ERROR'
+
+class _Query:
+    """One statement run on its own DuckDB connection (a server-side query, in Snowflake terms)"""
+
+    def __init__(self, query_id, db):
+        self.query_id = query_id
+        self.db = db
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+_queries_lock = threading.Lock()
+_queries = OrderedDict()  # query id -> _Query, running first, then the newest RESULT_RETENTION finished
+
+def _register(query):
+    with _queries_lock:
+        _queries[query.query_id] = query
+
+def _finish(query, result=None, error=None):
+    query.result, query.error = result, error
+    query.db = None
+    query.done.set()
+    with _queries_lock:
+        _queries.move_to_end(query.query_id)
+        finished = [qid for qid, q in _queries.items() if q.done.is_set()]
+        for qid in finished[:max(0, len(finished) - RESULT_RETENTION)]:
+            del _queries[qid]
+
+def _lookup(query_id) -> _Query:
+    with _queries_lock:
+        query = _queries.get(query_id)
+    if query is None:
+        raise errors.ProgrammingError(f"Unknown query id {query_id}", sfqid=query_id)
+    return query
+
+def _cancel(query_id) -> str:
+    with _queries_lock:
+        query = _queries.get(query_id)
+    db = query.db if query is not None else None
+    if db is None:
+        return "Identified SQL statement is not currently executing."
+    db.interrupt()
+    return "query cancelled"
+
+def _run(db, sql, params) -> pa.Table:
+    """Execute translated SQL. Returns: the whole result as an Arrow table"""
+    try:
+        result = db.execute(sql, params)
+        if result.description is None:
+            return pa.table({})
+        return result.fetch_arrow_table()
+    except duckdb.InterruptException as e:
+        raise errors.ProgrammingError(f"SQL execution canceled: {e}") from e
+    except duckdb.Error as e:
+        raise errors.ProgrammingError(str(e)) from e
+
+# --- RECORDED LATENCY (stub mode) ---
+# With a latency profile every statement also waits for a latency drawn from
+# the samples recorded for its kind, so local runs behave like a remote
+# warehouse (login handshakes, queueing, network) at local-engine cost.
+# Profile file: {"connect": [ms, ...], "search": [ms, ...], ..., "default": [ms, ...]}
+_STATEMENT_KINDS = (
+    ('metadata', 'INFORMATION_SCHEMA'),
+    ('amp_activity', 'FACT_AMP_PURCHASE_DATA'),
+    ('sf_activity', 'DIM_PRODUCTACTIVITY'),
+    ('history', 'ACCOUNT_HISTORY'),
+    ('search', 'DIM_ACCOUNT'),
+)
+
+def statement_kind(sql: str) -> str:
+    """Latency profile key of a statement, from the tables it reads"""
+    upper = sql.upper()
+    for kind, table in _STATEMENT_KINDS:
+        if table in upper:
+            return kind
+    return 'default'
+
+class LatencyProfile:
+    """Recorded latency samples (milliseconds) per statement kind"""
+
+    def __init__(self, samples: dict):
+        self._samples = {kind: [float(ms) for ms in values] for kind, values in samples.items() if values}
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def delay(self, kind) -> float:
+        """Seconds to wait for one statement of `kind` (0 when nothing was recorded for it)"""
+        samples = self._samples.get(kind) or self._samples.get('default')
+        return random.choice(samples) / 1000 if samples else 0.0
+
+    def wait(self, kind):
+        delay = self.delay(kind)
+        if delay:
+            time.sleep(delay)
+
+# --- CONNECTION / CURSOR ---
+_session_ids = itertools.count(1)
+
+class SnowflakeLocalConnection:
+    """
+    A session: one DuckDB connection on a shared database instance.
+    Async statements run on their own cursor of the instance, so like Snowflake
+    queries they keep running after the submitting session is handed back.
+    Session temp tables are created as session-suffixed tables in the shared
+    in-memory catalog, so those async statements can still read them.
+    """
+
+    def __init__(self, instance, latency=None):
+        self._instance = instance
+        self._latency = latency
+        self._db = instance.cursor()
+        self._closed = False
+        self._suffix = f"_S{next(_session_ids)}"
+        self._temp_tables = set()
+
+    def _rewrite(self, sql):
+        match = _CREATE_TEMP.search(sql)
+        if match:
+            self._temp_tables.add(match.group(2).upper())
+            sql = _CREATE_TEMP.sub(lambda m: f"CREATE TABLE {m.group(1) or ''}{m.group(2)}", sql)
+        for table in self._temp_tables:
+            sql = re.sub(rf"\b{table}\b", table + self._suffix, sql, flags=re.IGNORECASE)
+        return translate(sql)
+
+    def _wait(self, sql):
+        """Recorded latency for a statement (stub mode only)"""
+        if self._latency is not None:
+            self._latency.wait(statement_kind(sql))
+
+    def cursor(self):
+        if self._closed:
+            raise errors.InterfaceError("Connection is closed")
+        return SnowflakeLocalCursor(self)
+
+    def is_closed(self) -> bool:
+        return self._closed
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        for table in self._temp_tables:
+            try:
+                self._db.execute(f"DROP TABLE IF EXISTS {table}{self._suffix}")
+            except duckdb.Error:
+                pass
+        self._db.close()
+
+    def get_query_status_throw_if_error(self, query_id):
+        query = _lookup(query_id)
+        if not query.done.is_set():
+            return QueryStatus.RUNNING
+        if query.error is not None:
+            raise query.error
+        return QueryStatus.SUCCESS
+
+    def is_still_running(self, status) -> bool:
+        return status == QueryStatus.RUNNING
+
+class SnowflakeLocalCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.sfqid = None
+        self._result = None
+        self._rows = None
+        self._pending = None  # async statement whose result is read on first fetch
+
+    def _resolve(self):
+        """Like the connector, wait for an async statement only when its result is first read"""
+        if self._pending is None:
+            return
+        query, self._pending = self._pending, None
+        query.done.wait()
+        if query.error is not None:
+            raise query.error
+        self._set_result(query.result)
+
+    @property
+    def description(self):
+        self._resolve()
+        if self._result is None:
+            return None
+        return [(field.name, field.type, None, None, None, None, True) for field in self._result.schema]
+
+    @property
+    def rowcount(self):
+        self._resolve()
+        return None if self._result is None else self._result.num_rows
+
+    def _set_result(self, table):
+        self._result = table
+        self._rows = None
+        self._pending = None
+
+    def execute(self, query, params=None):
+        self.sfqid = str(uuid.uuid4())
+        cancel = _CANCEL.search(query)
+        if cancel:
+            self._set_result(pa.table({'STATUS': [_cancel(params[0])]}))
+            return self
+        self.connection._wait(query)
+        self._set_result(_run(self.connection._db, self.connection._rewrite(query), params))
+        return self
+
+    def executemany(self, query, seqparams):
+        try:
+            self.connection._db.executemany(self.connection._rewrite(query), list(seqparams))
+        except duckdb.Error as e:
+            raise errors.ProgrammingError(str(e)) from e
+        self._set_result(pa.table({}))
+        return self
+
+    def execute_async(self, query, params=None):
+        """Start the statement on its own connection and return at once (sfqid is set)"""
+        original, sql = query, self.connection._rewrite(query)
+        query = _Query(str(uuid.uuid4()), self.connection._instance.cursor())
+        _register(query)
+        self.sfqid = query.query_id
+
+        def work():
+            db = query.db
+            try:
+                self.connection._wait(original)
+                _finish(query, result=_run(db, sql, params))
+            except errors.Error as e:
+                e.sfqid = query.query_id
+                _finish(query, error=e)
+            finally:
+                db.close()
+
+        threading.Thread(target=work, name='local-query', daemon=True).start()
+        return {'queryId': query.query_id}
+
+    def get_results_from_sfqid(self, query_id):
+        """
+        Make an async statement's result this cursor's result. Like the connector,
+        this doesn't wait - the first fetch does (poll get_query_status_throw_if_error to wait).
+        """
+        self._pending = _lookup(query_id)
+        self.sfqid = query_id
+        self._result = None
+        self._rows = None
+
+    def fetch_arrow_batches(self):
+        self._resolve()
+        if self._result is None:
+            raise errors.ProgrammingError("No result set")
+        # Like the connector: a pa.Table per result chunk
+        for batch in self._result.to_batches():
+            yield pa.Table.from_batches([batch])
+
+    def fetch_arrow_all(self):
+        self._resolve()
+        return self._result
+
+    def fetch_pandas_all(self):
+        self._resolve()
+        if self._result is None:
+            raise errors.ProgrammingError("No result set")
+        return self._result.to_pandas()
+
+    def fetchall(self):
+        self._resolve()
+        if self._rows is None:
+            self._rows = list(zip(*(column.to_pylist() for column in self._result.columns))) if self._result is not None else []
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchone(self):
+        rows = self.fetchall()
+        if not rows:
+            return None
+        self._rows = rows[1:]
+        return rows[0]
+
+    def close(self):
+        self._result = None
+        self._rows = None
+        self._pending = None
+
+# --- DRIVER ENTRY POINT ---
+_instances_lock = threading.Lock()
+_instances = {}  # database path -> in-memory DuckDB instance with the file attached
+
+def _instance(path):
+    with _instances_lock:
+        instance = _instances.get(path)
+        if instance is None:
+            instance = duckdb.connect()
+            instance.execute(f"ATTACH '{path}' AS {LOCAL_CATALOG} (READ_ONLY)")
+            _instances[path] = instance
+        return instance
+
+_profiles = {}  # latency profile path -> LatencyProfile
+
+def connect(database, latency_profile=None, **kwargs):
+    """
+    Open a session on the synthetic warehouse in `database` (see synthetic_data.py).
+    `latency_profile` is a JSON file of recorded latencies to add (stub mode).
+    Other snowflake.connector.connect arguments are accepted and ignored.
+    """
+    latency = None
+    if latency_profile:
+        with _instances_lock:
+            latency = _profiles.get(latency_profile)
+            if latency is None:
+                latency = _profiles[latency_profile] = LatencyProfile.load(latency_profile)
+        latency.wait('connect')
+    try:
+        return SnowflakeLocalConnection(_instance(database), latency)
+    except duckdb.Error as e:
+        raise errors.OperationalError(f"Cannot open local warehouse {database}: {e}") from e
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+# --- STATE -> CITY OPTION INDEX ---
+# The distinct (STATE, CITY) pairs of DIM_ACCOUNT kept as two category
+# dictionaries plus an int32 code array grouped by state, so the cascading
+# filter looks up a state's cities with one slice instead of filtering a frame.
+
+class LocationIndex:
+    """
+    Compact categorical index over distinct (state, city) pairs.
+    States and cities are stored once each; per state, a sorted run of city codes.
+    """
+
+    def __init__(self, states, cities):
+        pairs = pd.DataFrame({'STATE': states, 'CITY': cities}).dropna().drop_duplicates()
+        state = pd.Categorical(pairs['STATE'].astype(str))
+        city = pd.Categorical(pairs['CITY'].astype(str))
+
+        # Categories are sorted, so sorting by codes sorts by name
+        order = np.lexsort((city.codes, state.codes))
+        state_codes = state.codes[order]
+        self._state_names = state.categories
+        self._city_names = city.categories
+        self._city_codes = city.codes[order].astype(np.int32)
+        self._offsets = np.searchsorted(state_codes, np.arange(len(self._state_names) + 1))
+
+    def __len__(self):
+        return len(self._city_codes)
+
+    def states(self) -> list:
+        """Every state, sorted"""
+        return self._state_names.tolist()
+
+    def cities(self, state=None) -> list:
+        """Sorted cities of one state, or every city when `state` is None"""
+        if state is None:
+            return self._city_names.tolist()
+        pos = self._state_names.get_indexer([state])[0]
+        if pos < 0:
+            return []
+        return self._city_names[self._city_codes[self._offsets[pos]:self._offsets[pos + 1]]].tolist()
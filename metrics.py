@@ -0,0 +1,279 @@
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import streamlit as st
+import query_trace
+
+# --- METRICS EXPORT ---
+# Aggregate numbers for operations, fed by query_trace: statement latency per
+# named statement, cache hit ratios per cache, connection pool utilization and
+# full-rerun duration per page. Two ways out, picked with C360_METRICS:
+#     prometheus  Prometheus text format on http://C360_METRICS_HOST:C360_METRICS_PORT/metrics
+#     file        one JSON snapshot of every sample each C360_METRICS_INTERVAL
+#                 seconds, appended to C360_METRICS_FILE (size-rotated)
+# Off by default. Counters are per process and restart from zero with it.
+METRICS_MODE = os.environ.get("C360_METRICS", "off")
+METRICS_HOST = os.environ.get("C360_METRICS_HOST", "127.0.0.1")  # 0.0.0.0 to let other hosts scrape
+METRICS_PORT = int(os.environ.get("C360_METRICS_PORT", "9464"))
+METRICS_FILE = os.environ.get("C360_METRICS_FILE", "c360_metrics.jsonl")
+METRICS_INTERVAL = int(os.environ.get("C360_METRICS_INTERVAL", "60"))  # seconds between file snapshots
+METRICS_FILE_MAX_BYTES = 16 * 1024 * 1024
+METRICS_FILE_BACKUPS = 5
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RERUN_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 30.0, 60.0)
+# Statement names (see query_trace.statement calls) reported under one label
+STATEMENT_GROUPS = {
+    'search_all': 'search', 'name_index': 'search', 'search_count': 'search',
+    'search_page': 'search', 'search_map': 'search', 'search_map_bins': 'search',
+}
+
+class Counter:
+    """Monotonic count per label set"""
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labelnames):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, labels, amount=1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> list:
+        """Returns: [(sample name, {label: value}, value), ...]"""
+        with self._lock:
+            return [(self.name, dict(zip(self.labelnames, labels)), value) for labels, value in self._values.items()]
+
+class Histogram:
+    """Bucketed observations per label set, exported cumulatively like a Prometheus histogram"""
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames, buckets):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._values = {}  # labels -> [per-bucket counts (+Inf last), sum, count]
+
+    def observe(self, labels, value):
+        slot = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            counts, total, count = self._values.get(labels) or ([0] * (len(self.buckets) + 1), 0.0, 0)
+            counts[slot] += 1
+            self._values[labels] = (counts, total + value, count + 1)
+
+    def samples(self) -> list:
+        with self._lock:
+            values = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._values.items()]
+        samples = []
+        for labels, counts, total, count in values:
+            base = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                samples.append((f'{self.name}_bucket', {**base, 'le': _format_value(bound)}, cumulative))
+            samples.append((f'{self.name}_sum', base, total))
+            samples.append((f'{self.name}_count', base, count))
+        return samples
+
+class Collected:
+    """Values read from elsewhere when the metrics are scraped: `collect()` returns [({label: value}, value), ...]"""
+
+    def __init__(self, name, help_text, kind, collect):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self._collect = collect
+
+    def samples(self) -> list:
+        try:
+            return [(self.name, labels, value) for labels, value in self._collect()]
+        except Exception:
+            # A cache that can't be read right now just drops out of this scrape
+            return []
+
+# --- COLLECTED AT SCRAPE TIME ---
+def _cache_stats() -> dict:
+    """Returns: {cache name: stats()} for the process-wide caches created so far (never creates one)"""
+    return {name: cache.stats() for name, cache in query_trace.registered_caches().items()}
+
+def _cache_lookups():
+    """
+    Lookups per cache and outcome. Stale hits are part of stats()'s hits, so they are
+    reported apart from fresh hits: the outcomes of a cache add up to its lookups.
+    """
+    samples = []
+    for name, stats in _cache_stats().items():
+        outcomes = {outcome: stats[outcome] for outcome in ('hits', 'stale_hits', 'refinements', 'misses') if outcome in stats}
+        if 'stale_hits' in outcomes:
+            outcomes['hits'] -= outcomes['stale_hits']
+        samples.extend(({'cache': name, 'outcome': outcome}, value) for outcome, value in outcomes.items())
+    return samples
+
+def _cache_hit_ratios():
+    """Share of lookups answered without a query - stale hits (already within hits) and refinements count"""
+    ratios = []
+    for name, stats in _cache_stats().items():
+        served = stats.get('hits', 0) + stats.get('refinements', 0)
+        lookups = served + stats.get('misses', 0)
+        if lookups:
+            ratios.append(({'cache': name}, served / lookups))
+    return ratios
+
+def _pool_sessions():
+    from snowflake_connector import get_connection_pool
+    pool = get_connection_pool()
+    stats = pool.stats()
+    return [
+        ({'state': 'in_use'}, stats['in_use']),
+        ({'state': 'idle'}, stats['idle']),
+        ({'state': 'max'}, pool.max_size),
+    ]
+
+def _pool_utilization():
+    from snowflake_connector import get_connection_pool
+    pool = get_connection_pool()
+    return [({}, pool.stats()['in_use'] / pool.max_size)]
+
+def _format_value(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in labels.values())
+    return '{' + ','.join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + '}'
+
+class MetricsRegistry:
+    """The app's counters, histograms and gauges, updated from query_trace observers"""
+
+    def __init__(self):
+        self.statement_seconds = Histogram(
+            'c360_statement_duration_seconds',
+            'Statement latency including pool checkout and fetch, by named statement and cache outcome',
+            ('statement', 'cache'), LATENCY_BUCKETS)
+        self.statement_errors = Counter(
+            'c360_statement_errors_total', 'Statements that raised, by named statement', ('statement',))
+        self.statement_rows = Counter(
+            'c360_statement_rows_total', 'Rows returned, by named statement', ('statement',))
+        self.checkout_seconds = Histogram(
+            'c360_pool_checkout_seconds', 'Time waiting for a pooled session before a statement',
+            (), LATENCY_BUCKETS)
+        self.rerun_seconds = Histogram(
+            'c360_rerun_duration_seconds', 'Full page rerun duration, by page', ('page',), RERUN_BUCKETS)
+        self.metrics = [
+            self.statement_seconds, self.statement_errors, self.statement_rows, self.checkout_seconds,
+            self.rerun_seconds,
+            Collected('c360_cache_lookups_total', 'Lookups per process-wide cache and outcome since the cache was created',
+                      'counter', _cache_lookups),
+            Collected('c360_cache_hit_ratio', 'Share of cache lookups served without a query',
+                      'gauge', _cache_hit_ratios),
+            Collected('c360_pool_sessions', 'Pooled Snowflake sessions checked out, idle and allowed',
+                      'gauge', _pool_sessions),
+            Collected('c360_pool_utilization', 'Checked-out sessions as a share of the pool maximum',
+                      'gauge', _pool_utilization),
+        ]
+
+    def on_statement(self, record):
+        statement = STATEMENT_GROUPS.get(record.name, record.name)
+        self.statement_seconds.observe((statement, record.cache or 'none'), (record.total_ms or 0.0) / 1000)
+        if record.error:
+            self.statement_errors.inc((statement,))
+        if record.rows:
+            self.statement_rows.inc((statement,), record.rows)
+        if record.connect_ms:
+            self.checkout_seconds.observe((), record.connect_ms / 1000)
+
+    def on_rerun(self, trace):
+        self.rerun_seconds.observe((trace.page,), trace.duration_ms / 1000)
+
+    def samples(self) -> list:
+        """Returns: [(sample name, {label: value}, value), ...] for every metric"""
+        return [sample for metric in self.metrics for sample in metric.samples()]
+
+    def to_prometheus(self) -> str:
+        """Returns: every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(f'{name}{_format_labels(labels)} {_format_value(value)}'
+                         for name, labels, value in metric.samples())
+        return '\n'.join(lines) + '\n'
+
+    def to_json(self) -> str:
+        """Returns: one timestamped snapshot of every sample as a JSON line"""
+        return json.dumps({
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'pid': os.getpid(),
+            'samples': [{'name': name, 'labels': labels, 'value': value} for name, labels, value in self.samples()],
+        })
+
+# --- EXPORTERS ---
+def _serve_prometheus(registry, host, port):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = registry.to_prometheus().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='c360-metrics-http', daemon=True).start()
+    return server
+
+def _write_snapshots(registry, path, interval):
+    handler = logging.handlers.RotatingFileHandler(
+        path, maxBytes=METRICS_FILE_MAX_BYTES, backupCount=METRICS_FILE_BACKUPS)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger = logging.getLogger('c360.metrics')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            logger.info(registry.to_json())
+
+    threading.Thread(target=loop, name='c360-metrics-file', daemon=True).start()
+
+@st.cache_resource
+def get_metrics():
+    """
+    Process-wide registry, hooked into query_trace and exported per C360_METRICS
+    (call near the top of each page). Returns: None when metrics are off.
+    """
+    if METRICS_MODE not in ('prometheus', 'file'):
+        return None
+    registry = MetricsRegistry()
+    query_trace.add_observer(registry.on_statement, registry.on_rerun)
+    if METRICS_MODE == 'prometheus':
+        try:
+            _serve_prometheus(registry, METRICS_HOST, METRICS_PORT)
+        except OSError as e:
+            # Port taken (e.g. a second app process) - keep counting, just don't serve
+            logging.getLogger(__name__).warning("Metrics endpoint not started on %s:%s: %s", METRICS_HOST, METRICS_PORT, e)
+    else:
+        _write_snapshots(registry, METRICS_FILE, METRICS_INTERVAL)
+    return registry
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+# --- TRIGRAM INVERTED INDEX OVER ACCOUNT NAMES ---
+# Answers LOWER(NAME) LIKE '%term%' in memory: every lower-cased name is cut
+# into character trigrams, each trigram keeps a sorted posting list of row
+# positions, and a search intersects the lists for the term's trigrams before
+# a final substring check. Built fully vectorized from a snapshot so a
+# million-row rebuild takes seconds, not minutes.
+
+_SEPARATOR = '\x00'
+
+def _codepoints(text: str) -> np.ndarray:
+    """Unicode code points of a string as uint64"""
+    return np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+
+def _trigram_codes(points: np.ndarray) -> np.ndarray:
+    """Pack every run of three code points into one uint64 (21 bits each)"""
+    return (points[:-2] << np.uint64(42)) | (points[1:-1] << np.uint64(21)) | points[2:]
+
+class TrigramIndex:
+    """
+    Substring index over a column of names.
+    `row_ids` are the caller's keys (e.g. ACCOUNT_UUID); search() returns the
+    keys of every row whose lower-cased name contains the term.
+    """
+
+    def __init__(self, row_ids, names):
+        self.row_ids = np.asarray(row_ids, dtype=object)
+        self.names = pd.Series(names, dtype=object).fillna('').str.lower().to_numpy(dtype=object)
+
+        # One long code point array: name0 \0 name1 \0 ...
+        lengths = np.fromiter((len(n) for n in self.names), dtype=np.int64, count=len(self.names))
+        points = _codepoints(_SEPARATOR.join(self.names) + _SEPARATOR)
+        row_of_point = np.repeat(np.arange(len(self.names), dtype=np.int32), lengths + 1)
+
+        if len(points) >= 3:
+            codes = _trigram_codes(points)
+            # Drop trigrams that cross a name boundary
+            separator = np.uint64(ord(_SEPARATOR))
+            valid = (points[:-2] != separator) & (points[1:-1] != separator) & (points[2:] != separator)
+            codes, rows = codes[valid], row_of_point[:-2][valid]
+        else:
+            codes, rows = np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int32)
+
+        # Unique (trigram, row) pairs sorted by trigram, then row -> CSR posting lists
+        order = np.lexsort((rows, codes))
+        codes, rows = codes[order], rows[order]
+        keep = np.ones(len(codes), dtype=bool)
+        keep[1:] = (codes[1:] != codes[:-1]) | (rows[1:] != rows[:-1])
+        codes, rows = codes[keep], rows[keep]
+
+        self._keys, starts = np.unique(codes, return_index=True)
+        self._offsets = np.append(starts, len(codes))
+        self._postings = rows
+
+    def __len__(self):
+        return len(self.names)
+
+    def _posting(self, code) -> np.ndarray:
+        pos = np.searchsorted(self._keys, code)
+        if pos >= len(self._keys) or self._keys[pos] != code:
+            return self._postings[:0]
+        return self._postings[self._offsets[pos]:self._offsets[pos + 1]]
+
+    def candidate_positions(self, term: str) -> np.ndarray:
+        """Row positions whose name contains `term` (case-insensitive)"""
+        term = term.lower()
+        if len(term) < 3:
+            # Too short for trigrams - vectorized scan of the in-memory names instead
+            mask = pd.Series(self.names).str.contains(term, regex=False).to_numpy()
+            return np.flatnonzero(mask)
+
+        postings = sorted((self._posting(code) for code in np.unique(_trigram_codes(_codepoints(term)))), key=len)
+        candidates = postings[0]
+        for posting in postings[1:]:
+            if len(candidates) == 0:
+                break
+            candidates = np.intersect1d(candidates, posting, assume_unique=True)
+
+        # Trigram hits are a superset of substring hits - verify the survivors
+        return np.array([pos for pos in candidates.tolist() if term in self.names[pos]], dtype=np.int64)
+
+    def search(self, term: str) -> np.ndarray:
+        """Keys of the rows whose name contains `term`"""
+        return self.row_ids[self.candidate_positions(term)]
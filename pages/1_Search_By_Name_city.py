@@ -1,14 +1,15 @@
 import streamlit as st
-import pandas as pd
-import sys, os
+import sys, os, time
 
-# --- IMPORTS ---
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from snowflake_connector import get_snowflake_connection, check_activity_exists, load_activities_parallel
+import query_trace
 
 # --- PAGE CONFIGURATION ---
 st.set_page_config(page_title="Customer 360", layout="wide")
 
+# Times every statement this rerun issues (sidebar diagnostics panel)
+rerun_trace = query_trace.start_rerun('search', st.session_state)
+
 # --- INITIALIZE SESSION STATE ---
 if 'page' not in st.session_state:
     st.session_state.page = 'search'
@@ -16,6 +17,8 @@ if 'selected_account' not in st.session_state:
     st.session_state.selected_account = None
 if 'current_page' not in st.session_state:
     st.session_state.current_page = 0
+if 'page_cursors' not in st.session_state:
+    st.session_state.page_cursors = [None]  # keyset cursor that starts each visited page
 
 # --- CUSTOM CSS ---
 st.markdown("""
@@ -114,23 +117,32 @@ st.sidebar.markdown(
     unsafe_allow_html=True
 )
 
-# --- FUNCTION TO GET CITY/STATE OPTIONS ---
-@st.cache_data(ttl=3600)
-def get_filter_options():
-    conn = get_snowflake_connection()
-    query = """
-        SELECT DISTINCT CITY, STATE
-        FROM PROD_DWH.DWH.DIM_ACCOUNT
-        WHERE (FF_ID IS NOT NULL 
-               OR SF_ACCOUNT18_ID__C IS NOT NULL 
-               OR AMP_SOURCE_CUSTOMER_ID IS NOT NULL)
-          AND CITY IS NOT NULL 
-          AND STATE IS NOT NULL
-        ORDER BY STATE, CITY
-    """
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df
+# --- IMPORTS ---
+# The app modules pull in pandas, pyarrow and numpy; importing them after the
+# page config, CSS and sidebar are sent lets the browser paint the static chrome
+# while they load (see startup_timing.py for the breakdown).
+import pandas as pd
+from snowflake_connector import (
+    check_activity_exists, load_activity_pages, ACTIVITY_PAGE_SIZE, QueryCancelledError, cancel_session_queries
+)
+from account_search import (
+    RESULTS_PER_PAGE, SEARCH_CANCEL_KEY, SEARCH_DEBOUNCE_SECONDS, make_search_key, count_search_results,
+    search_accounts_page, page_cursor, get_location_index
+)
+from territory_map import get_territory_figure, is_aggregated
+from result_transforms import activity_lookup_ids, shape_search_page, shape_sf_activity, fill_text_nulls
+from diagnostics_panel import render_query_diagnostics
+from metrics import get_metrics
+
+get_metrics()  # starts the exporter once per process when C360_METRICS is set
+
+# --- SEARCH QUERIES ---
+def run_search_step(search_fn, *args):
+    """Run one search query; end this rerun quietly if a newer search cancelled it"""
+    try:
+        return search_fn(*args)
+    except QueryCancelledError:
+        st.stop()
 
 # --- NAVIGATION LOGIC ---
 if st.session_state.page == 'activity':
@@ -188,32 +200,31 @@ if st.session_state.page == 'activity':
         gamechanger_id = account.get('Gamechanger ID')
         amp_customer_id = account.get('AMP Customer ID')
         
+        # Rows to show per table - "Load more" raises these by a page
+        activity_rows = st.session_state.setdefault('activity_rows', {'sf': ACTIVITY_PAGE_SIZE, 'amp': ACTIVITY_PAGE_SIZE})
+        
         with st.spinner("Loading product activity data..."):
-            sf_activity_df, amp_activity_df = load_activities_parallel(gamechanger_id, amp_customer_id)
+            activity = load_activity_pages(gamechanger_id, amp_customer_id, activity_rows['sf'], activity_rows['amp'])
+        sf_activity_df, amp_activity_df = activity['sf'].frame, activity['amp'].frame
+        
+        def load_more_button(source, label):
+            """Offer the next page of a partly loaded activity table"""
+            page = activity[source]
+            if page.complete:
+                return
+            remaining = page.total - len(page.frame)
+            if st.button(f"Load {min(ACTIVITY_PAGE_SIZE, remaining):,} more {label} records", key=f"load_more_{source}"):
+                st.session_state.activity_rows[source] += ACTIVITY_PAGE_SIZE
+                st.rerun()
         
         # Salesforce Activity Section
         st.markdown("## 📊 Salesforce Product Activity")
         
         if not sf_activity_df.empty:
-            st.success(f"Found {len(sf_activity_df)} Salesforce product activity records")
-            
-            # Replace None/NaN with empty strings
-            sf_activity_df = sf_activity_df.fillna('')
-            
-            # Replace 'None' string with empty string for CLOSED_DATE
-            sf_activity_df['CLOSED_DATE'] = sf_activity_df['CLOSED_DATE'].replace('None', '')
+            st.success(f"Showing {len(sf_activity_df):,} of {activity['sf'].total:,} Salesforce product activity records")
             
-            # Format PIPELINE_ACTIVITY column with GREEN checkmarks
-            def format_pipeline(value):
-                if pd.notna(value) and str(value).strip():
-                    val_str = str(value).upper()
-                    if val_str in ['TRUE', '1', 'YES']:
-                        return "✅"
-                    elif val_str in ['FALSE', '0', 'NO']:
-                        return "✗"
-                return ""
-            
-            sf_activity_df['PIPELINE_ACTIVITY'] = sf_activity_df['PIPELINE_ACTIVITY'].apply(format_pipeline)
+            # Blank text nulls (dates keep their dtype) and GREEN checkmarks for PIPELINE_ACTIVITY
+            sf_activity_df = shape_sf_activity(sf_activity_df)
             
             # Dynamic height based on rows (no empty rows)
             table_height = min(len(sf_activity_df) * 35 + 38, 400)
@@ -239,6 +250,7 @@ if st.session_state.page == 'activity':
                     "NEXT_STEPS": st.column_config.TextColumn("NEXT_STEPS")
                 }
             )
+            load_more_button('sf', "Salesforce")
         else:
             if gamechanger_id and pd.notna(gamechanger_id) and gamechanger_id != '':
                 st.info("No Salesforce product activity found for this account.")
@@ -251,15 +263,16 @@ if st.session_state.page == 'activity':
         st.markdown("## 🛒 AMP Activity")
         
         if not amp_activity_df.empty:
-            st.success(f"Found {len(amp_activity_df)} AMP activity records")
+            st.success(f"Showing {len(amp_activity_df):,} of {activity['amp'].total:,} AMP activity records")
             
-            # Replace None/NaN with empty strings
-            amp_activity_df = amp_activity_df.fillna('')
+            # Replace None/NaN with empty strings in text columns (numbers stay numeric)
+            amp_activity_df = fill_text_nulls(amp_activity_df)
             
             # Dynamic height based on rows (no empty rows)
             table_height = min(len(amp_activity_df) * 35 + 38, 400)
             
             st.dataframe(amp_activity_df, use_container_width=False, height=table_height, hide_index=True)
+            load_more_button('amp', "AMP")
         else:
             if amp_customer_id and pd.notna(amp_customer_id) and amp_customer_id != '' and amp_customer_id != 0:
                 st.info("No AMP activity found for this account.")
@@ -274,171 +287,76 @@ else:
     
     # Search filter
     search_term = st.text_input("🔍 Search by Account Name", placeholder="Enter account name (minimum 2 characters)...")
+    
+    # Location filter - the option index is only loaded once the filter is switched on
+    selected_state = selected_city = None
+    if st.toggle("📍 Filter by city / state", key="filter_location"):
+        location_index = get_location_index()
+        col1, col2 = st.columns(2)
+        with col1:
+            state_choice = st.selectbox("State", ['All'] + location_index.states(), key="filter_state")
+        selected_state = None if state_choice == 'All' else state_choice
+        
+        # Cascade: only the cities of the chosen state (all cities when no state is chosen)
+        city_options = ['All'] + location_index.cities(selected_state)
+        if st.session_state.get('filter_city') not in city_options:
+            st.session_state.filter_city = 'All'
+        with col2:
+            city_choice = st.selectbox("City", city_options, key="filter_city")
+        selected_city = None if city_choice == 'All' else city_choice
+    
+    search_key = make_search_key(search_term, selected_city, selected_state)
 
     # --- MAIN LOGIC ---
-    if len(search_term.strip()) >= 2:
-        # Build dynamic query
-        where_clauses = []
-        params = []
-        
-        if len(search_term.strip()) >= 2:
-            where_clauses.append("LOWER(NAME) LIKE %s")
-            params.append(f"%{search_term.lower()}%")
-        
-        where_sql = " AND ".join(where_clauses)
-        
-        query = f"""
-            WITH amp_consolidation AS (
-                -- Group all AMP Customer IDs by FF_ID
-                SELECT 
-                    FF_ID,
-                    LISTAGG(DISTINCT CAST(AMP_AMPCUSTOMER_ID AS INTEGER), ', ') 
-                        WITHIN GROUP (ORDER BY CAST(AMP_AMPCUSTOMER_ID AS INTEGER)) AS CONSOLIDATED_AMP_IDS
-                FROM PROD_DWH.DWH.DIM_ACCOUNT
-                WHERE AMP_AMPCUSTOMER_ID IS NOT NULL
-                  AND FF_ID IS NOT NULL
-                GROUP BY FF_ID
-            )
-            SELECT DISTINCT
-                a.SF_ACCOUNT18_ID__C AS "Gamechanger ID",
-                COALESCE(ac.CONSOLIDATED_AMP_IDS, CAST(CAST(a.AMP_AMPCUSTOMER_ID AS INTEGER) AS VARCHAR)) AS "AMP Customer ID",
-                a.FF_ID AS "Firefly ID",
-                a.SF_PRIMARY_EMPLOYEE_NAME__C AS "Primary Employee",
-                a.NAME AS "Name",
-                a.ADDRESS AS "Address",
-                a.CITY AS "City",
-                a.STATE AS "State",
-                a.SF_ZIP__C AS "Zip",
-                a.SF_TF_PRIMARYDISTRIBUTORNAME__C AS "Primary Distributor",
-                a.SF_LARGELEVERAGEOPERATOR__C AS "LLO",
-                a.SF_GEOMARKET_NAME__C AS "Market",
-                a.SF_GEOZONE_NAME__C AS "Zone",
-                a.DS_LATITUDE AS "LATITUDE",
-                a.DS_LONGITUDE AS "LONGITUDE",
-                a.DS_ACCOUNT_TYPE AS "Account Type"
-            FROM PROD_DWH.DWH.DIM_ACCOUNT a
-            LEFT JOIN amp_consolidation ac
-                ON a.FF_ID = ac.FF_ID
-            WHERE {where_sql}
-            ORDER BY a.NAME
-        """
+    if search_key.term or search_key.city or search_key.state:
+        # Reset paging whenever the search or its filters change
+        if st.session_state.get('search_key') != search_key:
+            st.session_state.search_key = search_key
+            st.session_state.current_page = 0
+            st.session_state.page_cursors = [None]
+            
+            # Debounce: wait briefly; if the user kept typing, Streamlit stops this
+            # rerun at the next element call before any query is sent
+            if SEARCH_DEBOUNCE_SECONDS > 0:
+                time.sleep(SEARCH_DEBOUNCE_SECONDS)
+                st.empty()
         
-        # Get fresh connection and use try/finally
-        conn = get_snowflake_connection()
-        try:
-            df = pd.read_sql(query, conn, params=tuple(params))
-        finally:
-            conn.close()
-        if df.empty:
+        # Ranking and paging happen in Snowflake - only the count comes back here
+        total_results = run_search_step(count_search_results, search_key)
+        if total_results == 0:
             st.warning("No matches found.")
             st.session_state.current_page = 0
         else:
-            # Create priority column for sorting
-            # Priority 1: Has all 3 IDs (Gamechanger + AMP Customer + Firefly)
-            # Priority 2: Has Gamechanger + AMP Customer (no Firefly)
-            # Priority 3: Has only Gamechanger
-            # Priority 4: Everything else
-            
-            def get_priority(row):
-                gc_id = row['Gamechanger ID']
-                amp_id = row['AMP Customer ID']
-                ff_id = row['Firefly ID']
-                
-                has_gc = pd.notna(gc_id) and str(gc_id).strip() != ''
-                has_amp = pd.notna(amp_id) and str(amp_id).strip() != '' and str(amp_id) != '0'
-                has_ff = pd.notna(ff_id) and str(ff_id).strip() != ''
-                
-                if has_gc and has_amp and has_ff:
-                    return 1  # All three
-                elif has_gc and has_amp:
-                    return 2  # GC + AMP
-                elif has_gc:
-                    return 3  # Only GC
-                else:
-                    return 4  # Everything else
-
             # --- MAP VISUALIZATION ---
-            # Filter dataframe for valid coordinates
-            map_data = df[df['LATITUDE'].notna() & df['LONGITUDE'].notna()].copy()
+            # Built once per search; broad searches are drawn as counted grid-cell markers
+            fig = run_search_step(get_territory_figure, search_key, total_results)
 
-            if not map_data.empty:
+            if fig is not None:
                 st.markdown("### 🗺️ Territory Map")
-                
-                import plotly.express as px
-                
-                fig = px.scatter_mapbox(
-    map_data,
-    lat='LATITUDE',
-    lon='LONGITUDE',
-    hover_name='Name',
-    hover_data={
-        'LATITUDE': False,
-        'LONGITUDE': False,
-        'City': True,
-        'State': True,
-        'Market': True,
-        'Zone': True
-    },
-    zoom=3.5,
-    height=500,
-    color_discrete_sequence=['#003366']  # Acxion blue
-)
-                fig.update_traces(marker=dict(size=16, color='#003366'))
-                
-                fig.update_layout(
-                    mapbox_style="open-street-map",
-                    margin={"r":0,"t":0,"l":0,"b":0}
-                )
+                if is_aggregated(total_results):
+                    st.caption("Accounts are grouped by area - narrow the search to see individual accounts")
                 
                 st.plotly_chart(fig, use_container_width=True)
                 
                 st.markdown("---")
             else:
                 st.info("📍 No accounts with location data found for this search")
-                
-            def get_id_sort_key(row):
-                """Create a sort key based on which IDs exist"""
-                gc_id = row['Gamechanger ID']
-                amp_id = row['AMP Customer ID']
-                ff_id = row['Firefly ID']
-                
-                has_gc = pd.notna(gc_id) and str(gc_id).strip() != ''
-                has_ff = pd.notna(ff_id) and str(ff_id).strip() != ''
-                
-                # Handle multiple AMP IDs (comma-separated)
-                has_amp = False
-                if pd.notna(amp_id) and str(amp_id).strip() != '':
-                    # Check if it's a valid number or comma-separated list
-                    amp_str = str(amp_id).strip()
-                    if amp_str and amp_str != '0':
-                        has_amp = True
-                
-                # Priority sorting
-                if has_gc and has_amp and has_ff:
-                    return 1  # All three IDs
-                elif has_gc and has_amp:
-                    return 2  # GC + AMP (no FF)
-                elif has_gc:
-                    return 3  # Only GC
-                else:
-                    return 4  # Everything else
-            
-            df['_priority'] = df.apply(get_priority, axis=1)
-            df['_id_sort_key'] = df.apply(get_id_sort_key, axis=1)
-            df = df.sort_values(by=['_priority', '_id_sort_key'])
-            df = df.drop(columns=['_priority', '_id_sort_key'])
             
             # Pagination logic
-            total_results = len(df)
-            results_per_page = 50
+            results_per_page = RESULTS_PER_PAGE
             total_pages = (total_results - 1) // results_per_page + 1
             
-            # Ensure current page is valid
-            if st.session_state.current_page >= total_pages:
+            # Ensure current page is valid (we can only jump to pages we have a cursor for)
+            if st.session_state.current_page >= min(total_pages, len(st.session_state.page_cursors)):
                 st.session_state.current_page = 0
             
+            # Fetch only the page shown, keyset-seeking past the previous page's last row
+            page_df = run_search_step(search_accounts_page, search_key, st.session_state.page_cursors[st.session_state.current_page])
+            next_cursor = page_cursor(page_df) if not page_df.empty else None
+            page_df = page_df.drop(columns=['_PRIORITY', '_ROW_ID']).reset_index(drop=True)
+            
             start_idx = st.session_state.current_page * results_per_page
-            end_idx = min(start_idx + results_per_page, total_results)
+            end_idx = start_idx + len(page_df)
             
             st.success(f"Showing results {start_idx + 1}-{end_idx} of {total_results} total matches")
 
@@ -447,77 +365,14 @@ else:
             st.markdown("💡 **How to view activity:** Click the checkbox in any row to view details")
             st.markdown("🟢 **Green circles** indicate IDs with existing product activity")
             
-            page_df = df.iloc[start_idx:end_idx].reset_index(drop=True)
-            
             # Check which accounts on this page have activity
-            account_ids = []
-            for _, row in page_df.iterrows():
-                sf_id = row['Gamechanger ID'] if pd.notna(row['Gamechanger ID']) and row['Gamechanger ID'] != '' else None
-                amp_id = row['AMP Customer ID']  # Keep full string: "1226698, 1794016"
-                
-                account_ids.append({
-                    'sf_id': sf_id,
-                    'amp_id': amp_id  # Pass the FULL comma-separated string
-                })
-            
-            # Get activity status
-            with st.spinner("Checking activity status..."):
-                activity_status = check_activity_exists(account_ids)
-            
-            # Add activity indicators (green circles) for each individual ID
-            def format_ids_with_indicators(row):
-                """Format IDs with individual green circles"""
-                gc_id = row['Gamechanger ID']
-                amp_id = row['AMP Customer ID']
-                
-                # Format Gamechanger ID
-                if pd.notna(gc_id) and str(gc_id).strip():
-                    key = str(gc_id)
-                    if key in activity_status and activity_status[key]['has_sf']:
-                        gc_display = f"{gc_id} 🟢"
-                    else:
-                        gc_display = str(gc_id)
-                else:
-                    gc_display = ''
-                
-                # Format AMP Customer ID(s) - check each individual ID
-                if pd.notna(amp_id) and str(amp_id).strip() and str(amp_id) != '0':
-                    amp_str = str(amp_id).strip()
-                    if ',' in amp_str:
-                        # Multiple IDs - check each one
-                        amp_list = [id.strip() for id in amp_str.split(',')]
-                        formatted_ids = []
-                        for single_id in amp_list:
-                            # Check activity for this specific ID
-                            if single_id in activity_status and activity_status[single_id]['has_amp']:
-                                formatted_ids.append(f"{single_id} 🟢")
-                            else:
-                                formatted_ids.append(single_id)
-                        amp_display = ', '.join(formatted_ids)
-                    else:
-                        # Single ID
-                        if amp_str in activity_status and activity_status[amp_str]['has_amp']:
-                            amp_display = f"{amp_str} 🟢"
-                        else:
-                            amp_display = amp_str
-                else:
-                    amp_display = ''
-                
-                return pd.Series([gc_display, amp_display])
+            account_ids = activity_lookup_ids(page_df)
             
-            # Format LLO column with GREEN checkmarks
-            def format_llo(value):
-                if pd.notna(value):
-                    if str(value).lower() in ['true', '1', 'yes']:
-                        return "✅"
-                    elif str(value).lower() in ['false', '0', 'no']:
-                        return "✗"
-                return ""
+            # Answered from the in-memory activity index - no query per page
+            activity_status = check_activity_exists(account_ids)
             
-            # Apply formatting
-            page_df[['Gamechanger ID', 'AMP Customer ID']] = page_df.apply(format_ids_with_indicators, axis=1)
-            page_df['LLO'] = page_df['LLO'].apply(format_llo)
-            page_df = page_df.fillna('')
+            # Green circles per ID, LLO checkmarks, blank text nulls - column-wise in one pass
+            page_df = shape_search_page(page_df, activity_status)
             
             # Create column configuration with proper sizing
             column_config = {
@@ -558,6 +413,7 @@ else:
                     # Check if account has at least one ID
                     if pd.notna(selected_row["Gamechanger ID"]) or pd.notna(selected_row["AMP Source Customer ID"]) or pd.notna(selected_row["Firefly ID"]):
                         st.session_state.selected_account = selected_row.to_dict()
+                        st.session_state.activity_rows = {'sf': ACTIVITY_PAGE_SIZE, 'amp': ACTIVITY_PAGE_SIZE}
                         st.session_state.page = 'activity'
                         st.rerun()
                     else:
@@ -578,11 +434,24 @@ else:
                           unsafe_allow_html=True)
             
             with col3:
-                if st.session_state.current_page < total_pages - 1:
+                if st.session_state.current_page < total_pages - 1 and next_cursor is not None:
                     if st.button("Next →"):
+                        # Remember where the next page starts (drop any stale forward history)
+                        del st.session_state.page_cursors[st.session_state.current_page + 1:]
+                        st.session_state.page_cursors.append(next_cursor)
                         st.session_state.current_page += 1
                         st.rerun()
 
     else:
         st.info("Start typing an account name (min 2 characters) or select a city/state filter...")
         st.session_state.current_page = 0
+        st.session_state.page_cursors = [None]
+        st.session_state.search_key = None
+        
+        # Search box cleared - nothing on screen needs a still-running search
+        cancel_session_queries(SEARCH_CANCEL_KEY)
+
+# --- QUERY DIAGNOSTICS ---
+# Rerun duration for metrics - reruns cut short by st.rerun()/st.stop() are finished by the next one's start_rerun
+rerun_trace.finish()
+render_query_diagnostics(rerun_trace)
@@ -1,11 +1,17 @@
 import streamlit as st
-import pandas as pd
-from snowflake_connector import get_snowflake_connection
+import query_trace
+from account_history import lookup_accounts, count_history, load_history, HISTORY_PAGE_SIZE
+from diagnostics_panel import render_query_diagnostics
+from metrics import get_metrics
 
-st.title("🔍 Account Lookup")
+rerun_trace = query_trace.start_rerun('account_history', st.session_state)
+get_metrics()  # starts the exporter once per process when C360_METRICS is set
+
+# History pages loaded per account ("Load more" adds one)
+if 'history_pages' not in st.session_state:
+    st.session_state.history_pages = {}
 
-conn = get_snowflake_connection()
-cur = conn.cursor()
+st.title("🔍 Account Lookup")
 
 # Search inputs
 st.subheader("Search by any of the following:")
@@ -18,57 +24,44 @@ with col2:
 with col3:
     sf_id_input = st.text_input("Salesforce ID")
 
-# Build dynamic WHERE clause
-where_clauses = []
-if name_input:
-    where_clauses.append(f"LOWER(NAME) LIKE '%{name_input.lower()}%'")
-if ff_id_input:
-    where_clauses.append(f"FF_ID ILIKE '%{ff_id_input}%'")
-if sf_id_input:
-    where_clauses.append(f"SF_ID ILIKE '%{sf_id_input}%'")
+if name_input.strip() or ff_id_input.strip() or sf_id_input.strip():
+    # Bound parameters on a pooled session; cached, so widget interactions don't re-scan
+    results = lookup_accounts(name_input, ff_id_input, sf_id_input)
 
-if where_clauses:
-    where_sql = "WHERE " + " AND ".join(where_clauses)
-    
-    search_query = f"""
-        SELECT ACCOUNT_ID, NAME, FF_ID, SF_ID
-        FROM PROD_DWH.DWH.DIM_ACCOUNT
-        {where_sql}
-        ORDER BY NAME
-        LIMIT 50
-    """
-    cur.execute(search_query)
-    results = cur.fetchall()
-
-    if results:
+    if not results.empty:
         options = {
             f"{name} | Firefly: {ff_id or '—'} | Salesforce: {sf_id or '—'}": acc_id
-            for acc_id, name, ff_id, sf_id in results
+            for acc_id, name, ff_id, sf_id in results.itertuples(index=False)
         }
         selected_label = st.selectbox("Select an Account", list(options.keys()))
         selected_account_id = options[selected_label]
 
         st.subheader(f"Account History for: {selected_label}")
 
-        # Replace with your real history table if different
-        history_query = f"""
-            SELECT *
-            FROM PROD_DWH.DWH.ACCOUNT_HISTORY
-            WHERE ACCOUNT_ID = '{selected_account_id}'
-            ORDER BY EVENT_DATE DESC
-            LIMIT 100
-        """
-        cur.execute(history_query)
-        rows = cur.fetchall()
-
-        if rows:
-            cols = [desc[0] for desc in cur.description]
-            df = pd.DataFrame(rows, columns=cols)
-            st.dataframe(df, use_container_width=True)
+        pages = st.session_state.history_pages.get(selected_account_id, 1)
+        try:
+            total = count_history(selected_account_id)
+            # Arrow table goes straight to st.dataframe (no row tuples)
+            history = load_history(selected_account_id, pages)
+        except ValueError as e:
+            # C360_HISTORY_KEY set to a column that isn't unique for this account
+            st.error(str(e))
         else:
-            st.info("No history found for this account.")
+            if history.num_rows:
+                st.caption(f"Showing {history.num_rows:,} of {total:,} history records")
+                st.dataframe(history, use_container_width=True)
+                if history.num_rows < total:
+                    remaining = total - history.num_rows
+                    if st.button(f"Load {min(HISTORY_PAGE_SIZE, remaining):,} more"):
+                        st.session_state.history_pages[selected_account_id] = pages + 1
+                        st.rerun()
+            else:
+                st.info("No history found for this account.")
     else:
         st.warning("No matching accounts found.")
 else:
     st.info("Enter one or more values to search.")
 
+# Rerun duration for metrics - reruns cut short by st.rerun()/st.stop() are finished by the next one's start_rerun
+rerun_trace.finish()
+render_query_diagnostics(rerun_trace)
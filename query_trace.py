@@ -0,0 +1,172 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# --- QUERY TRACING ---
+# Every statement snowflake_connector issues is timed into a QueryRecord: pool
+# checkout (connect), execute, fetch, rows, bytes, Snowflake query id and the
+# disk-cache outcome. Records are collected by the RerunTrace active where the
+# statement was issued - pages start one per rerun - including statements the
+# async engine runs on its own threads on behalf of that rerun (see bind()).
+
+_active = contextvars.ContextVar('c360_rerun_trace', default=None)
+# Process-wide listeners (metrics.py): called with every finished QueryRecord / RerunTrace
+_statement_observers = []
+_rerun_observers = []
+# Process-wide caches by name, registered as they are created, for metrics.py to read
+_caches = {}
+_caches_lock = threading.Lock()
+# st.session_state key holding the session's latest RerunTrace (see start_rerun)
+_SESSION_TRACE = '_c360_rerun_trace'
+
+def elapsed_ms(started) -> float:
+    """Milliseconds since a time.perf_counter() reading"""
+    return (time.perf_counter() - started) * 1000
+
+class QueryRecord:
+    """Timings and result size of one statement (milliseconds / bytes)"""
+
+    def __init__(self, name, sql):
+        self.name = name or 'query'
+        self.sql = ' '.join(sql.split())[:500] if isinstance(sql, str) else '(built on the submitting session)'
+        self.started = time.perf_counter()
+        self.thread = threading.current_thread().name
+        self.connect_ms = 0.0
+        self.execute_ms = 0.0
+        self.fetch_ms = 0.0
+        self.total_ms = None
+        self.rows = None
+        self.bytes = None
+        self.query_id = None
+        self.cache = None  # 'disk' / 'memory' hit, 'miss' (cacheable, fetched), None (not cached)
+        self.error = None
+
+    def set_result(self, result):
+        """Row count and in-memory size of a pa.Table or DataFrame"""
+        self.rows = getattr(result, 'num_rows', None)
+        if self.rows is not None:
+            self.bytes = int(result.nbytes)
+        else:
+            self.rows = len(result)
+            self.bytes = int(result.memory_usage(index=False).sum())
+
+    def to_dict(self, origin=None) -> dict:
+        """Returns: the record as a row, with `start_ms` relative to `origin` (perf_counter)"""
+        return {
+            'name': self.name,
+            'start_ms': round((self.started - origin) * 1000, 1) if origin is not None else None,
+            'connect_ms': round(self.connect_ms, 1),
+            'execute_ms': round(self.execute_ms, 1),
+            'fetch_ms': round(self.fetch_ms, 1),
+            'total_ms': round(self.total_ms or 0.0, 1),
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'cache': self.cache,
+            'query_id': self.query_id,
+            'thread': self.thread,
+            'error': self.error,
+            'sql': self.sql,
+        }
+
+class RerunTrace:
+    """The statements behind one page rerun"""
+
+    def __init__(self, page):
+        self.page = page
+        self.started = time.perf_counter()
+        self.duration_ms = None
+        self._lock = threading.Lock()
+        self._records = []
+
+    def add(self, record):
+        with self._lock:
+            self._records.append(record)
+
+    def records(self) -> list:
+        """Returns: the records so far, in start order"""
+        with self._lock:
+            return sorted(self._records, key=lambda record: record.started)
+
+    def finish(self) -> float:
+        """Mark the end of the rerun (observers hear of it once). Returns: its duration in milliseconds"""
+        if self.duration_ms is None:
+            self.duration_ms = elapsed_ms(self.started)
+            for observer in _rerun_observers:
+                observer(self)
+        return self.duration_ms
+
+def start_rerun(page, session=None) -> RerunTrace:
+    """
+    Begin collecting the statements of this rerun (call at the top of a page).
+    Pass st.session_state as `session`: a previous rerun of the session that never
+    reached finish() - cut short by st.rerun(), st.stop() or a widget change - is
+    finished here, as the rerun replacing it starts.
+    """
+    if session is not None:
+        previous = session.get(_SESSION_TRACE)
+        if previous is not None:
+            previous.finish()
+    trace = RerunTrace(page)
+    _active.set(trace)
+    if session is not None:
+        session[_SESSION_TRACE] = trace
+    return trace
+
+def current_trace():
+    return _active.get()
+
+def add_observer(on_statement=None, on_rerun=None):
+    """Register process-wide callbacks for finished statements and reruns (traced or not)"""
+    if on_statement is not None:
+        _statement_observers.append(on_statement)
+    if on_rerun is not None:
+        _rerun_observers.append(on_rerun)
+
+def register_cache(name, cache):
+    """Make a process-wide cache (anything with stats()) visible to the metrics exporter"""
+    with _caches_lock:
+        _caches[name] = cache
+
+def registered_caches() -> dict:
+    """Returns: {name: cache} for the caches created so far in this process"""
+    with _caches_lock:
+        return dict(_caches)
+
+def bind(coro):
+    """Wrap a coroutine so it records into the trace active where bind() is called"""
+    trace = _active.get()
+
+    async def bound():
+        _active.set(trace)
+        return await coro
+
+    return bound()
+
+@contextmanager
+def statement(name, sql):
+    """
+    Time one statement:
+        with statement('search_page', sql) as record:
+            record.execute_ms = ...
+    The total, and any error, are filled in on exit.
+    """
+    trace = _active.get()
+    record = QueryRecord(name, sql)
+    try:
+        yield record
+    except BaseException as e:
+        record.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        record.total_ms = elapsed_ms(record.started)
+        if trace is not None:
+            trace.add(record)
+        for observer in _statement_observers:
+            observer(record)
+
+def record_cache_hit(name, cache, rows=None):
+    """Note a lookup fully answered by an in-process cache (no statement sent)"""
+    with statement(name, '') as record:
+        record.cache = cache
+        record.rows = rows
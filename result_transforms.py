@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+
+# --- VECTORIZED RESULT SHAPING ---
+# Column-mask replacements for the row-wise df.apply(..., axis=1) helpers the
+# pages used to run. Everything here works on whole columns at once and leaves
+# non-text columns in their original dtype.
+
+ACTIVITY_INDICATOR = ' 🟢'
+TRUE_VALUES = ['true', '1', 'yes']
+FALSE_VALUES = ['false', '0', 'no']
+
+def _has_value(series: pd.Series) -> np.ndarray:
+    """Mask of cells that are non-null and not blank"""
+    return (series.notna() & (series.astype(str).str.strip() != '')).to_numpy()
+
+def id_priority(df: pd.DataFrame) -> np.ndarray:
+    """
+    ID-completeness ranking for every row (same rules as PRIORITY_SQL in account_search):
+    1 = Gamechanger + AMP Customer + Firefly, 2 = Gamechanger + AMP, 3 = only Gamechanger, 4 = everything else
+    """
+    has_gc = _has_value(df['Gamechanger ID'])
+    has_amp = _has_value(df['AMP Customer ID']) & (df['AMP Customer ID'].astype(str).str.strip() != '0').to_numpy()
+    has_ff = _has_value(df['Firefly ID'])
+
+    return np.select(
+        [has_gc & has_amp & has_ff, has_gc & has_amp, has_gc],
+        [1, 2, 3],
+        default=4
+    ).astype(np.int8)
+
+def rank_accounts(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Order accounts by (priority, name, _ROW_ID when present) with one lexsort.
+    Returns: the ranked frame with a `_PRIORITY` column
+    """
+    priority = id_priority(df)
+    keys = [df['Name'].to_numpy().astype(str), priority]
+    if '_ROW_ID' in df.columns:
+        keys.insert(0, df['_ROW_ID'].to_numpy().astype(str))
+    order = np.lexsort(keys)
+
+    ranked = df.iloc[order].copy()
+    ranked['_PRIORITY'] = priority[order]
+    return ranked
+
+def bool_glyphs(series: pd.Series) -> pd.Series:
+    """Map truthy/falsy cells to ✅ / ✗ (anything else, including nulls, becomes '')"""
+    values = series.astype(str).str.strip().str.lower()
+    glyphs = np.select(
+        [values.isin(TRUE_VALUES).to_numpy() & series.notna().to_numpy(),
+         values.isin(FALSE_VALUES).to_numpy() & series.notna().to_numpy()],
+        ['✅', '✗'],
+        default=''
+    )
+    return pd.Series(glyphs, index=series.index, dtype=object)
+
+def fill_text_nulls(df: pd.DataFrame) -> pd.DataFrame:
+    """fillna('') for text columns only - numeric and date columns keep their dtypes"""
+    text_columns = df.select_dtypes(include=['object', 'string']).columns
+    if len(text_columns) == 0:
+        return df
+    return df.fillna({column: '' for column in text_columns})
+
+def activity_lookup_ids(page_df: pd.DataFrame) -> list:
+    """
+    Input for check_activity_exists: [{'sf_id': ..., 'amp_id': ...}, ...]
+    The AMP value keeps the full comma-separated string ("1226698, 1794016").
+    """
+    has_sf = _has_value(page_df['Gamechanger ID'])
+    has_amp = page_df['AMP Customer ID'].notna().to_numpy()
+    return [
+        {'sf_id': sf_id if sf_ok else None, 'amp_id': amp_id if amp_ok else None}
+        for sf_id, sf_ok, amp_id, amp_ok in zip(
+            page_df['Gamechanger ID'].tolist(), has_sf, page_df['AMP Customer ID'].tolist(), has_amp
+        )
+    ]
+
+def decorate_ids(page_df: pd.DataFrame, activity_status: dict) -> pd.DataFrame:
+    """
+    Add a green circle to every Gamechanger ID and every individual AMP ID with activity.
+    activity_status has the check_activity_exists format: {id: {'has_sf': bool, 'has_amp': bool}}
+    """
+    sf_active = {key for key, status in activity_status.items() if status.get('has_sf')}
+    amp_active = {key for key, status in activity_status.items() if status.get('has_amp')}
+    out = page_df.copy()
+
+    # Gamechanger ID - one ID per row
+    gc = page_df['Gamechanger ID']
+    gc_present = _has_value(gc)
+    gc_str = gc.astype(str)
+    out['Gamechanger ID'] = np.where(
+        gc_present,
+        np.where(gc_str.isin(sf_active), gc_str + ACTIVITY_INDICATOR, gc_str),
+        ''
+    )
+
+    # AMP Customer ID(s) - explode the comma-separated lists, decorate, re-join per row
+    amp = page_df['AMP Customer ID']
+    amp_str = amp.astype(str).str.strip()
+    amp_present = pd.Series(_has_value(amp) & (amp_str != '0').to_numpy(), index=amp.index)
+    single_ids = amp_str[amp_present].str.split(',').explode().str.strip()
+    decorated = single_ids.where(~single_ids.isin(amp_active), single_ids + ACTIVITY_INDICATOR)
+    joined = decorated.groupby(level=0, sort=False).agg(', '.join)
+    out['AMP Customer ID'] = joined.reindex(amp.index).fillna('').astype(object)
+
+    return out
+
+def shape_search_page(page_df: pd.DataFrame, activity_status: dict) -> pd.DataFrame:
+    """Indicators, LLO glyphs and text-null filling for one page of search results"""
+    out = decorate_ids(page_df, activity_status)
+    out['LLO'] = bool_glyphs(page_df['LLO'])
+    return fill_text_nulls(out)
+
+def shape_sf_activity(df: pd.DataFrame) -> pd.DataFrame:
+    """Salesforce activity table: blank text nulls, 'None' closed dates and pipeline glyphs"""
+    out = fill_text_nulls(df)
+    out['CLOSED_DATE'] = out['CLOSED_DATE'].replace('None', '')
+    out['PIPELINE_ACTIVITY'] = bool_glyphs(df['PIPELINE_ACTIVITY'])
+    return out
+
+MAP_BIN_COLUMNS = ["LATITUDE", "LONGITUDE", "COUNT", "Name"]
+
+def bin_map_points(points: pd.DataFrame, cell_degrees: float) -> pd.DataFrame:
+    """
+    Aggregate map points into a lat/lon grid: one marker per occupied cell at the
+    cell's centroid, with its point count and the first account name (by name) in it.
+    Same output as the server-side binning in account_search.
+    """
+    if points.empty:
+        return pd.DataFrame(columns=MAP_BIN_COLUMNS)
+    lat = points['LATITUDE'].to_numpy(dtype=np.float64)
+    lon = points['LONGITUDE'].to_numpy(dtype=np.float64)
+    cells = np.column_stack([np.floor(lat / cell_degrees), np.floor(lon / cell_degrees)])
+    _, cell_of_point, counts = np.unique(cells, axis=0, return_inverse=True, return_counts=True)
+    cell_of_point = cell_of_point.ravel()
+
+    # First name per cell: sort by (cell, name) and take each run's head
+    names = points['Name'].astype(str).to_numpy()
+    order = np.lexsort((names, cell_of_point))
+    heads = order[np.r_[0, np.flatnonzero(np.diff(cell_of_point[order])) + 1]]
+
+    return pd.DataFrame({
+        'LATITUDE': np.bincount(cell_of_point, weights=lat) / counts,
+        'LONGITUDE': np.bincount(cell_of_point, weights=lon) / counts,
+        'COUNT': counts,
+        'Name': names[heads]
+    })
@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# --- PREFIX-REUSE SEARCH RESULT CACHE ---
+# Complete (never truncated) ranked search results keyed by search key
+# (normalized term, city, state). Because every match for "mari" in Texas is
+# also a match for "mar" in any state, a new search can be answered by
+# filtering the cached result of any broader search.
+
+class SearchResultCache:
+    """
+    Thread-safe LRU of ranked search frames, bounded by total bytes and entry age.
+    Only store complete results - refinement relies on the superset being whole.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, max_age=600):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # search key -> (frame, nbytes, fetched_at)
+        self._bytes = 0
+        self._version = None
+        self.hits = 0
+        self.refinements = 0
+        self.misses = 0
+
+    def sync_version(self, version):
+        """Drop everything when the source data version changes (None = unknown, keep entries)"""
+        if version is None:
+            return
+        with self._lock:
+            if self._version is not None and version != self._version:
+                self._entries.clear()
+                self._bytes = 0
+            self._version = version
+
+    def _expired(self, fetched_at) -> bool:
+        return time.time() - fetched_at > self.max_age
+
+    def _drop(self, key):
+        _, nbytes, _ = self._entries.pop(key)
+        self._bytes -= nbytes
+
+    @staticmethod
+    def _covers(broader, key) -> bool:
+        """Every match for `key` is also a match for `broader`"""
+        return (broader.term in key.term
+                and broader.city in (None, key.city)
+                and broader.state in (None, key.state))
+
+    def get(self, key):
+        """Exact hit for a search key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry[2]):
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def refine(self, key):
+        """
+        Answer `key` from the smallest cached result of a search that covers it.
+        Returns: the filtered frame (already ranked - filtering keeps the order), or None
+        """
+        with self._lock:
+            best = None
+            for cached_key, (frame, _, fetched_at) in list(self._entries.items()):
+                if self._expired(fetched_at):
+                    self._drop(cached_key)
+                    continue
+                if self._covers(cached_key, key) and (best is None or len(frame) < len(best[1])):
+                    best = (cached_key, frame, fetched_at)
+            if best is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best[0])
+
+        _, frame, fetched_at = best
+        if frame.empty:
+            refined = frame
+        else:
+            mask = np.ones(len(frame), dtype=bool)
+            if key.term:
+                mask &= frame['Name'].astype(str).str.lower().str.contains(key.term, regex=False).to_numpy()
+            if key.city:
+                mask &= (frame['City'] == key.city).to_numpy(dtype=bool, na_value=False)
+            if key.state:
+                mask &= (frame['State'] == key.state).to_numpy(dtype=bool, na_value=False)
+            refined = frame[mask]
+
+        # A refined result is only as fresh as the result it came from
+        self.put(key, refined, fetched_at=fetched_at)
+        with self._lock:
+            self.refinements += 1
+        return refined
+
+    def put(self, key, frame: pd.DataFrame, fetched_at=None):
+        """Store a complete ranked result; evicts least-recently-used entries past max_bytes"""
+        nbytes = int(frame.memory_usage(index=True, deep=True).sum())
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (frame, nbytes, fetched_at or time.time())
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def stats(self) -> dict:
+        """Returns: entry count, bytes held and hit/refine/miss counters"""
+        with self._lock:
+            return {
+                'entries': len(self._entries), 'bytes': self._bytes,
+                'hits': self.hits, 'refinements': self.refinements, 'misses': self.misses
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
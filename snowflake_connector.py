@@ -1,12 +1,63 @@
-import snowflake.connector
 import streamlit as st
+# pandas / numpy / pyarrow stay module-level on purpose: every page renders query
+# results, and this module's own imports (activity_cache, disk_cache, identity_graph,
+# activity_index) load them too, so deferring them here would not save any import
+# time. Pages send their config and first markup before importing this module.
+import numpy as np
 import pandas as pd
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives import serialization
-from concurrent.futures import ThreadPoolExecutor
+import pyarrow as pa
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from identity_graph import IdentityGraph
+from activity_index import ActivityIndex
+from activity_cache import ActivityFrameCache, ActivityPage
+from disk_cache import DiskResultCache, statement_fingerprint
+from freshness import TableVersions
+import query_trace
 
-def get_snowflake_connection():
-    # Load the private key properly
+# --- BACKEND ---
+# C360_BACKEND=local runs every statement against a DuckDB file built by
+# synthetic_data.py instead of Snowflake (offline development and benchmarks).
+BACKEND = os.environ.get("C360_BACKEND", "snowflake")
+LOCAL_DB_PATH = os.environ.get("C360_LOCAL_DB", "c360_local.duckdb")
+# Optional JSON of recorded per-statement latencies the local backend adds (see local_backend.LatencyProfile)
+LOCAL_LATENCY_PROFILE = os.environ.get("C360_LOCAL_LATENCY")
+
+# --- LAZY DRIVER IMPORT ---
+# snowflake.connector alone takes about a second to import; it is loaded on the
+# first connection instead of when a page imports this module, so pages paint
+# before any driver code is loaded.
+def _snowflake():
+    """The driver module (snowflake.connector, or local_backend), imported on first use"""
+    if BACKEND == "local":
+        import local_backend
+        return local_backend
+    import snowflake.connector
+    return snowflake.connector
+
+# --- CONNECTION POOL SETTINGS ---
+POOL_MAX_SIZE = 4             # Max concurrent sessions per process
+POOL_ACQUIRE_TIMEOUT = 30     # Seconds to wait for a free session
+POOL_VALIDATE_AFTER = 300     # Ping idle sessions older than this before reuse
+POOL_MAX_LIFETIME = 3600 * 3  # Recycle sessions after 3 hours
+
+@st.cache_resource
+def _get_private_key_der() -> bytes:
+    """
+    Parse the PEM private key from secrets once per process.
+    Returns: the key serialized to DER/PKCS8 (what Snowflake expects)
+    """
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import serialization
+    
     private_key_str = st.secrets["snowflake"]["private_key"]
     
     # Convert the private key string to bytes
@@ -17,300 +68,1275 @@ def get_snowflake_connection():
     )
     
     # Serialize to DER format (what Snowflake expects)
-    pkb = p_key.private_bytes(
+    return p_key.private_bytes(
         encoding=serialization.Encoding.DER,
         format=serialization.PrivateFormat.PKCS8,
         encryption_algorithm=serialization.NoEncryption()
     )
-    
-    return snowflake.connector.connect(
+
+def get_snowflake_connection():
+    """
+    Open a brand-new authenticated session.
+    Prefer pooled_connection() - this pays the full login handshake.
+    """
+    if BACKEND == "local":
+        return _snowflake().connect(LOCAL_DB_PATH, latency_profile=LOCAL_LATENCY_PROFILE)
+    return _snowflake().connect(
         user=st.secrets["snowflake"]["user"],
         account=st.secrets["snowflake"]["account"],
         warehouse=st.secrets["snowflake"]["warehouse"],
         database=st.secrets["snowflake"]["database"],
         schema=st.secrets["snowflake"]["schema"],
         role=st.secrets["snowflake"]["role"],
-        private_key=pkb
+        private_key=_get_private_key_der(),
+        client_session_keep_alive=True,
+        # Bind parameters server-side: the statement text stays the same for every
+        # value (the default pyformat style pastes values into the SQL client-side)
+        paramstyle='qmark'
     )
 
-@st.cache_data(ttl=1800)  # Cache for 30 minutes
-def get_product_activity_by_gamechanger_id(account18_id: str) -> pd.DataFrame:
-    conn = get_snowflake_connection()
-    query = """
-        SELECT 
-            p.TF_ACTIVITYSTARTDATE__C,
-            p.TF_MEETINGCLOSEDDATEONLY__C,
-            p.TF_ACTIVITYSTATUS__C,
-            p.TF_PRODUCT_NAME__C,
-            p.TF_PRODUCT_SKU__C,
-            p.TF_PRODUCT_PACK__C,
-            p.TF_PRODUCTCLIENTNAME__C,
-            p.TF_PRODUCTCATEGORY__C,
-            p.PIPELINE_ACTIVITY__C,
-            p.PRODUCTSTATUS__C,
-            p.QUANTITY_ENTERED__C,
-            p.WHAT_ARE_NEXT_STEPS__C
-        FROM PROD_DWH.DWH.DIM_ACCOUNT a
-        JOIN PROD_DWH.DWH.DIM_PRODUCTACTIVITY p
-            ON a.ACCOUNT_UUID = p.ACCOUNT_OPPERATOR_UUID
-        WHERE a.SF_ACCOUNT18_ID__C = %s
-        ORDER BY p.TF_ACTIVITYSTARTDATE__C DESC
-        LIMIT 500
+class SnowflakeConnectionPool:
     """
-    try:
-        df = pd.read_sql(query, conn, params=(account18_id,))
+    Bounded, thread-safe pool of Snowflake sessions.
+    Connections are checked out with acquire() / checked back in with release(),
+    or more simply via the connection() context manager.
+    """
+    
+    def __init__(self, connect_fn, max_size=POOL_MAX_SIZE,
+                 validate_after=POOL_VALIDATE_AFTER, max_lifetime=POOL_MAX_LIFETIME):
+        self._connect_fn = connect_fn
+        self.max_size = max_size
+        self.validate_after = validate_after
+        self.max_lifetime = max_lifetime
+        self._lock = threading.Condition()
+        self._idle = []      # [(conn, created_at, last_used_at), ...] - LIFO
+        self._created = {}   # id(conn) -> created_at for every open session
+        self._in_use = 0
+    
+    def _is_healthy(self, conn, created_at, last_used_at) -> bool:
+        """Cheap checks first, then a round-trip ping for long-idle sessions"""
+        now = time.time()
+        if conn.is_closed() or now - created_at > self.max_lifetime:
+            return False
+        if now - last_used_at > self.validate_after:
+            try:
+                cur = conn.cursor()
+                try:
+                    cur.execute("SELECT 1")
+                finally:
+                    cur.close()
+            except Exception:
+                return False
+        return True
+    
+    def _discard(self, conn):
+        """Forget a session and close it (call without holding the lock - close may block)"""
+        with self._lock:
+            self._created.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+    
+    def acquire(self, timeout=POOL_ACQUIRE_TIMEOUT):
+        """
+        Check out a healthy session, opening a new one if the pool has room.
+        Raises TimeoutError if every session stays busy for `timeout` seconds.
+        """
+        deadline = time.time() + timeout
+        while True:
+            idle = placeholder = None
+            with self._lock:
+                while True:
+                    # Reuse the most recently returned session first (warmest)
+                    if self._idle:
+                        idle = self._idle.pop()
+                        self._in_use += 1
+                        break
+                    
+                    if len(self._created) < self.max_size:
+                        # Reserve the slot before connecting outside the lock
+                        self._in_use += 1
+                        placeholder = object()
+                        self._created[id(placeholder)] = time.time()
+                        break
+                    
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise TimeoutError("Timed out waiting for a Snowflake connection")
+                    self._lock.wait(remaining)
+            
+            if placeholder is not None:
+                break
+            
+            # Validated outside the lock - the ping must not stall other acquires
+            conn, created_at, last_used_at = idle
+            if self._is_healthy(conn, created_at, last_used_at):
+                return conn
+            self._discard(conn)
+            with self._lock:
+                self._in_use -= 1
+                self._lock.notify()
         
-        # Rename columns after fetching
-        df = df.rename(columns={
-            'TF_ACTIVITYSTARTDATE__C': 'START_DATE',
-            'TF_MEETINGCLOSEDDATEONLY__C': 'CLOSED_DATE',
-            'TF_ACTIVITYSTATUS__C': 'ACTIVITY_STATUS',
-            'TF_PRODUCT_NAME__C': 'PRODUCT_NAME',
-            'TF_PRODUCT_SKU__C': 'PRODUCT_SKU',
-            'TF_PRODUCT_PACK__C': 'PRODUCT_PACK',
-            'TF_PRODUCTCLIENTNAME__C': 'CLIENT_NAME',
-            'TF_PRODUCTCATEGORY__C': 'PRODUCT_CATEGORY',
-            'PIPELINE_ACTIVITY__C': 'PIPELINE_ACTIVITY',
-            'PRODUCTSTATUS__C': 'PRODUCT_STATUS',
-            'QUANTITY_ENTERED__C': 'QUANTITY_SOLD',
-            'WHAT_ARE_NEXT_STEPS__C': 'NEXT_STEPS'
-        })
+        try:
+            conn = self._connect_fn()
+        except Exception:
+            with self._lock:
+                self._created.pop(id(placeholder), None)
+                self._in_use -= 1
+                self._lock.notify()
+            raise
         
-        return df
+        with self._lock:
+            self._created[id(conn)] = self._created.pop(id(placeholder), time.time())
+        return conn
+    
+    def release(self, conn, discard=False):
+        """Check a session back in; broken sessions are evicted"""
+        with self._lock:
+            self._in_use -= 1
+            keep = not (discard or conn.is_closed() or id(conn) not in self._created)
+            if keep:
+                self._idle.append((conn, self._created[id(conn)], time.time()))
+            self._lock.notify()
+        if not keep:
+            self._discard(conn)
+    
+    @contextmanager
+    def connection(self):
+        """Check out a session for the duration of a with-block"""
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except (_snowflake().errors.OperationalError,
+                _snowflake().errors.InterfaceError):
+            # The session itself may be unusable - don't hand it out again
+            discard = True
+            raise
+        finally:
+            self.release(conn, discard=discard)
+    
+    def stats(self) -> dict:
+        """Returns: {'size': open sessions, 'in_use': checked out, 'idle': available}"""
+        with self._lock:
+            return {'size': len(self._created), 'in_use': self._in_use, 'idle': len(self._idle)}
+    
+    def close_all(self):
+        """Close every idle session (checked-out sessions and ones being opened are left alone)"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _, _ in idle:
+            self._discard(conn)
+
+@st.cache_resource
+def get_connection_pool() -> SnowflakeConnectionPool:
+    """Process-wide pool shared by every Streamlit session"""
+    return SnowflakeConnectionPool(get_snowflake_connection)
+
+def pooled_connection():
+    """
+    Borrow a pooled Snowflake session:
+        with pooled_connection() as conn:
+            ...
+    """
+    return get_connection_pool().connection()
+
+# --- IN-FLIGHT QUERY TRACKING ---
+class QueryCancelledError(Exception):
+    """Raised in a statement that was cancelled because a newer one superseded it"""
+
+_inflight_lock = threading.Lock()
+_inflight = {}  # (streamlit session id, cancel_key) -> Snowflake query id
+CANCEL_THREADS = 2  # Threads issuing cancels of superseded statements (bounds cancel bursts)
+TRACKED_POLL_START = 0.02  # First status poll of a cancellable statement (seconds)...
+TRACKED_POLL_MAX = 0.25    # ...doubling up to this - interactive statements, so poll often
+_cancel_executor = ThreadPoolExecutor(max_workers=CANCEL_THREADS, thread_name_prefix='query-cancel')
+
+def _current_session_id():
+    """Streamlit session of the calling script thread (None outside a script run)"""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx else None
+
+def cancel_query(query_id, conn=None):
+    """
+    Abort a running statement by query id (best effort - it may already be done),
+    on `conn` when given (a session the caller holds), else on a pooled session
+    """
+    try:
+        with query_trace.statement('cancel', "SELECT SYSTEM$CANCEL_QUERY(%s)"):
+            if conn is not None:
+                _execute(conn, "SELECT SYSTEM$CANCEL_QUERY(%s)", (query_id,)).close()
+                return
+            with pooled_connection() as conn:
+                _execute(conn, "SELECT SYSTEM$CANCEL_QUERY(%s)", (query_id,)).close()
+    except Exception:
+        pass
+
+def cancel_session_queries(cancel_key=None):
+    """Cancel this session's in-flight statements (all of them, or just one cancel_key)"""
+    session_id = _current_session_id()
+    with _inflight_lock:
+        slots = [slot for slot in _inflight
+                 if slot[0] == session_id and (cancel_key is None or slot[1] == cancel_key)]
+        query_ids = [_inflight.pop(slot) for slot in slots]
+    if not query_ids:
+        return
+    try:
+        with pooled_connection() as conn:
+            for query_id in query_ids:
+                cancel_query(query_id, conn)
+    except Exception:
+        pass
+
+def _execute_tracked(conn, cur, query, params, cancel_key):
+    """
+    Submit asynchronously so the query id is known up front, register it under
+    (session, cancel_key), cancel whatever statement that slot held before, and
+    wait until this one has finished - it stays cancellable by a newer statement
+    for its whole run. A statement cancelled that way raises QueryCancelledError.
+    """
+    session_id = _current_session_id()
+    if session_id is None:
+        cur.execute(query, params)
+        return
+    
+    slot = (session_id, cancel_key)
+    cur.execute_async(query, params)
+    query_id = cur.sfqid
+    with _inflight_lock:
+        superseded = _inflight.get(slot)
+        _inflight[slot] = query_id
+    if superseded:
+        # On a pooled session of its own - `conn` is this statement's, and goes back
+        # to the pool (to someone else) as soon as it finishes
+        _cancel_executor.submit(cancel_query, superseded)
+    
+    try:
+        # get_results_from_sfqid doesn't wait (the connector waits when the result is
+        # first fetched), so poll for completion here, while the slot is registered
+        delay = TRACKED_POLL_START
+        while conn.is_still_running(conn.get_query_status_throw_if_error(query_id)):
+            time.sleep(delay)
+            delay = min(delay * 2, TRACKED_POLL_MAX)
+        cur.get_results_from_sfqid(query_id)
+    except _snowflake().errors.Error:
+        with _inflight_lock:
+            was_superseded = _inflight.get(slot) != query_id
+        if was_superseded:
+            raise QueryCancelledError(f"Query {query_id} was superseded by a newer '{cancel_key}' query")
+        raise
     finally:
-        conn.close()
+        with _inflight_lock:
+            if _inflight.get(slot) == query_id:
+                del _inflight[slot]
 
-@st.cache_data(ttl=1800)  # Cache for 30 minutes
-def get_amp_activity_by_customer_id(amp_ampcustomer_id) -> pd.DataFrame:
-    conn = get_snowflake_connection()
+# --- PERSISTENT RESULT CACHE ---
+# Second tier under the in-memory caches: results survive restarts and are shared
+# by every process the app's user runs on the host. The directory is per user and
+# private (see disk_cache.py), never the shared temp dir. Set C360_DISK_CACHE=0 to turn it off.
+DISK_CACHE_ENABLED = os.environ.get("C360_DISK_CACHE", "1") == "1"
+DISK_CACHE_DIR = os.environ.get("C360_DISK_CACHE_DIR", os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "c360", "query_cache"))
+DISK_CACHE_MAX_BYTES = int(os.environ.get("C360_DISK_CACHE_MB", "1024")) * 1024 * 1024
+
+@st.cache_resource
+def get_disk_cache():
+    """Process-wide handle on the on-disk result cache (None when disabled or unusable)"""
+    if not DISK_CACHE_ENABLED:
+        return None
+    try:
+        cache = DiskResultCache(DISK_CACHE_DIR, max_bytes=DISK_CACHE_MAX_BYTES)
+    except OSError:
+        return None
+    query_trace.register_cache('disk', cache)
+    return cache
+
+# --- SOURCE TABLE FRESHNESS ---
+# Cache entries tagged with the tables they read stay valid until a load alters
+# one of those tables (probed every FRESHNESS_PROBE_INTERVAL), rather than
+# expiring on a fixed TTL. Set C360_FRESHNESS=0 to fall back to plain TTLs.
+FRESHNESS_ENABLED = os.environ.get("C360_FRESHNESS", "1") == "1"
+FRESHNESS_PROBE_INTERVAL = 60
+SOURCE_TABLES = ('DIM_ACCOUNT', 'DIM_PRODUCTACTIVITY', 'FACT_AMP_PURCHASE_DATA', 'DIM_PRODUCT', 'ACCOUNT_HISTORY')
+
+ACCOUNT_TABLES = ('DIM_ACCOUNT',)
+SF_ACTIVITY_TABLES = ('DIM_ACCOUNT', 'DIM_PRODUCTACTIVITY')
+AMP_ACTIVITY_TABLES = ('FACT_AMP_PURCHASE_DATA', 'DIM_ACCOUNT', 'DIM_PRODUCT')
+AMP_PURCHASE_TABLES = ('FACT_AMP_PURCHASE_DATA',)
+HISTORY_TABLES = ('ACCOUNT_HISTORY',)
+
+def _probe_table_versions() -> dict:
+    """Returns: {table name: LAST_ALTERED in epoch milliseconds} - one metadata query"""
+    table_list = ', '.join(f"'{table}'" for table in SOURCE_TABLES)
+    df = run_query(f"""
+        SELECT TABLE_NAME, DATE_PART(EPOCH_MILLISECOND, LAST_ALTERED) AS "LAST_ALTERED_MS"
+        FROM PROD_DWH.INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA = 'DWH'
+          AND TABLE_NAME IN ({table_list})
+    """, name='freshness')
+    return {str(table): int(ms) for table, ms in zip(df['TABLE_NAME'], df['LAST_ALTERED_MS'])}
+
+@st.cache_resource
+def get_table_versions() -> TableVersions:
+    """Process-wide last-altered tracker for SOURCE_TABLES"""
+    return TableVersions(_probe_table_versions, probe_interval=FRESHNESS_PROBE_INTERVAL)
+
+def source_version(tables):
+    """Current version token of the given source tables (None = unknown, use plain TTLs)"""
+    if not FRESHNESS_ENABLED or not tables:
+        return None
+    return get_table_versions().version(tables)
+
+def _disk_cached(query, params, max_age, fetch, as_pandas, tables=None, record=None):
+    """
+    Serve a statement from the disk cache, or run `fetch()` and store its result.
+    `tables` are the source tables the statement reads (freshness tagging).
+    `record` (query_trace) is marked as a disk hit or miss.
+    Returns: DataFrame or pa.Table, matching `as_pandas`
+    """
+    cache = get_disk_cache()
+    if cache is None:
+        return fetch()
+    key = statement_fingerprint(query, params)
+    version = source_version(tables)
+    table = cache.get(key, max_age, version)
+    if table is not None:
+        if record is not None:
+            record.cache = 'disk'
+        return table.to_pandas() if as_pandas else table
+    if record is not None:
+        record.cache = 'miss'
+    result = fetch()
+    cache.put(key, result, version)
+    return result
+
+# --- ARROW FETCH LAYER ---
+_QUOTED_OR_PARAM = re.compile(r"'(?:[^']|'')*'|\"[^\"]*\"|%s")
+
+def _qmark(query):
+    """
+    The app writes placeholders as %s; sessions bind server-side (qmark), so they are
+    sent as ? - string literals and quoted names are left alone.
+    """
+    if not isinstance(query, str) or '%s' not in query:
+        return query
+    return _QUOTED_OR_PARAM.sub(lambda m: '?' if m.group(0) == '%s' else m.group(0), query)
+
+def _execute(conn, query, params, cancel_key=None):
+    """
+    Run a statement on a fresh cursor. Returns: the open cursor
+    With a `cancel_key`, a newer statement under the same key in the same
+    Streamlit session cancels this one (typeahead searches use 'search').
+    """
+    cur = conn.cursor()
+    try:
+        if cancel_key is None:
+            cur.execute(_qmark(query), params)
+        else:
+            _execute_tracked(conn, cur, _qmark(query), params, cancel_key)
+    except Exception:
+        cur.close()
+        raise
+    return cur
+
+def _empty_arrow_table(cur) -> pa.Table:
+    """Zero-row table that still carries the result's column names"""
+    names = [desc[0] for desc in cur.description or []]
+    return pa.table({name: pa.array([], type=pa.null()) for name in names})
+
+def _fetch_arrow(cur) -> pa.Table:
+    """
+    Concatenate the cursor's Arrow result batches into one table.
+    Falls back to row fetches for statements without an Arrow result (SHOW, DDL, ...).
+    """
+    try:
+        batches = list(cur.fetch_arrow_batches())
+    except _snowflake().errors.NotSupportedError:
+        rows = cur.fetchall()
+        names = [desc[0] for desc in cur.description or []]
+        return pa.Table.from_pylist([dict(zip(names, row)) for row in rows]) if rows else _empty_arrow_table(cur)
+    if not batches:
+        return _empty_arrow_table(cur)
+    return pa.concat_tables(batches, promote_options="default")
+
+def _fetch_pandas(cur) -> pd.DataFrame:
+    """The cursor's result as a DataFrame built column-wise from Arrow batches"""
+    try:
+        df = cur.fetch_pandas_all()
+    except _snowflake().errors.NotSupportedError:
+        return _fetch_arrow(cur).to_pandas()
+    if df.empty and len(df.columns) == 0:
+        # Older connectors drop the schema on empty results
+        df = pd.DataFrame(columns=[desc[0] for desc in cur.description or []])
+    return df
+
+def _fetch_on(conn, query, params, cancel_key, as_pandas, record):
+    """Execute on a session you hold and fetch the whole result, timing both into `record`"""
+    started = time.perf_counter()
+    # Returns once the statement has finished (tracked statements wait for it
+    # explicitly), so warehouse time lands in execute_ms, not fetch_ms
+    cur = _execute(conn, query, params, cancel_key)
+    record.execute_ms = query_trace.elapsed_ms(started)
+    record.query_id = cur.sfqid
+    try:
+        started = time.perf_counter()
+        result = _fetch_pandas(cur) if as_pandas else _fetch_arrow(cur)
+        record.fetch_ms = query_trace.elapsed_ms(started)
+    finally:
+        cur.close()
+    record.set_result(result)
+    return result
+
+def _run_statement(query, params, conn, cancel_key, cache_ttl, tables, name, as_pandas):
+    with query_trace.statement(name, query) as record:
+        def fetch():
+            if conn is not None:
+                return _fetch_on(conn, query, params, cancel_key, as_pandas, record)
+            started = time.perf_counter()
+            with pooled_connection() as pooled:
+                record.connect_ms = query_trace.elapsed_ms(started)
+                return _fetch_on(pooled, query, params, cancel_key, as_pandas, record)
+        
+        if cache_ttl:
+            return _disk_cached(query, params, cache_ttl, fetch, as_pandas, tables, record)
+        return fetch()
+
+def run_query_arrow(query, params=None, conn=None, cancel_key=None, cache_ttl=None, tables=None, name=None) -> pa.Table:
+    """
+    Execute a query and keep the result in Arrow (no per-row Python objects).
+    Arrow tables can be handed straight to st.dataframe.
+    Pass `conn` to reuse a session you already hold, otherwise one is borrowed from the pool.
+    With `cache_ttl` (seconds) the result is read from / written to the disk cache,
+    invalidated early when one of `tables` changes.
+    `name` labels the statement in query traces.
+    """
+    return _run_statement(query, params, conn, cancel_key, cache_ttl, tables, name, as_pandas=False)
+
+def run_query(query, params=None, conn=None, cancel_key=None, cache_ttl=None, tables=None, name=None) -> pd.DataFrame:
+    """
+    Execute a query and return a DataFrame built column-wise from Arrow batches
+    (replaces pd.read_sql, which goes through the DBAPI one row at a time).
+    With `cache_ttl` (seconds) the result is read from / written to the disk cache,
+    invalidated early when one of `tables` changes.
+    `name` labels the statement in query traces.
+    """
+    return _run_statement(query, params, conn, cancel_key, cache_ttl, tables, name, as_pandas=True)
+
+# --- ID LIST BINDING ---
+ID_LIST_STAGE_THRESHOLD = 10000  # Bigger lists are staged into a session temp table
+_ID_LIST_TYPES = {'VARCHAR': str, 'INTEGER': int}
+
+def bind_id_list(conn, ids, sql_type='VARCHAR'):
+    """
+    Bind a list of IDs as ONE parameter (a JSON array flattened server-side), so the
+    statement text is the same for every list instead of one %s per ID - the array is
+    bound server-side (qmark sessions), never pasted into the SQL.
+    Lists above ID_LIST_STAGE_THRESHOLD are bulk-inserted into a temporary table on
+    `conn` instead - run the query on that same connection, and keep the session
+    checked out until the query has finished (the next staging truncates the table).
+    Smaller lists never touch `conn`, which may then be None.
+    Returns: (subquery_sql, params) for use as `column IN {subquery_sql}`
+    """
+    if sql_type not in _ID_LIST_TYPES:
+        raise ValueError(f"Unsupported ID list type: {sql_type}")
+    convert = _ID_LIST_TYPES[sql_type]
+    ids = list(dict.fromkeys(convert(x) for x in ids))  # de-duplicate, keep order
+    
+    if len(ids) <= ID_LIST_STAGE_THRESHOLD:
+        return f"(SELECT VALUE::{sql_type} FROM TABLE(FLATTEN(INPUT => PARSE_JSON(%s))))", [json.dumps(ids)]
+    
+    table = f"C360_ID_LIST_{sql_type}"
+    with query_trace.statement('id_list_stage', f"INSERT INTO {table} (ID) VALUES (?)") as record:
+        cur = conn.cursor()
+        try:
+            cur.execute(f"CREATE TEMPORARY TABLE IF NOT EXISTS {table} (ID {sql_type})")
+            cur.execute(f"TRUNCATE TABLE {table}")
+            cur.executemany(f"INSERT INTO {table} (ID) VALUES (?)", [(x,) for x in ids])
+        finally:
+            cur.close()
+        record.rows = len(ids)
+    return f"(SELECT ID FROM {table})", []
+
+# --- ASYNC QUERY ENGINE ---
+ENGINE_IO_THREADS = 2     # Threads for the short blocking calls (submit, status, fetch)
+ENGINE_POLL_START = 0.05  # First status poll after submitting (seconds)...
+ENGINE_POLL_MAX = 1.0     # ...doubling up to this interval
+
+class AsyncQueryEngine:
+    """
+    Runs statements with execute_async on one event-loop thread and awaits them by query id.
+    A running statement holds neither a thread nor a session: pooled sessions are borrowed
+    only for the submit and the final fetch, and every status poll goes through one
+    session of the engine's own (opened with `connect_fn`, default the pool's), so many
+    independent queries overlap over a few sessions and ENGINE_IO_THREADS threads.
+    (A statement that reads a staged ID list keeps its submitting session until it has finished.)
+    """
+    
+    def __init__(self, pool, disk_cache=None, io_threads=ENGINE_IO_THREADS, connect_fn=None):
+        self._pool = pool
+        self._disk_cache = disk_cache
+        self._connect_fn = connect_fn or pool._connect_fn
+        self._status_conn = None
+        self._status_lock = threading.Lock()
+        self._io = ThreadPoolExecutor(max_workers=io_threads, thread_name_prefix='query-io')
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='query-engine', daemon=True)
+        self._thread.start()
+    
+    def _blocking(self, fn, *args):
+        # Run in the calling task's context, so statements issued there reach its trace
+        return self._loop.run_in_executor(self._io, functools.partial(contextvars.copy_context().run, fn, *args))
+    
+    def _submit(self, statement, params):
+        """
+        Returns: (query id, ms spent checking out the session, held session or None).
+        A statement built on its session (callable) keeps that session checked out -
+        the caller releases it once the query has finished - so nothing else can
+        touch the temp table it reads while it runs.
+        """
+        started = time.perf_counter()
+        conn = self._pool.acquire()
+        connect_ms = query_trace.elapsed_ms(started)
+        hold = callable(statement)
+        try:
+            if hold:
+                # Built on the submitting session (e.g. an ID list staged in a temp table)
+                statement, params = statement(conn)
+            cur = conn.cursor()
+            try:
+                cur.execute_async(_qmark(statement), params)
+                query_id = cur.sfqid
+            finally:
+                cur.close()
+        except (_snowflake().errors.OperationalError, _snowflake().errors.InterfaceError):
+            self._pool.release(conn, discard=True)
+            raise
+        except BaseException:
+            self._pool.release(conn)
+            raise
+        if not hold:
+            self._pool.release(conn)
+            return query_id, connect_ms, None
+        return query_id, connect_ms, conn
     
+    def _status_session(self):
+        """The session status polls go through, (re)opened on first use or once closed"""
+        with self._status_lock:
+            if self._status_conn is None or self._status_conn.is_closed():
+                self._status_conn = self._connect_fn()
+            return self._status_conn
+    
+    def _still_running(self, query_id) -> bool:
+        conn = self._status_session()
+        try:
+            return conn.is_still_running(conn.get_query_status_throw_if_error(query_id))
+        except (_snowflake().errors.OperationalError, _snowflake().errors.InterfaceError):
+            # The session itself may be unusable - open a new one for the next poll
+            with self._status_lock:
+                if self._status_conn is conn:
+                    self._status_conn = None
+            try:
+                conn.close()
+            except Exception:
+                pass
+            raise
+    
+    def _fetch(self, query_id, as_pandas):
+        with self._pool.connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.get_results_from_sfqid(query_id)
+                return _fetch_pandas(cur) if as_pandas else _fetch_arrow(cur)
+            finally:
+                cur.close()
+    
+    async def query(self, statement, params=None, as_pandas=True, cache_ttl=None, version=None, name=None):
+        """
+        Submit, poll until finished, fetch.
+        `statement` is SQL text, or a callable conn -> (sql, params) run on the submitting session.
+        With `cache_ttl`, SQL text is first looked up in the disk cache (callables never are);
+        `version` is the source_version() of the tables it reads. `name` labels it in query traces.
+        Returns: DataFrame (or pa.Table with as_pandas=False)
+        """
+        with query_trace.statement(name, statement) as record:
+            key = None
+            if cache_ttl and self._disk_cache is not None and not callable(statement):
+                key = statement_fingerprint(statement, params)
+                table = await self._blocking(self._disk_cache.get, key, cache_ttl, version)
+                if table is not None:
+                    record.cache = 'disk'
+                    result = table.to_pandas() if as_pandas else table
+                    record.set_result(result)
+                    return result
+                record.cache = 'miss'
+            
+            result = await self._run(statement, params, as_pandas, record)
+            record.set_result(result)
+            if key is not None:
+                await self._blocking(self._disk_cache.put, key, result, version)
+            return result
+    
+    async def _run(self, statement, params, as_pandas, record):
+        started = time.perf_counter()
+        query_id, record.connect_ms, held = await self._blocking(self._submit, statement, params)
+        record.query_id = query_id
+        try:
+            try:
+                delay = ENGINE_POLL_START
+                while await self._blocking(self._still_running, query_id):
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, ENGINE_POLL_MAX)
+            except asyncio.CancelledError:
+                self._io.submit(cancel_query, query_id)
+                raise
+            record.execute_ms = query_trace.elapsed_ms(started) - record.connect_ms
+            started = time.perf_counter()
+            result = await self._blocking(self._fetch, query_id, as_pandas)
+            record.fetch_ms = query_trace.elapsed_ms(started)
+            return result
+        finally:
+            if held is not None:
+                self._pool.release(held)
+    
+    async def _gather(self, coros: dict) -> dict:
+        results = await asyncio.gather(*coros.values())
+        return dict(zip(coros.keys(), results))
+    
+    def submit(self, coro):
+        """
+        Start a coroutine on the engine loop without waiting; its statements are
+        traced into the caller's rerun. Returns: concurrent.futures.Future
+        """
+        return asyncio.run_coroutine_threadsafe(query_trace.bind(coro), self._loop)
+    
+    def submit_all(self, coros: dict):
+        """Start {key: coroutine} concurrently. Returns: Future of {key: result}"""
+        return self.submit(self._gather(coros))
+    
+    def _wait(self, future, timeout):
+        """Result of an engine future; on timeout it is cancelled, which cancels its running statements"""
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+    
+    def run(self, coro, timeout=None):
+        """Sync facade: run a coroutine on the engine loop and wait for its result"""
+        return self._wait(self.submit(coro), timeout)
+    
+    def run_all(self, coros: dict, timeout=None) -> dict:
+        """Sync facade: run {key: coroutine} concurrently. Returns: {key: result}"""
+        if not coros:
+            return {}
+        return self._wait(self.submit_all(coros), timeout)
+    
+    def run_queries(self, statements: dict, timeout=None) -> dict:
+        """Sync facade: run {key: (sql, params)} concurrently. Returns: {key: DataFrame}"""
+        return self.run_all({key: self.query(sql, params) for key, (sql, params) in statements.items()}, timeout)
+
+@st.cache_resource
+def get_query_engine() -> AsyncQueryEngine:
+    """Process-wide async engine sharing the connection pool"""
+    return AsyncQueryEngine(get_connection_pool(), get_disk_cache())
+
+# --- IDENTITY GRAPH ---
+IDENTITY_GRAPH_TTL = 3600  # Rebuild the FF_ID <-> AMP graph hourly
+
+def get_identity_graph() -> IdentityGraph:
+    """
+    Process-wide FF_ID <-> AMP customer graph, built from one narrow scan of DIM_ACCOUNT.
+    Replaces the per-query self-joins / LISTAGG over the whole dimension table.
+    Rebuilt when DIM_ACCOUNT changes (or hourly when its version is unknown).
+    """
+    return _build_identity_graph(source_version(ACCOUNT_TABLES))
+
+@st.cache_resource(ttl=IDENTITY_GRAPH_TTL, max_entries=1)
+def _build_identity_graph(version) -> IdentityGraph:
     query = """
-        WITH related_accounts AS (
-            -- Get the FF_ID for the input customer
-            SELECT DISTINCT a2.AMP_AMPCUSTOMER_ID
-            FROM PROD_DWH.DWH.DIM_ACCOUNT a1
-            JOIN PROD_DWH.DWH.DIM_ACCOUNT a2 
-                ON a1.FF_ID = a2.FF_ID
-            WHERE a1.AMP_AMPCUSTOMER_ID = %s
-              AND a2.AMP_AMPCUSTOMER_ID IS NOT NULL
-              AND a1.FF_ID IS NOT NULL
-        )
-        SELECT 
-            amp.AMPCUSTOMER_ID,
-            cust.AMP_DATA_SOURCE AS "DATA_SOURCE",
-            mfr.AMP_CLIENTS_CLIENT AS "CLIENT_NAME",
-            amp.DISTRIBUTOR,
-            amp.ITEM_ID,
-            prod.SKU,
-            prod.PRODUCT_NAME,
-            prod.AMP_CATEGORY AS "CATEGORY",
-            prod.AMP_SUB_CATEGORY AS "SUB_CATEGORY",
-            amp.YTD,
-            amp.CYM,
-            amp.MAGO_2 AS "2_MONTHS_AGO",
-            amp.MAGO_3 AS "3_MONTHS_AGO",
-            amp.MAGO_4 AS "4_MONTHS_AGO",
-            amp.MAGO_5 AS "5_MONTHS_AGO",
-            amp.MAGO_6 AS "6_MONTHS_AGO",
-            amp.LYM,
-            amp.LYTD,
-            amp.PERIOD,
-            amp.UOM
-        FROM PROD_DWH.DWH.FACT_AMP_PURCHASE_DATA amp
-        LEFT JOIN PROD_DWH.DWH.DIM_ACCOUNT cust
-            ON amp.AMPCUSTOMER_ID = cust.AMP_AMPCUSTOMER_ID
-        LEFT JOIN PROD_DWH.DWH.DIM_ACCOUNT mfr
-            ON amp.CCODE = mfr.AMP_CLIENTS_CCODE
-        LEFT JOIN PROD_DWH.DWH.DIM_PRODUCT prod
-            ON amp.PRODUCT_UUID = prod.PRODUCT_UUID
-        WHERE amp.AMPCUSTOMER_ID IN (SELECT AMP_AMPCUSTOMER_ID FROM related_accounts)
-          AND (amp.YTD IS NOT NULL 
-               OR amp.LYM IS NOT NULL 
-               OR amp.LYTD IS NOT NULL
-               OR amp.CYM IS NOT NULL)
-        ORDER BY amp.PERIOD DESC
-        LIMIT 500
+        SELECT DISTINCT
+            FF_ID,
+            CAST(AMP_AMPCUSTOMER_ID AS INTEGER) AS AMP_ID
+        FROM PROD_DWH.DWH.DIM_ACCOUNT
+        WHERE AMP_AMPCUSTOMER_ID IS NOT NULL
+          AND FF_ID IS NOT NULL
+    """
+    edges = run_query_arrow(query, cache_ttl=IDENTITY_GRAPH_TTL, tables=ACCOUNT_TABLES, name='identity_graph')
+    return IdentityGraph(
+        edges.column('FF_ID').to_numpy(zero_copy_only=False),
+        edges.column('AMP_ID').to_numpy(zero_copy_only=False)
+    )
+
+# --- ACTIVITY INDEX ---
+ACTIVITY_INDEX_TTL = 1800  # Rebuilt on the same cadence as the activity caches
+
+def get_activity_index() -> ActivityIndex:
+    """
+    Every SF account ID with product activity and every AMP customer ID with purchases,
+    loaded once so the green-circle indicators need no per-page queries.
+    Rebuilt when one of its tables changes.
+    """
+    return _build_activity_index(source_version(SF_ACTIVITY_TABLES + AMP_PURCHASE_TABLES))
+
+@st.cache_resource(ttl=ACTIVITY_INDEX_TTL, max_entries=1)
+def _build_activity_index(version) -> ActivityIndex:
+    sf_query = """
+        SELECT DISTINCT a.SF_ACCOUNT18_ID__C
+        FROM PROD_DWH.DWH.DIM_ACCOUNT a
+        JOIN PROD_DWH.DWH.DIM_PRODUCTACTIVITY p
+            ON a.ACCOUNT_UUID = p.ACCOUNT_OPPERATOR_UUID
+        WHERE a.SF_ACCOUNT18_ID__C IS NOT NULL
+    """
+    amp_query = """
+        SELECT DISTINCT CAST(AMPCUSTOMER_ID AS INTEGER) AS AMPCUSTOMER_ID
+        FROM PROD_DWH.DWH.FACT_AMP_PURCHASE_DATA
+        WHERE AMPCUSTOMER_ID IS NOT NULL
+          AND PURCHASE_UUID IS NOT NULL
+    """
+    sf_ids = run_query_arrow(sf_query, cache_ttl=ACTIVITY_INDEX_TTL, tables=SF_ACTIVITY_TABLES,
+                             name='activity_index_sf').column('SF_ACCOUNT18_ID__C')
+    amp_ids = run_query_arrow(amp_query, cache_ttl=ACTIVITY_INDEX_TTL, tables=AMP_PURCHASE_TABLES,
+                              name='activity_index_amp').column('AMPCUSTOMER_ID')
+    return ActivityIndex(sf_ids.to_numpy(zero_copy_only=False), amp_ids.to_numpy(zero_copy_only=False))
+
+# --- ACTIVITY LOADERS ---
+ACTIVITY_CACHE_TTL = 1800      # Cache for 30 minutes
+# Past their expiry (the TTL, or FRESH_MAX_AGE for version-tagged entries) entries
+# are served while a background refresh runs - for up to this many seconds more.
+# C360_ACTIVITY_MAX_STALE=0 makes every expiry a blocking miss.
+ACTIVITY_MAX_STALE = int(os.environ.get("C360_ACTIVITY_MAX_STALE", "7200"))
+ACTIVITY_CACHE_ENTRIES = 5000  # Per-ID activity frames kept in memory
+ACTIVITY_PAGE_SIZE = 100       # Rows fetched per account per page; "load more" appends the next page
+# Keyset order of each source's rows, newest first - the unique row ID makes it total.
+# p.ID is the Salesforce record ID; amp.PURCHASE_UUID is assumed unique per purchase row.
+SF_ACTIVITY_ORDER = "p.TF_ACTIVITYSTARTDATE__C DESC NULLS LAST, p.ID DESC"
+AMP_ACTIVITY_ORDER = "amp.PERIOD DESC NULLS LAST, amp.PURCHASE_UUID DESC"
+ACTIVITY_ROW_ID = '_ROW_ID'    # Helper column with each row's unique ID (dropped before display)
+
+SF_ACTIVITY_COLUMNS = {
+    'TF_ACTIVITYSTARTDATE__C': 'START_DATE',
+    'TF_MEETINGCLOSEDDATEONLY__C': 'CLOSED_DATE',
+    'TF_ACTIVITYSTATUS__C': 'ACTIVITY_STATUS',
+    'TF_PRODUCT_NAME__C': 'PRODUCT_NAME',
+    'TF_PRODUCT_SKU__C': 'PRODUCT_SKU',
+    'TF_PRODUCT_PACK__C': 'PRODUCT_PACK',
+    'TF_PRODUCTCLIENTNAME__C': 'CLIENT_NAME',
+    'TF_PRODUCTCATEGORY__C': 'PRODUCT_CATEGORY',
+    'PIPELINE_ACTIVITY__C': 'PIPELINE_ACTIVITY',
+    'PRODUCTSTATUS__C': 'PRODUCT_STATUS',
+    'QUANTITY_ENTERED__C': 'QUANTITY_SOLD',
+    'WHAT_ARE_NEXT_STEPS__C': 'NEXT_STEPS'
+}
+
+# Rename columns to uppercase with proper spacing
+AMP_ACTIVITY_COLUMNS = {
+    'AMPCUSTOMER_ID': 'AMP CUSTOMER ID',
+    'CLIENT_NAME': 'CLIENT NAME',
+    'PRODUCT_NAME': 'PRODUCT NAME',
+    'SUB_CATEGORY': 'SUB CATEGORY',
+    '2_MONTHS_AGO': '2 MONTHS AGO',
+    '3_MONTHS_AGO': '3 MONTHS AGO',
+    '4_MONTHS_AGO': '4 MONTHS AGO',
+    '5_MONTHS_AGO': '5 MONTHS AGO',
+    '6_MONTHS_AGO': '6 MONTHS AGO'
+}
+
+@st.cache_resource
+def get_activity_cache() -> ActivityFrameCache:
+    """Process-wide per-ID cache shared by the batch activity loaders"""
+    cache = ActivityFrameCache(max_entries=ACTIVITY_CACHE_ENTRIES, max_age=ACTIVITY_CACHE_TTL,
+                               max_stale=ACTIVITY_MAX_STALE)
+    query_trace.register_cache('activity_frames', cache)
+    return cache
+
+def _keyset_after(column, id_column, after):
+    """
+    Rows past `after` - (sort value, row ID) of the last loaded row - in
+    `column DESC NULLS LAST, id_column DESC` order. Returns: (sql, params)
+    """
+    value, row_id = after
+    if value is None:
+        return f"({column} IS NULL AND {id_column} < %s)", [row_id]
+    return f"({column} < %s OR ({column} = %s AND {id_column} < %s) OR {column} IS NULL)", [value, value, row_id]
+
+def _activity_cursor(frame: pd.DataFrame, sort_column):
+    """Keyset cursor (sort value, row ID) of a frame's last row, as driver-bindable values"""
+    last = frame.iloc[-1]
+    value = last[sort_column]
+    if pd.isna(value):
+        value = None
+    elif isinstance(value, (pd.Timestamp, np.datetime64)):
+        value = pd.Timestamp(value).to_pydatetime()
+    elif isinstance(value, np.generic):
+        value = value.item()
+    return value, str(last[ACTIVITY_ROW_ID])
+
+def _product_activity_sql(conn, account18_ids, after=None, limit=ACTIVITY_PAGE_SIZE):
+    """
+    Returns: (sql, params) for the first `limit` Salesforce activity rows of each account or,
+    given `after` (keyset cursor of one account's last loaded row), that account's next `limit` rows
+    """
+    id_sql, id_params = bind_id_list(conn, account18_ids)
+    if after is None:
+        page_sql = f"""
+    QUALIFY ROW_NUMBER() OVER (
+        PARTITION BY a.SF_ACCOUNT18_ID__C
+        ORDER BY {SF_ACTIVITY_ORDER}
+    ) <= {int(limit)}
+    ORDER BY {SF_ACTIVITY_ORDER}"""
+        keyset_params = []
+    else:
+        keyset_sql, keyset_params = _keyset_after('p.TF_ACTIVITYSTARTDATE__C', 'p.ID', after)
+        page_sql = f"""
+      AND {keyset_sql}
+    ORDER BY {SF_ACTIVITY_ORDER}
+    LIMIT {int(limit)}"""
+    query = f"""
+    SELECT 
+        a.SF_ACCOUNT18_ID__C AS "_ACCOUNT_ID",
+        p.ID AS "{ACTIVITY_ROW_ID}",
+        p.TF_ACTIVITYSTARTDATE__C,
+        p.TF_MEETINGCLOSEDDATEONLY__C,
+        p.TF_ACTIVITYSTATUS__C,
+        p.TF_PRODUCT_NAME__C,
+        p.TF_PRODUCT_SKU__C,
+        p.TF_PRODUCT_PACK__C,
+        p.TF_PRODUCTCLIENTNAME__C,
+        p.TF_PRODUCTCATEGORY__C,
+        p.PIPELINE_ACTIVITY__C,
+        p.PRODUCTSTATUS__C,
+        p.QUANTITY_ENTERED__C,
+        p.WHAT_ARE_NEXT_STEPS__C
+    FROM PROD_DWH.DWH.DIM_ACCOUNT a
+    JOIN PROD_DWH.DWH.DIM_PRODUCTACTIVITY p
+        ON a.ACCOUNT_UUID = p.ACCOUNT_OPPERATOR_UUID
+    WHERE a.SF_ACCOUNT18_ID__C IN {id_sql}{page_sql}
+"""
+    return query, tuple(id_params + keyset_params) or None
+
+def _product_activity_count_sql(conn, account18_ids):
+    """Returns: (sql, params) counting the Salesforce activity rows of several accounts"""
+    id_sql, id_params = bind_id_list(conn, account18_ids)
+    query = f"""
+    SELECT
+        a.SF_ACCOUNT18_ID__C AS "_ACCOUNT_ID",
+        COUNT(*) AS "TOTAL"
+    FROM PROD_DWH.DWH.DIM_ACCOUNT a
+    JOIN PROD_DWH.DWH.DIM_PRODUCTACTIVITY p
+        ON a.ACCOUNT_UUID = p.ACCOUNT_OPPERATOR_UUID
+    WHERE a.SF_ACCOUNT18_ID__C IN {id_sql}
+    GROUP BY a.SF_ACCOUNT18_ID__C
+"""
+    return query, tuple(id_params) or None
+
+def _amp_activity_from(id_sql):
     """
+    FROM/WHERE shared by the AMP page and count queries. DIM_ACCOUNT can hold several
+    rows per AMP customer ID or CCODE, so each lookup keeps one row per key - the joins
+    never multiply purchases, and PURCHASE_UUID stays unique per result row.
+    Binds the ID list twice. Returns: SQL text
+    """
+    return f"""
+    FROM PROD_DWH.DWH.FACT_AMP_PURCHASE_DATA amp
+    LEFT JOIN (
+        SELECT AMP_AMPCUSTOMER_ID, AMP_DATA_SOURCE
+        FROM PROD_DWH.DWH.DIM_ACCOUNT
+        WHERE AMP_AMPCUSTOMER_ID IN {id_sql}
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY AMP_AMPCUSTOMER_ID ORDER BY ACCOUNT_UUID) = 1
+    ) cust
+        ON amp.AMPCUSTOMER_ID = cust.AMP_AMPCUSTOMER_ID
+    LEFT JOIN (
+        SELECT AMP_CLIENTS_CCODE, AMP_CLIENTS_CLIENT
+        FROM PROD_DWH.DWH.DIM_ACCOUNT
+        WHERE AMP_CLIENTS_CCODE IS NOT NULL
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY AMP_CLIENTS_CCODE ORDER BY ACCOUNT_UUID) = 1
+    ) mfr
+        ON amp.CCODE = mfr.AMP_CLIENTS_CCODE
+    LEFT JOIN PROD_DWH.DWH.DIM_PRODUCT prod
+        ON amp.PRODUCT_UUID = prod.PRODUCT_UUID
+    WHERE amp.AMPCUSTOMER_ID IN {id_sql}
+      AND (amp.YTD IS NOT NULL 
+           OR amp.LYM IS NOT NULL 
+           OR amp.LYTD IS NOT NULL
+           OR amp.CYM IS NOT NULL)"""
+
+def _amp_activity_sql(conn, amp_ids, after=None, limit=ACTIVITY_PAGE_SIZE):
+    """
+    Returns: (sql, params) for the first `limit` AMP purchases of each customer or,
+    given `after` (keyset cursor of a group's last loaded row), the group's next `limit` rows
+    """
+    id_sql, id_params = bind_id_list(conn, amp_ids, 'INTEGER')
+    if after is None:
+        # Each customer's newest rows are enough to build the first page of any group it is in
+        page_sql = f"""
+    QUALIFY ROW_NUMBER() OVER (
+        PARTITION BY amp.AMPCUSTOMER_ID
+        ORDER BY {AMP_ACTIVITY_ORDER}
+    ) <= {int(limit)}
+    ORDER BY {AMP_ACTIVITY_ORDER}"""
+        keyset_params = []
+    else:
+        keyset_sql, keyset_params = _keyset_after('amp.PERIOD', 'amp.PURCHASE_UUID', after)
+        page_sql = f"""
+      AND {keyset_sql}
+    ORDER BY {AMP_ACTIVITY_ORDER}
+    LIMIT {int(limit)}"""
+    query = f"""
+    SELECT 
+        amp.AMPCUSTOMER_ID,
+        amp.PURCHASE_UUID AS "{ACTIVITY_ROW_ID}",
+        cust.AMP_DATA_SOURCE AS "DATA_SOURCE",
+        mfr.AMP_CLIENTS_CLIENT AS "CLIENT_NAME",
+        amp.DISTRIBUTOR,
+        amp.ITEM_ID,
+        prod.SKU,
+        prod.PRODUCT_NAME,
+        prod.AMP_CATEGORY AS "CATEGORY",
+        prod.AMP_SUB_CATEGORY AS "SUB_CATEGORY",
+        amp.YTD,
+        amp.CYM,
+        amp.MAGO_2 AS "2_MONTHS_AGO",
+        amp.MAGO_3 AS "3_MONTHS_AGO",
+        amp.MAGO_4 AS "4_MONTHS_AGO",
+        amp.MAGO_5 AS "5_MONTHS_AGO",
+        amp.MAGO_6 AS "6_MONTHS_AGO",
+        amp.LYM,
+        amp.LYTD,
+        amp.PERIOD,
+        amp.UOM{_amp_activity_from(id_sql)}{page_sql}
+"""
+    return query, tuple(id_params * 2 + keyset_params) or None
+
+def _amp_activity_count_sql(conn, amp_ids):
+    """Returns: (sql, params) counting the AMP purchase rows of several customers, through the page query's joins"""
+    id_sql, id_params = bind_id_list(conn, amp_ids, 'INTEGER')
+    query = f"""
+    SELECT
+        CAST(amp.AMPCUSTOMER_ID AS INTEGER) AS AMPCUSTOMER_ID,
+        COUNT(*) AS "TOTAL"{_amp_activity_from(id_sql)}
+    GROUP BY amp.AMPCUSTOMER_ID
+"""
+    return query, tuple(id_params * 2) or None
+
+def _activity_query(engine, build, ids, version, name):
+    """
+    Run an activity statement on the engine. Lists that bind as one parameter are
+    plain SQL text (disk-cacheable); staged lists are built on the submitting session.
+    """
+    if len(ids) <= ID_LIST_STAGE_THRESHOLD:
+        sql, params = build(None, ids)
+        return engine.query(sql, params, cache_ttl=ACTIVITY_CACHE_TTL, version=version, name=name)
+    return engine.query(lambda conn: build(conn, ids), name=name)
+
+async def _product_activity_async(engine, account18_ids: list, version=None) -> dict:
+    """
+    First page and total row count of several accounts' Salesforce activity -
+    two concurrent queries - split per account. Returns: {account ID: ActivityPage}
+    """
+    df, counts = await asyncio.gather(
+        _activity_query(engine, _product_activity_sql, account18_ids, version, 'sf_activity'),
+        _activity_query(engine, _product_activity_count_sql, account18_ids, version, 'sf_activity_count'),
+    )
+    totals = dict(zip(counts['_ACCOUNT_ID'].astype(str), counts['TOTAL'].astype(int).tolist()))
+    df = df.rename(columns=SF_ACTIVITY_COLUMNS)
+    account_ids = df.pop('_ACCOUNT_ID').astype(str)
+    frames = {account_id: group.reset_index(drop=True) for account_id, group in df.groupby(account_ids, sort=False)}
+    return {
+        account_id: ActivityPage(frames.get(account_id, df.iloc[0:0]), totals.get(account_id, 0))
+        for account_id in account18_ids
+    }
+
+async def _amp_activity_async(engine, related_map: dict, version=None) -> dict:
+    """
+    First page and total row count of several customers' AMP purchases, each over
+    its related customers: one page query and one count query over the union,
+    split back per requested customer. Returns: {AMP customer ID: ActivityPage}
+    """
+    pages = {amp_id: ActivityPage(pd.DataFrame(), 0) for amp_id, related in related_map.items() if len(related) == 0}
+    wanted = {amp_id: related for amp_id, related in related_map.items() if len(related)}
+    if not wanted:
+        return pages
+    all_related = np.unique(np.concatenate(list(wanted.values()))).tolist()
+    
+    df, counts = await asyncio.gather(
+        _activity_query(engine, _amp_activity_sql, all_related, version, 'amp_activity'),
+        _activity_query(engine, _amp_activity_count_sql, all_related, version, 'amp_activity_count'),
+    )
+    totals = dict(zip(pd.to_numeric(counts['AMPCUSTOMER_ID']).astype(int).tolist(), counts['TOTAL'].astype(int).tolist()))
+    customer = pd.to_numeric(df['AMPCUSTOMER_ID'], errors='coerce').to_numpy()
+    df = df.rename(columns=AMP_ACTIVITY_COLUMNS)
+    for amp_id, related in wanted.items():
+        # Rows stay in keyset order, so the first rows are the group's newest
+        frame = df[np.isin(customer, related)].head(ACTIVITY_PAGE_SIZE).reset_index(drop=True)
+        pages[amp_id] = ActivityPage(frame, sum(totals.get(int(c), 0) for c in related))
+    return pages
+
+async def _more_activity_async(engine, source, ids, base: ActivityPage, rows: int, version=None):
+    """
+    The next `rows` activity rows after those in `base`, by keyset: `ids` is the
+    one SF account, or every AMP customer related to the page's customer.
+    Returns: DataFrame
+    """
+    if source == 'sf':
+        build = functools.partial(_product_activity_sql, after=_activity_cursor(base.frame, 'START_DATE'), limit=rows)
+        df = await _activity_query(engine, build, ids, version, 'sf_activity')
+        df = df.rename(columns=SF_ACTIVITY_COLUMNS)
+        df.pop('_ACCOUNT_ID')
+        return df
+    build = functools.partial(_amp_activity_sql, after=_activity_cursor(base.frame, 'PERIOD'), limit=rows)
+    df = await _activity_query(engine, build, ids, version, 'amp_activity')
+    return df.rename(columns=AMP_ACTIVITY_COLUMNS)
+
+# Per source: (engine, missing IDs, source version) -> coroutine fetching {id: DataFrame}.
+# Every customer sharing an FF_ID with an AMP input is resolved in memory first,
+# in the caller's thread - a cold identity graph runs a query of its own.
+_ACTIVITY_JOBS = {
+    'sf': _product_activity_async,
+    'amp': lambda engine, amp_ids, version: _amp_activity_async(
+        engine, get_identity_graph().related_amp_map(amp_ids), version),
+}
+_ACTIVITY_TABLES = {'sf': SF_ACTIVITY_TABLES, 'amp': AMP_ACTIVITY_TABLES}
+
+def _refresh_in_background(engine, refresh: dict, versions: dict):
+    """
+    Re-fetch stale entries ({source: ids} claimed by get_many) without making
+    the caller wait; the claims are released whether the refresh succeeds or not.
+    """
+    cache = get_activity_cache()
     try:
-        df = pd.read_sql(query, conn, params=(amp_ampcustomer_id,))
-        
-        # Rename columns to uppercase with proper spacing
-        df = df.rename(columns={
-            'AMPCUSTOMER_ID': 'AMP CUSTOMER ID',
-            'CLIENT_NAME': 'CLIENT NAME',
-            'PRODUCT_NAME': 'PRODUCT NAME',
-            'SUB_CATEGORY': 'SUB CATEGORY',
-            '2_MONTHS_AGO': '2 MONTHS AGO',
-            '3_MONTHS_AGO': '3 MONTHS AGO',
-            '4_MONTHS_AGO': '4 MONTHS AGO',
-            '5_MONTHS_AGO': '5 MONTHS AGO',
-            '6_MONTHS_AGO': '6 MONTHS AGO'
+        future = engine.submit_all({
+            source: _ACTIVITY_JOBS[source](engine, ids, versions[source]) for source, ids in refresh.items()
         })
-        
-        return df
-    finally:
-        conn.close()
+    except Exception:
+        for source, ids in refresh.items():
+            cache.release(source, ids)
+        return
+    
+    def store(future):
+        try:
+            results = future.result()
+        except Exception:
+            results = {}  # keep serving the stale frames; the next reader retries
+        for source, ids in refresh.items():
+            if source in results:
+                cache.put_many(source, results[source], versions[source])
+            cache.release(source, ids)
+    
+    future.add_done_callback(store)
 
-def load_activities_parallel(gamechanger_id, amp_id):
+def _cached_batches(requests: dict) -> dict:
     """
-    Load Salesforce and AMP activities in parallel for faster performance
-    Returns: (sf_dataframe, amp_dataframe)
+    Serve {source: ids} from the per-ID cache; the misses of every source are
+    fetched concurrently on the async query engine, one page and one count query per source.
+    Expired entries still within ACTIVITY_MAX_STALE are returned as they are and
+    refreshed in the background (stale-while-revalidate).
+    Returns: {source: {id: ActivityPage}} in input order, as cached (see _display_frame)
+    """
+    cache = get_activity_cache()
+    engine = get_query_engine()
+    found, jobs, refresh, versions = {}, {}, {}, {}
+    for source, ids in requests.items():
+        # Read before fetching: a load that lands mid-query invalidates the result next probe
+        versions[source] = source_version(_ACTIVITY_TABLES[source])
+        found[source], missing, stale = cache.get_many(source, ids, versions[source])
+        if missing:
+            jobs[source] = _ACTIVITY_JOBS[source](engine, missing, versions[source])
+        elif ids:
+            query_trace.record_cache_hit(f'{source}_activity', 'memory',
+                                         sum(len(page.frame) for page in found[source].values()))
+        if stale:
+            refresh[source] = stale
+    
+    if refresh:
+        _refresh_in_background(engine, refresh, versions)
+    
+    for source, fetched in engine.run_all(jobs).items():
+        cache.put_many(source, fetched, versions[source])
+        found[source].update(fetched)
+    
+    return {source: {account_id: found[source][account_id] for account_id in ids} for source, ids in requests.items()}
+
+def _display_frame(page: ActivityPage, rows=None) -> pd.DataFrame:
+    """A copy of the page's first `rows` rows (all by default) without the keyset helper column"""
+    frame = page.frame if rows is None else page.frame.head(rows)
+    return frame.drop(columns=[ACTIVITY_ROW_ID], errors='ignore')
+
+def _clean_gamechanger_ids(account18_ids) -> list:
+    return list(dict.fromkeys(str(x).strip() for x in account18_ids if x is not None and str(x).strip()))
+
+def get_product_activity_batch(account18_ids) -> dict:
+    """
+    First page of Salesforce product activity for many Gamechanger IDs - one query for every ID not cached.
+    Returns: {Gamechanger ID: DataFrame}
+    """
+    pages = _cached_batches({'sf': _clean_gamechanger_ids(account18_ids)})['sf']
+    return {account_id: _display_frame(page) for account_id, page in pages.items()}
+
+def get_amp_activity_batch(amp_ids) -> dict:
+    """
+    First page of AMP purchase activity for many AMP customer IDs - one query for every ID not cached.
+    Returns: {AMP customer ID (int): DataFrame}
     """
-    with ThreadPoolExecutor(max_workers=2) as executor:
-        # Submit both queries simultaneously
-        futures = {}
+    pages = _cached_batches({'amp': list(dict.fromkeys(int(x) for x in amp_ids))})['amp']
+    return {amp_id: _display_frame(page) for amp_id, page in pages.items()}
+
+def get_product_activity_by_gamechanger_id(account18_id: str) -> pd.DataFrame:
+    return get_product_activity_batch([account18_id]).get(str(account18_id).strip(), pd.DataFrame())
+
+def get_amp_activity_by_customer_id(amp_ampcustomer_id) -> pd.DataFrame:
+    return get_amp_activity_batch([amp_ampcustomer_id])[int(amp_ampcustomer_id)]
+
+def _activity_requests(gamechanger_id, amp_id) -> dict:
+    """Returns: {'sf': [Gamechanger ID] or [], 'amp': [AMP customer ID] or []} from a search result row's values"""
+    requests = {'sf': [], 'amp': []}
+    
+    if gamechanger_id and pd.notna(gamechanger_id) and str(gamechanger_id).strip():
+        requests['sf'] = _clean_gamechanger_ids([str(gamechanger_id).replace(' 🟢', '')])
         
-        if gamechanger_id and pd.notna(gamechanger_id) and str(gamechanger_id).strip():
-            gamechanger_id_clean = str(gamechanger_id).replace(' 🟢', '').strip()
-            futures['sf'] = executor.submit(get_product_activity_by_gamechanger_id, gamechanger_id_clean)
-        else:
-            futures['sf'] = None
-            
-        if amp_id and pd.notna(amp_id) and amp_id != '' and amp_id != 0:
-            # Clean AMP ID
-            if isinstance(amp_id, str):
-                clean_amp_id = amp_id.replace(' 🟢', '').strip()
-                if ',' in clean_amp_id:
-                    clean_amp_id = clean_amp_id.split(',')[0].strip()
-                amp_id_value = int(float(clean_amp_id)) if clean_amp_id else None
-            else:
-                amp_id_value = int(float(amp_id)) if amp_id != 0 else None
-            
-            if amp_id_value:
-                futures['amp'] = executor.submit(get_amp_activity_by_customer_id, amp_id_value)
-            else:
-                futures['amp'] = None
+    if amp_id and pd.notna(amp_id) and amp_id != '' and amp_id != 0:
+        # Clean AMP ID
+        if isinstance(amp_id, str):
+            clean_amp_id = amp_id.replace(' 🟢', '').strip()
+            if ',' in clean_amp_id:
+                clean_amp_id = clean_amp_id.split(',')[0].strip()
+            amp_id_value = int(float(clean_amp_id)) if clean_amp_id else None
         else:
-            futures['amp'] = None
+            amp_id_value = int(float(amp_id)) if amp_id != 0 else None
         
-        # Wait for results
-        sf_df = futures['sf'].result() if futures['sf'] else pd.DataFrame()
-        amp_df = futures['amp'].result() if futures['amp'] else pd.DataFrame()
+        if amp_id_value:
+            requests['amp'] = [amp_id_value]
+    return requests
+
+def load_activity_pages(gamechanger_id, amp_id, sf_rows=ACTIVITY_PAGE_SIZE, amp_rows=ACTIVITY_PAGE_SIZE) -> dict:
+    """
+    The leading `sf_rows` / `amp_rows` activity rows of one account, both sources
+    concurrently on the async engine. First pages come from the per-ID cache; asking
+    for more rows than it holds ("load more") fetches only the rows after the cached
+    ones, by keyset, and appends them to the cached page for the next reader.
+    Returns: {'sf': ActivityPage, 'amp': ActivityPage} - display-ready frames and total row counts
+    """
+    requests = _activity_requests(gamechanger_id, amp_id)
+    cached = _cached_batches(requests)
+    wanted = {'sf': sf_rows, 'amp': amp_rows}
+    pages = {source: cached[source][ids[0]] for source, ids in requests.items() if ids}
     
-    return sf_df, amp_df
+    engine = get_query_engine()
+    jobs, short = {}, {}
+    for source, page in pages.items():
+        short[source] = min(wanted[source], page.total if page.total is not None else wanted[source]) - len(page.frame)
+        if short[source] > 0 and len(page.frame):
+            account_id = requests[source][0]
+            # Related customers are resolved here - a cold identity graph runs a query of its own
+            ids = [account_id] if source == 'sf' else get_identity_graph().related_amp_map([account_id])[account_id].tolist()
+            version = source_version(_ACTIVITY_TABLES[source])
+            jobs[source] = _more_activity_async(engine, source, ids, page, short[source], version)
+    
+    cache = get_activity_cache()
+    for source, rows in engine.run_all(jobs).items():
+        # Fewer rows than the count promised: a load removed some - the page is complete now
+        total = len(pages[source].frame) + len(rows) if len(rows) < short[source] else None
+        pages[source] = cache.extend(source, requests[source][0], pages[source], rows, total)
+    
+    return {
+        source: ActivityPage(_display_frame(pages[source], wanted[source]), pages[source].total)
+        if source in pages else ActivityPage(pd.DataFrame(), 0)
+        for source in ('sf', 'amp')
+    }
+
+def load_activities_parallel(gamechanger_id, amp_id):
+    """
+    Load the first page of Salesforce and AMP activity concurrently - both queries
+    are in flight on the async engine at the same time, with no thread per query.
+    Returns: (sf_dataframe, amp_dataframe)
+    """
+    pages = load_activity_pages(gamechanger_id, amp_id)
+    return pages['sf'].frame, pages['amp'].frame
 
 def check_activity_exists(account_ids: list) -> dict:
     """
     Check which accounts have SF and/or AMP activity.
     Returns dict with format: {id: {'has_sf': bool, 'has_amp': bool}, ...}
     Now checks each individual AMP ID separately for individual green circle indicators.
+    Answered from the in-memory activity index and identity graph - no queries per page.
     """
-    conn = get_snowflake_connection()
-    
+    # Traced like a statement so the indicator check shows up in diagnostics and metrics
+    with query_trace.statement('activity_check', '') as record:
+        record.cache = 'memory'
+        results = _check_activity_exists(account_ids)
+        record.rows = len(results)
+    return results
+
+def _check_activity_exists(account_ids: list) -> dict:
     results = {}
+    index = get_activity_index()
+    graph = get_identity_graph()
     
-    try:
-        # Check for Salesforce activity
-        sf_ids = [aid['sf_id'] for aid in account_ids if aid.get('sf_id')]
-        if sf_ids:
-            placeholders = ','.join(['%s'] * len(sf_ids))
-            sf_query = f"""
-                SELECT DISTINCT a.SF_ACCOUNT18_ID__C
-                FROM PROD_DWH.DWH.DIM_ACCOUNT a
-                JOIN PROD_DWH.DWH.DIM_PRODUCTACTIVITY p
-                    ON a.ACCOUNT_UUID = p.ACCOUNT_OPPERATOR_UUID
-                WHERE a.SF_ACCOUNT18_ID__C IN ({placeholders})
-            """
-            sf_df = pd.read_sql(sf_query, conn, params=tuple(sf_ids))
-            sf_with_activity = set(sf_df['SF_ACCOUNT18_ID__C'].tolist())
-        else:
-            sf_with_activity = set()
-        
-        # Check for AMP activity - check EACH ID individually
-        amp_ids_to_check = []
-        for aid in account_ids:
-            amp_id = aid.get('amp_id')
-            if amp_id:
-                # If comma-separated, split and add each
-                amp_str = str(amp_id).strip()
-                if ',' in amp_str:
-                    for single_id in amp_str.split(','):
-                        single_id = single_id.strip()
-                        if single_id and single_id != '0':
-                            amp_ids_to_check.append(single_id)
-                else:
-                    if amp_str and amp_str != '0':
-                        amp_ids_to_check.append(amp_str)
-        
-        if amp_ids_to_check:
-            # Remove duplicates and convert to integers
-            amp_ids_to_check = list(set(amp_ids_to_check))
-            
-            # Convert string IDs to integers for the query
-            amp_ids_numeric = []
-            for amp_id in amp_ids_to_check:
-                try:
-                    amp_ids_numeric.append(int(float(amp_id)))
-                except:
-                    pass
-            
-            if amp_ids_numeric:
-                placeholders = ','.join(['%s'] * len(amp_ids_numeric))
-                amp_query = f"""
-                    WITH related_accounts AS (
-                        SELECT DISTINCT a2.AMP_AMPCUSTOMER_ID, a1.AMP_AMPCUSTOMER_ID as ORIGINAL_ID
-                        FROM PROD_DWH.DWH.DIM_ACCOUNT a1
-                        JOIN PROD_DWH.DWH.DIM_ACCOUNT a2 
-                            ON a1.FF_ID = a2.FF_ID
-                        WHERE a1.AMP_AMPCUSTOMER_ID IN ({placeholders})
-                          AND a2.AMP_AMPCUSTOMER_ID IS NOT NULL
-                          AND a1.FF_ID IS NOT NULL
-                    )
-                    SELECT DISTINCT 
-                        ra.ORIGINAL_ID,
-                        COUNT(DISTINCT amp.PURCHASE_UUID) as activity_count
-                    FROM related_accounts ra
-                    JOIN PROD_DWH.DWH.FACT_AMP_PURCHASE_DATA amp
-                        ON ra.AMP_AMPCUSTOMER_ID = amp.AMPCUSTOMER_ID
-                    GROUP BY ra.ORIGINAL_ID
-                    HAVING COUNT(DISTINCT amp.PURCHASE_UUID) > 0
-                """
-                amp_df = pd.read_sql(amp_query, conn, params=tuple(amp_ids_numeric))
-                
-                # Safely convert IDs to strings
-                amp_with_activity = set()
-                if not amp_df.empty:
-                    for x in amp_df['ORIGINAL_ID'].tolist():
-                        try:
-                            amp_with_activity.add(str(int(float(x))))
-                        except:
-                            pass
+    # Check for Salesforce activity
+    sf_ids = [aid['sf_id'] for aid in account_ids if aid.get('sf_id')]
+    if sf_ids:
+        sf_with_activity = set(np.asarray(sf_ids, dtype=object)[index.has_sf(sf_ids)].tolist())
+    else:
+        sf_with_activity = set()
+    
+    # Check for AMP activity - check EACH ID individually
+    amp_ids_to_check = []
+    for aid in account_ids:
+        amp_id = aid.get('amp_id')
+        if amp_id:
+            # If comma-separated, split and add each
+            amp_str = str(amp_id).strip()
+            if ',' in amp_str:
+                for single_id in amp_str.split(','):
+                    single_id = single_id.strip()
+                    if single_id and single_id != '0':
+                        amp_ids_to_check.append(single_id)
             else:
-                amp_with_activity = set()
-        else:
-            amp_with_activity = set()
+                if amp_str and amp_str != '0':
+                    amp_ids_to_check.append(amp_str)
+    
+    # Convert string IDs to integers (duplicates removed)
+    amp_ids_numeric = set()
+    for amp_id in amp_ids_to_check:
+        try:
+            amp_ids_numeric.add(int(float(amp_id)))
+        except (TypeError, ValueError):
+            pass
+    
+    # An ID has activity when any customer sharing its FF_ID has purchase rows
+    amp_with_activity = {
+        str(original) for original in index.any_amp(graph.related_amp_map(amp_ids_numeric))
+    }
+    
+    # Build results dict - now includes ALL individual AMP IDs
+    for aid in account_ids:
+        sf_id = aid.get('sf_id')
+        amp_id = aid.get('amp_id')
         
-        # Build results dict - now includes ALL individual AMP IDs
-        for aid in account_ids:
-            sf_id = aid.get('sf_id')
-            amp_id = aid.get('amp_id')
-            
-            # Add SF result
-            if sf_id:
-                results[str(sf_id)] = {
-                    'has_sf': sf_id in sf_with_activity,
-                    'has_amp': False
-                }
-            
-            # Add AMP results - handle comma-separated
-            if amp_id:
-                amp_str = str(amp_id).strip()
-                if ',' in amp_str:
-                    for single_id in amp_str.split(','):
-                        single_id = single_id.strip()
-                        if single_id and single_id != '0':
-                            results[single_id] = {
-                                'has_sf': False,
-                                'has_amp': single_id in amp_with_activity
-                            }
-                else:
-                    if amp_str and amp_str != '0':
-                        results[amp_str] = {
+        # Add SF result
+        if sf_id:
+            results[str(sf_id)] = {
+                'has_sf': sf_id in sf_with_activity,
+                'has_amp': False
+            }
+        
+        # Add AMP results - handle comma-separated
+        if amp_id:
+            amp_str = str(amp_id).strip()
+            if ',' in amp_str:
+                for single_id in amp_str.split(','):
+                    single_id = single_id.strip()
+                    if single_id and single_id != '0':
+                        results[single_id] = {
                             'has_sf': False,
-                            'has_amp': amp_str in amp_with_activity
+                            'has_amp': single_id in amp_with_activity
                         }
-        
-        return results
-        
-    finally:
-        conn.close()
+            else:
+                if amp_str and amp_str != '0':
+                    results[amp_str] = {
+                        'has_sf': False,
+                        'has_amp': amp_str in amp_with_activity
+                    }
+    
+    return results
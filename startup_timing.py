@@ -0,0 +1,64 @@
+import os
+import re
+import subprocess
+import sys
+
+# --- STARTUP TIMING REPORT ---
+# Import-time breakdown of the modules a page loads, measured in a fresh
+# interpreter with `python -X importtime` so nothing is already cached in
+# sys.modules. Run from the repo root:
+#     python startup_timing.py                      # the search page's imports
+#     python startup_timing.py snowflake_connector  # any modules
+
+SEARCH_PAGE_IMPORTS = (
+    'streamlit', 'pandas', 'snowflake_connector', 'account_search',
+    'territory_map', 'result_transforms'
+)
+REPORT_TOP = 15  # Packages listed in the report
+
+_IMPORT_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+def measure_imports(modules=SEARCH_PAGE_IMPORTS) -> dict:
+    """
+    Import `modules` in order in a fresh interpreter.
+    Returns: {'wall': seconds for the whole import, 'modules': [(name, self us, cumulative us, depth)]}
+    """
+    code = 'import time; t = time.perf_counter()\n'
+    code += ''.join(f'import {name}\n' for name in modules)
+    code += 'print(time.perf_counter() - t)\n'
+    here = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=here, capture_output=True, text=True, check=True
+    )
+
+    timings = []
+    for line in proc.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            timings.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return {'wall': float(proc.stdout.strip().splitlines()[-1]), 'modules': timings}
+
+def package_breakdown(timings) -> list:
+    """
+    Self time summed per top-level package, so `pandas` includes every pandas.* submodule.
+    Returns: [(package, seconds, module count)], slowest first
+    """
+    totals = {}
+    for name, self_us, _, _ in timings:
+        root = name.split('.')[0]
+        seconds, count = totals.get(root, (0.0, 0))
+        totals[root] = (seconds + self_us / 1e6, count + 1)
+    return sorted(((root, s, n) for root, (s, n) in totals.items()), key=lambda row: -row[1])
+
+def format_report(result, top=REPORT_TOP) -> str:
+    lines = [f"Total import time: {result['wall']:.3f}s ({len(result['modules'])} modules)", '']
+    lines.append(f"{'package':<28}{'seconds':>10}{'modules':>10}")
+    for root, seconds, count in package_breakdown(result['modules'])[:top]:
+        lines.append(f"{root:<28}{seconds:>10.3f}{count:>10}")
+    return '\n'.join(lines)
+
+if __name__ == '__main__':
+    report = measure_imports(tuple(sys.argv[1:]) or SEARCH_PAGE_IMPORTS)
+    print(format_report(report))
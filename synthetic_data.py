@@ -0,0 +1,317 @@
+import argparse
+import os
+import time
+import duckdb
+import numpy as np
+import pyarrow as pa
+
+# --- SYNTHETIC WAREHOUSE ---
+# Builds a DuckDB file with the PROD_DWH.DWH tables the app reads, filled with
+# seeded random data at a chosen scale, for C360_BACKEND=local (see
+# local_backend.py). Same seed and scale -> same data. Usage:
+#     python synthetic_data.py --accounts 1000000 --seed 7 --db c360_local.duckdb
+#
+# Shapes follow production where it matters for performance: account names are
+# built from a small vocabulary (so name terms match realistic fractions of the
+# table), several accounts share one FF_ID, and activity / purchase rows per
+# account are heavy-tailed, so a few accounts carry thousands of rows.
+
+MIN_ACCOUNTS = 10_000
+MAX_ACCOUNTS = 10_000_000
+CHUNK_ROWS = 500_000            # Rows generated and inserted per batch
+SF_ID_SHARE = 0.7               # Accounts with a Salesforce (Gamechanger) ID
+FF_ID_SHARE = 0.6               # ...with a Firefly ID
+ACCOUNTS_PER_FF_ID = 1.3        # Mean accounts behind one FF_ID
+AMP_ID_SHARE = 0.4              # ...with an AMP customer ID
+GEO_SHARE = 0.9                 # ...with coordinates
+MANUFACTURERS = 300             # Accounts that are AMP clients (CCODE owners)
+ACTIVITY_PER_ACCOUNT = 2.0      # Mean DIM_PRODUCTACTIVITY rows per SF account
+PURCHASES_PER_CUSTOMER = 3.0    # Mean FACT_AMP_PURCHASE_DATA rows per AMP customer
+HISTORY_PER_ACCOUNT = 0.5       # Mean ACCOUNT_HISTORY rows per account
+HEAVY_TAIL = 1.6                # Pareto shape of the per-account row counts (lower = heavier)
+SCHEMA_VERSION = 2              # Bump when the tables change shape; older files are regenerated
+
+TABLES = ('DIM_ACCOUNT', 'DIM_PRODUCTACTIVITY', 'FACT_AMP_PURCHASE_DATA', 'DIM_PRODUCT', 'ACCOUNT_HISTORY')
+
+_NAME_WORDS = np.array([
+    'Blue', 'Golden', 'Harbor', 'Main Street', 'Oak', 'River', 'Sunset', 'Union', 'Maple', 'Pine',
+    'Silver', 'Liberty', 'Lakeside', 'Summit', 'Cedar', 'Red', 'Corner', 'Village', 'Park', 'Station',
+    'Brick', 'Copper', 'Iron', 'Prairie', 'Coastal', 'Mountain', 'Country', 'Downtown', 'Hometown', 'Garden',
+    "Mario's", "Rosa's", "Luigi's", "Tony's", "Maria's", 'Big Sky', 'Lucky', 'Royal', 'Grand', 'Little'
+], dtype=object)
+_NAME_KINDS = np.array([
+    'Grill', 'Diner', 'Pizzeria', 'Bistro', 'Cafe', 'Tavern', 'Kitchen', 'Steakhouse', 'Bakery', 'Deli',
+    'Cantina', 'Brewery', 'Pub', 'Smokehouse', 'Trattoria', 'Eatery', 'Bar & Grill', 'Market', 'Catering', 'School District'
+], dtype=object)
+_NAME_SUFFIXES = np.array(['', '', '', '', ' LLC', ' Inc', ' Co', ' #2', ' Express', ' & Sons'], dtype=object)
+_STATES = np.array([
+    'AL', 'AZ', 'AR', 'CA', 'CO', 'CT', 'FL', 'GA', 'ID', 'IL', 'IN', 'IA', 'KS', 'KY', 'LA', 'MD', 'MA', 'MI',
+    'MN', 'MS', 'MO', 'NE', 'NV', 'NJ', 'NM', 'NY', 'NC', 'OH', 'OK', 'OR', 'PA', 'SC', 'TN', 'TX', 'UT', 'VA',
+    'WA', 'WI'
+], dtype=object)
+_CITY_PARTS = np.array([
+    'Spring', 'Green', 'Fair', 'Clear', 'Lake', 'Fort', 'Ash', 'Elm', 'Rock', 'Brook', 'Bell', 'Mill',
+    'West', 'North', 'Oak', 'Red', 'Stone', 'Glen', 'Wood', 'Mar'
+], dtype=object)
+_CITY_ENDINGS = np.array(['field', 'ville', 'ton', 'burg', 'dale', 'wood', ' City', ' Springs', 'port', 'view'], dtype=object)
+_STREETS = np.array(['Main St', 'Oak Ave', '1st St', 'Broadway', 'Market St', 'Park Rd', 'Elm St', 'Highway 9', 'Center Blvd', 'Lake Dr'], dtype=object)
+_EMPLOYEES = np.array([f'{first} {last}' for first in ('Alex', 'Jordan', 'Sam', 'Taylor', 'Casey', 'Morgan', 'Riley', 'Jamie')
+                       for last in ('Smith', 'Lee', 'Garcia', 'Patel', 'Brown', 'Nguyen', 'Miller', 'Davis')], dtype=object)
+_DISTRIBUTORS = np.array(['Sysco', 'US Foods', 'Performance Foodservice', 'Gordon Food Service', 'Shamrock Foods', 'Ben E. Keith'], dtype=object)
+_ACCOUNT_TYPES = np.array(['Operator', 'Operator', 'Operator', 'Distributor', 'Manufacturer', 'Chain HQ'], dtype=object)
+_LLO = np.array(['', '', '', 'Compass Group', 'Sodexo', 'Aramark'], dtype=object)
+_DATA_SOURCES = np.array(['DISTRIBUTOR FEED', 'MANUFACTURER FEED', 'REBATE CLAIMS'], dtype=object)
+_ACTIVITY_STATUS = np.array(['Completed', 'Completed', 'Scheduled', 'Cancelled'], dtype=object)
+_PRODUCT_STATUS = np.array(['Won', 'Lost', 'Pending', 'Sampled'], dtype=object)
+_PIPELINE = np.array(['Prospecting', 'Sampling', 'Negotiation', 'Closed'], dtype=object)
+_NEXT_STEPS = np.array(['Follow up call', 'Send samples', 'Schedule tasting', 'Send pricing', ''], dtype=object)
+_CATEGORIES = np.array(['Dairy', 'Meat', 'Produce', 'Bakery', 'Beverage', 'Frozen', 'Dry Goods', 'Disposables'], dtype=object)
+_SUB_CATEGORIES = np.array(['Premium', 'Value', 'Organic', 'Bulk', 'Specialty'], dtype=object)
+_UOM = np.array(['CS', 'LB', 'EA', 'GAL'], dtype=object)
+_EVENTS = np.array(['Owner changed', 'Address updated', 'Merged', 'Status changed', 'Created'], dtype=object)
+
+def _ids(prefix, start, count, width):
+    """Deterministic string IDs prefix + zero-padded sequence number"""
+    numbers = np.arange(start, start + count).astype(f'U{width}')
+    return np.char.add(prefix, np.char.zfill(numbers, width)).astype(object)
+
+def _pick(rng, values, count, p=None):
+    return values[rng.choice(len(values), size=count, p=p)]
+
+def _maybe(rng, values, share):
+    """`values` with (1 - share) of them replaced by NULL"""
+    values = np.asarray(values, dtype=object).copy()
+    values[rng.random(len(values)) >= share] = None
+    return values
+
+def _row_counts(rng, count, mean):
+    """Heavy-tailed non-negative row counts per parent with the given mean"""
+    scale = mean * (HEAVY_TAIL - 1) / HEAVY_TAIL
+    counts = rng.poisson((rng.pareto(HEAVY_TAIL, count) + 1) * scale)
+    return np.minimum(counts, 20_000)
+
+def _cities(rng, accounts):
+    """City pool: names, their state, centre coordinates and a Zipf-like popularity"""
+    count = int(np.clip(accounts // 200, 200, 20_000))
+    names = np.char.add(_pick(rng, _CITY_PARTS, count).astype(str), _pick(rng, _CITY_ENDINGS, count).astype(str)).astype(object)
+    states = _pick(rng, _STATES, count)
+    lat = rng.uniform(26.0, 48.5, count)
+    lon = rng.uniform(-123.0, -71.0, count)
+    weights = 1.0 / np.arange(1, count + 1) ** 0.8
+    return names, states, lat, lon, weights / weights.sum()
+
+def _account_chunk(rng, start, count, cities, ff_pool, amp_start):
+    city_names, city_states, city_lat, city_lon, city_p = cities
+    city = rng.choice(len(city_names), size=count, p=city_p)
+    names = np.char.add(
+        np.char.add(_pick(rng, _NAME_WORDS, count).astype(str), ' '),
+        np.char.add(_pick(rng, _NAME_KINDS, count).astype(str), _pick(rng, _NAME_SUFFIXES, count).astype(str))
+    ).astype(object)
+
+    has_geo = rng.random(count) < GEO_SHARE
+    lat = np.where(has_geo, city_lat[city] + rng.normal(0, 0.15, count), np.nan)
+    lon = np.where(has_geo, city_lon[city] + rng.normal(0, 0.15, count), np.nan)
+
+    ff_ids = _maybe(rng, np.char.add('FF', rng.integers(0, ff_pool, count).astype('U9')).astype(object), FF_ID_SHARE)
+    has_amp = rng.random(count) < AMP_ID_SHARE
+    amp_ids = np.where(has_amp, amp_start + np.cumsum(has_amp), 0)
+
+    account_uuid = _ids('ACC', start, count, 10)
+    sf_ids = _maybe(rng, _ids('001A0000', start, count, 10), SF_ID_SHARE)
+    manufacturer = np.arange(start, start + count) < MANUFACTURERS
+    ccodes = np.where(manufacturer, np.char.add('C', np.arange(start, start + count).astype('U6')), None)
+
+    zone_of = {state: f'Zone {i % 6 + 1}' for i, state in enumerate(_STATES)}
+    states = city_states[city]
+    table = pa.table({
+        'ACCOUNT_UUID': pa.array(account_uuid, pa.string()),
+        'ACCOUNT_ID': pa.array(account_uuid, pa.string()),
+        'NAME': pa.array(names, pa.string()),
+        'ADDRESS': pa.array(np.char.add(np.char.add(rng.integers(1, 9999, count).astype('U4'), ' '),
+                                        _pick(rng, _STREETS, count).astype(str)).astype(object), pa.string()),
+        'CITY': pa.array(city_names[city], pa.string()),
+        'STATE': pa.array(states, pa.string()),
+        'SF_ZIP__C': pa.array(np.char.zfill(rng.integers(501, 99950, count).astype('U5'), 5).astype(object), pa.string()),
+        'FF_ID': pa.array(ff_ids, pa.string()),
+        'SF_ACCOUNT18_ID__C': pa.array(sf_ids, pa.string()),
+        'SF_ID': pa.array(sf_ids, pa.string()),
+        'AMP_AMPCUSTOMER_ID': pa.array(np.where(has_amp, amp_ids, None), pa.int64()),
+        'AMP_SOURCE_CUSTOMER_ID': pa.array(np.where(has_amp, np.char.add('SRC', amp_ids.astype('U9')), None), pa.string()),
+        'AMP_DATA_SOURCE': pa.array(np.where(has_amp, _pick(rng, _DATA_SOURCES, count), None), pa.string()),
+        'AMP_CLIENTS_CCODE': pa.array(ccodes, pa.string()),
+        'AMP_CLIENTS_CLIENT': pa.array(np.where(manufacturer, names, None), pa.string()),
+        'SF_PRIMARY_EMPLOYEE_NAME__C': pa.array(_pick(rng, _EMPLOYEES, count), pa.string()),
+        'SF_TF_PRIMARYDISTRIBUTORNAME__C': pa.array(_pick(rng, _DISTRIBUTORS, count), pa.string()),
+        'SF_LARGELEVERAGEOPERATOR__C': pa.array(_pick(rng, _LLO, count), pa.string()),
+        'SF_GEOMARKET_NAME__C': pa.array(np.char.add('Market ', states.astype(str)).astype(object), pa.string()),
+        'SF_GEOZONE_NAME__C': pa.array([zone_of[state] for state in states], pa.string()),
+        'DS_LATITUDE': pa.array(lat, pa.float64(), from_pandas=True),
+        'DS_LONGITUDE': pa.array(lon, pa.float64(), from_pandas=True),
+        'DS_ACCOUNT_TYPE': pa.array(_pick(rng, _ACCOUNT_TYPES, count), pa.string()),
+    })
+    return table, int(amp_ids.max(initial=amp_start))
+
+def _days_before(rng, end, count, span_days):
+    return (np.datetime64(end) - rng.integers(0, span_days, count).astype('timedelta64[D]'))
+
+def _activity_chunk(rng, account_uuid, counts, start_id):
+    total = int(counts.sum())
+    owner = np.repeat(account_uuid, counts)
+    started = _days_before(rng, '2026-09-30', total, 5 * 365)
+    return pa.table({
+        'ID': pa.array(_ids('a0P', start_id, total, 15), pa.string()),
+        'ACCOUNT_OPPERATOR_UUID': pa.array(owner, pa.string()),
+        'TF_ACTIVITYSTARTDATE__C': pa.array(started, pa.date32()),
+        'TF_MEETINGCLOSEDDATEONLY__C': pa.array(started + rng.integers(0, 30, total).astype('timedelta64[D]'), pa.date32()),
+        'TF_ACTIVITYSTATUS__C': pa.array(_pick(rng, _ACTIVITY_STATUS, total), pa.string()),
+        'TF_PRODUCT_NAME__C': pa.array(np.char.add('Product ', rng.integers(1, 5000, total).astype('U4')).astype(object), pa.string()),
+        'TF_PRODUCT_SKU__C': pa.array(np.char.add('SKU', rng.integers(10000, 99999, total).astype('U5')).astype(object), pa.string()),
+        'TF_PRODUCT_PACK__C': pa.array(_pick(rng, np.array(['6/1 GAL', '12/32 OZ', '4/5 LB', '1/50 LB'], dtype=object), total), pa.string()),
+        'TF_PRODUCTCLIENTNAME__C': pa.array(np.char.add('Client ', rng.integers(1, MANUFACTURERS, total).astype('U3')).astype(object), pa.string()),
+        'TF_PRODUCTCATEGORY__C': pa.array(_pick(rng, _CATEGORIES, total), pa.string()),
+        'PIPELINE_ACTIVITY__C': pa.array(_pick(rng, _PIPELINE, total), pa.string()),
+        'PRODUCTSTATUS__C': pa.array(_pick(rng, _PRODUCT_STATUS, total), pa.string()),
+        'QUANTITY_ENTERED__C': pa.array(rng.integers(0, 200, total).astype(np.float64), pa.float64()),
+        'WHAT_ARE_NEXT_STEPS__C': pa.array(_pick(rng, _NEXT_STEPS, total), pa.string()),
+    })
+
+def _purchase_chunk(rng, customers, counts, start_id, products, ccodes):
+    total = int(counts.sum())
+    months = rng.integers(0, 24, total)
+    period = (np.datetime64('2026-09', 'M') - months.astype('timedelta64[M]')).astype('datetime64[D]')
+
+    def amount(null_share):
+        values = np.round(rng.lognormal(6, 1.2, total), 2)
+        return pa.array(np.where(rng.random(total) < null_share, np.nan, values), pa.float64(), from_pandas=True)
+
+    return pa.table({
+        'PURCHASE_UUID': pa.array(_ids('PUR', start_id, total, 12), pa.string()),
+        'AMPCUSTOMER_ID': pa.array(np.repeat(customers, counts), pa.int64()),
+        'CCODE': pa.array(ccodes[rng.integers(0, len(ccodes), total)], pa.string()),
+        'DISTRIBUTOR': pa.array(_pick(rng, _DISTRIBUTORS, total), pa.string()),
+        'ITEM_ID': pa.array(np.char.add('ITM', rng.integers(0, 100000, total).astype('U6')).astype(object), pa.string()),
+        'PRODUCT_UUID': pa.array(_ids('PRD', 0, products, 8)[rng.integers(0, products, total)], pa.string()),
+        'YTD': amount(0.2), 'CYM': amount(0.4),
+        'MAGO_2': amount(0.4), 'MAGO_3': amount(0.4), 'MAGO_4': amount(0.4), 'MAGO_5': amount(0.4), 'MAGO_6': amount(0.4),
+        'LYM': amount(0.4), 'LYTD': amount(0.2),
+        'PERIOD': pa.array(period, pa.date32()),
+        'UOM': pa.array(_pick(rng, _UOM, total), pa.string()),
+    })
+
+def _product_table(rng, products):
+    return pa.table({
+        'PRODUCT_UUID': pa.array(_ids('PRD', 0, products, 8), pa.string()),
+        'SKU': pa.array(np.char.add('SKU', np.arange(products).astype('U8')).astype(object), pa.string()),
+        'PRODUCT_NAME': pa.array(np.char.add(np.char.add(_pick(rng, _CATEGORIES, products).astype(str), ' item '),
+                                             np.arange(products).astype('U8')).astype(object), pa.string()),
+        'AMP_CATEGORY': pa.array(_pick(rng, _CATEGORIES, products), pa.string()),
+        'AMP_SUB_CATEGORY': pa.array(_pick(rng, _SUB_CATEGORIES, products), pa.string()),
+    })
+
+def _history_chunk(rng, account_uuid, counts, start_id):
+    total = int(counts.sum())
+    return pa.table({
+        'HISTORY_ID': pa.array(_ids('HST', start_id, total, 12), pa.string()),
+        'ACCOUNT_ID': pa.array(np.repeat(account_uuid, counts), pa.string()),
+        'EVENT_DATE': pa.array(_days_before(rng, '2026-09-30', total, 8 * 365), pa.date32()),
+        'EVENT_TYPE': pa.array(_pick(rng, _EVENTS, total), pa.string()),
+        'CHANGED_BY': pa.array(_pick(rng, _EMPLOYEES, total), pa.string()),
+    })
+
+def _append(con, table_name, table):
+    con.register('_chunk', table)
+    try:
+        con.execute(f'CREATE TABLE IF NOT EXISTS DWH.{table_name} AS SELECT * FROM _chunk LIMIT 0')
+        con.execute(f'INSERT INTO DWH.{table_name} SELECT * FROM _chunk')
+    finally:
+        con.unregister('_chunk')
+
+def generate(path, accounts, seed=0, log=print):
+    """
+    Write a synthetic warehouse of `accounts` accounts to the DuckDB file `path`
+    (replaced if it exists). Returns: {table: row count}
+    """
+    if not MIN_ACCOUNTS <= accounts <= MAX_ACCOUNTS:
+        raise ValueError(f"accounts must be between {MIN_ACCOUNTS:,} and {MAX_ACCOUNTS:,}")
+    if os.path.exists(path):
+        os.remove(path)
+
+    rng = np.random.default_rng(seed)
+    started = time.perf_counter()
+    con = duckdb.connect(path)
+    try:
+        con.execute('CREATE SCHEMA DWH')
+        con.execute('CREATE SCHEMA C360_META')
+        products = max(1000, accounts // 100)
+        _append(con, 'DIM_PRODUCT', _product_table(rng, products))
+        ccodes = np.char.add('C', np.arange(MANUFACTURERS).astype('U6')).astype(object)
+
+        cities = _cities(rng, accounts)
+        ff_pool = max(1, int(accounts * FF_ID_SHARE / ACCOUNTS_PER_FF_ID))
+        amp_next, activity_next, purchase_next, history_next = 0, 0, 0, 0
+        for start in range(0, accounts, CHUNK_ROWS):
+            count = min(CHUNK_ROWS, accounts - start)
+            chunk, amp_last = _account_chunk(rng, start, count, cities, ff_pool, amp_next)
+            _append(con, 'DIM_ACCOUNT', chunk)
+
+            account_uuid = chunk.column('ACCOUNT_UUID').to_numpy(zero_copy_only=False)
+            has_sf = chunk.column('SF_ACCOUNT18_ID__C').is_valid().to_numpy(zero_copy_only=False)
+            counts = np.where(has_sf, _row_counts(rng, count, ACTIVITY_PER_ACCOUNT), 0)
+            _append(con, 'DIM_PRODUCTACTIVITY', _activity_chunk(rng, account_uuid, counts, activity_next))
+            activity_next += int(counts.sum())
+
+            customers = np.arange(amp_next + 1, amp_last + 1)
+            counts = _row_counts(rng, len(customers), PURCHASES_PER_CUSTOMER)
+            _append(con, 'FACT_AMP_PURCHASE_DATA', _purchase_chunk(rng, customers, counts, purchase_next, products, ccodes))
+            purchase_next += int(counts.sum())
+            amp_next = amp_last
+
+            counts = _row_counts(rng, count, HISTORY_PER_ACCOUNT)
+            _append(con, 'ACCOUNT_HISTORY', _history_chunk(rng, account_uuid, counts, history_next))
+            history_next += int(counts.sum())
+            log(f"  {start + count:>12,} / {accounts:,} accounts  ({time.perf_counter() - started:.1f}s)")
+
+        # Stand-in for INFORMATION_SCHEMA.TABLES.LAST_ALTERED (see local_backend.translate)
+        con.execute("""
+            CREATE TABLE C360_META.TABLES AS
+            SELECT 'DWH' AS TABLE_SCHEMA, UNNEST(?::VARCHAR[]) AS TABLE_NAME, CURRENT_TIMESTAMP::TIMESTAMP AS LAST_ALTERED
+        """, [list(TABLES)])
+        con.execute("""
+            CREATE TABLE C360_META.GENERATOR AS
+            SELECT ?::BIGINT AS ACCOUNTS, ?::BIGINT AS SEED, ?::BIGINT AS SCHEMA_VERSION
+        """, [accounts, seed, SCHEMA_VERSION])
+        rows = {table: con.execute(f'SELECT COUNT(*) FROM DWH.{table}').fetchone()[0] for table in TABLES}
+    finally:
+        con.close()
+    log(f"Wrote {path} in {time.perf_counter() - started:.1f}s: " + ', '.join(f'{t} {n:,}' for t, n in rows.items()))
+    return rows
+
+def generator_settings(path):
+    """
+    Returns: (accounts, seed) a file was generated with, or None if it is missing,
+    foreign or written by an older SCHEMA_VERSION
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        con = duckdb.connect(path, read_only=True)
+        try:
+            accounts, seed, schema = con.execute('SELECT ACCOUNTS, SEED, SCHEMA_VERSION FROM C360_META.GENERATOR').fetchone()
+            return (accounts, seed) if schema == SCHEMA_VERSION else None
+        finally:
+            con.close()
+    except duckdb.Error:
+        return None
+
+def ensure(path, accounts, seed=0, log=print):
+    """Generate `path` unless it already holds this scale and seed"""
+    if generator_settings(path) != (accounts, seed):
+        generate(path, accounts, seed, log)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build a synthetic Customer 360 warehouse for C360_BACKEND=local')
+    parser.add_argument('--accounts', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db', default=os.environ.get('C360_LOCAL_DB', 'c360_local.duckdb'))
+    args = parser.parse_args()
+    generate(args.db, args.accounts, args.seed)
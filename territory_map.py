@@ -0,0 +1,93 @@
+import numpy as np
+import streamlit as st
+from snowflake_connector import source_version, ACCOUNT_TABLES
+from account_search import SEARCH_CACHE_TTL, SearchKey, get_search_map_points, get_search_map_bins
+
+# --- TERRITORY MAP ---
+MAP_POINT_LIMIT = 500   # Up to this many matches are drawn as individual accounts
+MAP_MAX_MARKERS = 1500  # Aggregated maps coarsen their grid until they fit in this many markers
+MAP_MAX_CELL = 8.0      # ...but never beyond cells this wide (degrees)
+MAP_ZOOM = 3.5          # Initial (country-level) zoom - aggregated markers read best here
+ACXION_BLUE = '#003366'
+
+def map_cell_degrees(total_results: int) -> float:
+    """Starting grid cell size for the aggregated map: coarser cells for broader searches"""
+    if total_results <= 20_000:
+        return 0.5
+    return 1.0
+
+def is_aggregated(total_results: int) -> bool:
+    return total_results > MAP_POINT_LIMIT
+
+def _layout(fig):
+    fig.update_layout(
+        map_style="open-street-map",
+        margin={"r": 0, "t": 0, "l": 0, "b": 0}
+    )
+    return fig
+
+def _points_figure(map_data):
+    import plotly.express as px
+
+    fig = px.scatter_map(
+        map_data,
+        lat='LATITUDE',
+        lon='LONGITUDE',
+        hover_name='Name',
+        hover_data={
+            'LATITUDE': False,
+            'LONGITUDE': False,
+            'City': True,
+            'State': True,
+            'Market': True,
+            'Zone': True
+        },
+        zoom=MAP_ZOOM,
+        height=500,
+        color_discrete_sequence=[ACXION_BLUE]
+    )
+    fig.update_traces(marker=dict(size=16, color=ACXION_BLUE))
+    return _layout(fig)
+
+def _bins_figure(bins):
+    import plotly.express as px
+
+    bins = bins.assign(
+        Label=np.where(bins['COUNT'] == 1, bins['Name'].astype(str), bins['COUNT'].astype(str) + " accounts"),
+        # Area grows with the count, but a 10,000-account cell must not cover the map
+        Size=np.log2(bins['COUNT'].to_numpy(dtype=np.float64) + 1)
+    )
+    fig = px.scatter_map(
+        bins,
+        lat='LATITUDE',
+        lon='LONGITUDE',
+        size='Size',
+        size_max=36,
+        hover_name='Label',
+        hover_data={'LATITUDE': False, 'LONGITUDE': False, 'Size': False, 'COUNT': True},
+        zoom=MAP_ZOOM,
+        height=500,
+        color_discrete_sequence=[ACXION_BLUE]
+    )
+    fig.update_traces(marker=dict(opacity=0.75))
+    return _layout(fig)
+
+@st.cache_data(ttl=SEARCH_CACHE_TTL)
+def _territory_figure(key: SearchKey, total_results: int, version=None):
+    if is_aggregated(total_results):
+        cell_degrees = map_cell_degrees(total_results)
+        bins = get_search_map_bins(key, cell_degrees)
+        while len(bins) > MAP_MAX_MARKERS and cell_degrees < MAP_MAX_CELL:
+            cell_degrees *= 2
+            bins = get_search_map_bins(key, cell_degrees)
+        return None if bins.empty else _bins_figure(bins)
+    map_data = get_search_map_points(key)
+    return None if map_data.empty else _points_figure(map_data)
+
+def get_territory_figure(key: SearchKey, total_results: int):
+    """
+    The Territory Map for a search, built once per search (and DIM_ACCOUNT version).
+    Small results show every account; broad ones show one marker per grid cell with its count.
+    Returns: a plotly figure, or None when no match has coordinates
+    """
+    return _territory_figure(key, total_results, source_version(ACCOUNT_TABLES))
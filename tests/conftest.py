@@ -0,0 +1,9 @@
+import logging
+import os
+import sys
+
+# The app modules are flat top-level files in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Cached functions called outside `streamlit run` warn about the missing script context
+logging.disable(logging.WARNING)
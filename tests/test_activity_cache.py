@@ -0,0 +1,82 @@
+import time
+import pandas as pd
+from activity_cache import ActivityFrameCache, ActivityPage
+from freshness import FRESH_MAX_AGE
+
+TTL = 1800
+MAX_STALE = 7200
+
+def page(rows=1):
+    return ActivityPage(pd.DataFrame({'_ROW_ID': [f'r{i}' for i in range(rows)]}), rows)
+
+def cache_with(entry_age, stored_version, max_stale=MAX_STALE):
+    """A cache holding one entry 'a' fetched `entry_age` seconds ago"""
+    cache = ActivityFrameCache(max_age=TTL, max_stale=max_stale)
+    cache._entries[('sf', 'a')] = (page(), time.time() - entry_age, stored_version)
+    return cache
+
+# --- STALE-WHILE-REVALIDATE ---
+def test_untagged_entry_is_fresh_within_ttl():
+    found, missing, refresh = cache_with(TTL - 60, None).get_many('sf', ['a'])
+    assert list(found) == ['a'] and missing == [] and refresh == []
+
+def test_untagged_entry_past_ttl_is_served_stale_and_refreshed():
+    cache = cache_with(TTL + 60, None)
+    found, missing, refresh = cache.get_many('sf', ['a'])
+    assert list(found) == ['a'] and missing == [] and refresh == ['a']
+    # Only one caller claims the refresh
+    assert cache.get_many('sf', ['a'])[2] == []
+
+def test_untagged_entry_past_max_stale_is_a_miss():
+    found, missing, refresh = cache_with(TTL + MAX_STALE + 60, None).get_many('sf', ['a'])
+    assert found == {} and missing == ['a'] and refresh == []
+
+def test_tagged_entry_with_unchanged_version_outlives_the_ttl():
+    found, missing, refresh = cache_with(TTL + 60, 5).get_many('sf', ['a'], version=5)
+    assert list(found) == ['a'] and refresh == []
+
+def test_tagged_entry_just_past_fresh_max_age_is_served_stale():
+    found, missing, refresh = cache_with(FRESH_MAX_AGE + 60, 5).get_many('sf', ['a'], version=5)
+    assert list(found) == ['a'] and missing == [] and refresh == ['a']
+
+def test_tagged_entry_past_max_stale_is_a_miss():
+    found, missing, refresh = cache_with(FRESH_MAX_AGE + MAX_STALE + 60, 5).get_many('sf', ['a'], version=5)
+    assert found == {} and missing == ['a']
+
+def test_tagged_entry_with_changed_version_is_never_served():
+    found, missing, refresh = cache_with(60, 5).get_many('sf', ['a'], version=6)
+    assert found == {} and missing == ['a'] and refresh == []
+
+def test_max_stale_zero_turns_stale_serving_off():
+    found, missing, refresh = cache_with(TTL + 1, None, max_stale=0).get_many('sf', ['a'])
+    assert found == {} and missing == ['a']
+
+# --- EXTEND ---
+def rows(start, count):
+    return pd.DataFrame({'_ROW_ID': [f'r{i}' for i in range(start, start + count)]})
+
+def test_extend_appends_to_the_entry_it_was_given():
+    cache = ActivityFrameCache(max_age=TTL)
+    cache.put_many('sf', {'a': page(2)._replace(total=5)})
+    base = cache.get_many('sf', ['a'])[0]['a']
+    extended = cache.extend('sf', 'a', base, rows(2, 2))
+    assert extended.frame['_ROW_ID'].tolist() == ['r0', 'r1', 'r2', 'r3'] and extended.total == 5
+    assert cache.get_many('sf', ['a'])[0]['a'] is extended
+
+def test_extend_keeps_a_longer_entry_from_another_caller():
+    cache = ActivityFrameCache(max_age=TTL)
+    cache.put_many('sf', {'a': page(2)._replace(total=5)})
+    base = cache.get_many('sf', ['a'])[0]['a']
+    first = cache.extend('sf', 'a', base, rows(2, 2))
+    # A second caller that loaded the same rows from the same base gets the stored entry
+    assert cache.extend('sf', 'a', base, rows(2, 2)) is first
+
+def test_extend_leaves_a_refreshed_entry_alone():
+    cache = ActivityFrameCache(max_age=TTL)
+    cache.put_many('sf', {'a': page(2)._replace(total=5)})
+    base = cache.get_many('sf', ['a'])[0]['a']
+    refreshed = page(1)._replace(total=1)
+    cache.put_many('sf', {'a': refreshed})
+    extended = cache.extend('sf', 'a', base, rows(2, 3), total=5)
+    assert len(extended.frame) == 5 and extended.complete
+    assert cache.get_many('sf', ['a'])[0]['a'] is refreshed
@@ -0,0 +1,46 @@
+import datetime
+import duckdb
+import numpy as np
+import pandas as pd
+from snowflake_connector import ACTIVITY_ROW_ID, _activity_cursor, _keyset_after
+
+ROWS = [
+    ('r1', datetime.date(2026, 3, 1)),
+    ('r2', datetime.date(2026, 3, 1)),
+    ('r3', datetime.date(2026, 2, 1)),
+    ('r4', None),
+    ('r5', None),
+    ('r6', datetime.date(2026, 3, 1)),
+]
+
+def ordered(after=None):
+    """Row IDs of ROWS in keyset order, past `after` when given"""
+    con = duckdb.connect()
+    con.execute("CREATE TABLE t (ID VARCHAR, D DATE)")
+    con.executemany("INSERT INTO t VALUES (?, ?)", ROWS)
+    where, params = ("", []) if after is None else _keyset_after('D', 'ID', after)
+    sql = f"SELECT ID FROM t {'WHERE ' + where if where else ''} ORDER BY D DESC NULLS LAST, ID DESC"
+    return [row[0] for row in con.execute(sql.replace('%s', '?'), params).fetchall()]
+
+def test_keyset_pages_cover_every_row_once():
+    everything = ordered()
+    assert everything == ['r6', 'r2', 'r1', 'r3', 'r5', 'r4']
+    for i, row_id in enumerate(everything):
+        after = (dict(ROWS)[row_id], row_id)
+        assert ordered(after) == everything[i + 1:]
+
+def test_cursor_converts_to_bindable_values():
+    frame = pd.DataFrame({
+        'PERIOD': pd.to_datetime(['2026-03-01', '2026-02-01']),
+        'QTY': np.array([1, 2], dtype=np.int64),
+        ACTIVITY_ROW_ID: ['p2', 'p1'],
+    })
+    value, row_id = _activity_cursor(frame, 'PERIOD')
+    assert value == datetime.datetime(2026, 2, 1) and type(value) is datetime.datetime
+    assert row_id == 'p1'
+    value, _ = _activity_cursor(frame, 'QTY')
+    assert value == 2 and type(value) is int
+
+def test_cursor_of_a_null_sort_value_is_none():
+    frame = pd.DataFrame({'PERIOD': pd.to_datetime(['2026-03-01', None]), ACTIVITY_ROW_ID: [7, 5]})
+    assert _activity_cursor(frame, 'PERIOD') == (None, '5')
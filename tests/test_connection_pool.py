@@ -0,0 +1,130 @@
+import threading
+import time
+import pytest
+from snowflake_connector import SnowflakeConnectionPool
+
+class FakeCursor:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def execute(self, sql, params=None):
+        self._conn.pings += 1
+        if self._conn.broken:
+            raise RuntimeError("session expired")
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.broken = False
+        self.pings = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def is_closed(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+def make_pool(**kwargs):
+    opened = []
+
+    def connect():
+        opened.append(FakeConnection())
+        return opened[-1]
+
+    return SnowflakeConnectionPool(connect, **kwargs), opened
+
+def test_reuses_released_session():
+    pool, opened = make_pool(max_size=2)
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+    assert len(opened) == 1
+
+def test_acquire_times_out_when_every_session_is_busy():
+    pool, _ = make_pool(max_size=1)
+    pool.acquire()
+    started = time.time()
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.2)
+    assert time.time() - started >= 0.2
+
+def test_waiting_acquire_gets_the_released_session():
+    pool, opened = make_pool(max_size=1)
+    conn = pool.acquire()
+    threading.Timer(0.1, pool.release, args=(conn,)).start()
+    assert pool.acquire(timeout=5) is conn
+    assert len(opened) == 1
+
+def test_discarded_session_is_closed_and_replaced():
+    pool, opened = make_pool(max_size=1)
+    conn = pool.acquire()
+    pool.release(conn, discard=True)
+    assert conn.closed
+    assert pool.stats() == {'size': 0, 'in_use': 0, 'idle': 0}
+    assert pool.acquire() is not conn
+    assert len(opened) == 2
+
+def test_failed_ping_discards_long_idle_session():
+    pool, opened = make_pool(max_size=1, validate_after=0)
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.broken = True
+    fresh = pool.acquire()
+    assert fresh is not conn and conn.closed and conn.pings == 1
+    assert pool.stats() == {'size': 1, 'in_use': 1, 'idle': 0}
+
+def test_session_past_max_lifetime_is_recycled():
+    pool, opened = make_pool(max_size=1, max_lifetime=0.05)
+    conn = pool.acquire()
+    pool.release(conn)
+    time.sleep(0.1)
+    assert pool.acquire() is not conn
+    assert conn.closed and len(opened) == 2
+
+def test_ping_does_not_hold_the_pool_lock():
+    pool, _ = make_pool(max_size=2, validate_after=0)
+    conn = pool.acquire()
+    pool.release(conn)
+    pinging, finish = threading.Event(), threading.Event()
+
+    def slow_execute(sql, params=None):
+        pinging.set()
+        finish.wait(5)
+
+    conn.cursor = lambda: type('Cursor', (), {'execute': staticmethod(slow_execute), 'close': lambda self: None})()
+    worker = threading.Thread(target=pool.acquire)
+    worker.start()
+    assert pinging.wait(5)
+    # stats() and a second acquire go ahead while the first acquire is pinging
+    started = time.time()
+    assert pool.stats()['in_use'] == 1
+    other = pool.acquire(timeout=1)
+    assert other is not conn
+    assert time.time() - started < 1
+    finish.set()
+    worker.join(5)
+
+def test_close_all_while_a_session_is_being_opened():
+    started, finish = threading.Event(), threading.Event()
+
+    def slow_connect():
+        started.set()
+        finish.wait(5)
+        return FakeConnection()
+
+    pool = SnowflakeConnectionPool(slow_connect, max_size=1)
+    result = {}
+    worker = threading.Thread(target=lambda: result.setdefault('conn', pool.acquire()))
+    worker.start()
+    assert started.wait(5)
+    pool.close_all()
+    finish.set()
+    worker.join(5)
+    assert isinstance(result['conn'], FakeConnection)
+    assert pool.stats()['size'] == 1
@@ -0,0 +1,25 @@
+import os
+import stat
+import pyarrow as pa
+import pytest
+from disk_cache import DiskResultCache
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+@pytest.mark.skipif(not hasattr(os, 'getuid'), reason="POSIX permissions")
+def test_directory_and_entries_are_private(tmp_path):
+    directory = tmp_path / 'cache'
+    cache = DiskResultCache(str(directory))
+    cache.put('key', pa.table({'ID': [1, 2]}))
+    assert mode(directory) == 0o700
+    assert [mode(entry) for entry in directory.iterdir()] == [0o600]
+    assert cache.get('key', 60).num_rows == 2
+
+@pytest.mark.skipif(not hasattr(os, 'getuid'), reason="POSIX permissions")
+def test_existing_open_directory_is_tightened(tmp_path):
+    directory = tmp_path / 'cache'
+    directory.mkdir()
+    os.chmod(directory, 0o777)
+    DiskResultCache(str(directory))
+    assert mode(directory) == 0o700
@@ -0,0 +1,91 @@
+import threading
+import pyarrow as pa
+import snowflake_connector
+from snowflake_connector import AsyncQueryEngine, SnowflakeConnectionPool, _qmark, bind_id_list
+
+class FakeCursor:
+    def __init__(self, conn):
+        self._conn = conn
+        self.sfqid = None
+
+    def execute(self, sql, params=None):
+        self._conn.statements.append((sql, params))
+
+    def executemany(self, sql, rows):
+        self._conn.statements.append((sql, rows))
+
+    def execute_async(self, sql, params=None):
+        self._conn.statements.append((sql, params))
+        self.sfqid = f"q{len(self._conn.statements)}"
+
+    def get_results_from_sfqid(self, query_id):
+        pass
+
+    def fetch_arrow_batches(self):
+        return iter([pa.table({'ID': [1]})])
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, running):
+        self.statements = []
+        self._running = running
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_query_status_throw_if_error(self, query_id):
+        return query_id
+
+    def is_still_running(self, status):
+        return self._running.is_set()
+
+    def is_closed(self):
+        return False
+
+    def close(self):
+        pass
+
+def test_qmark_leaves_quoted_text_alone():
+    sql = "SELECT '%s' AS \"%s\", X FROM T WHERE A = %s AND B LIKE 'it''s %s' AND C = %s"
+    assert _qmark(sql) == "SELECT '%s' AS \"%s\", X FROM T WHERE A = ? AND B LIKE 'it''s %s' AND C = ?"
+
+def test_id_lists_bind_as_one_parameter():
+    first_sql, first_params = bind_id_list(None, ['A1', 'A2'])
+    second_sql, second_params = bind_id_list(None, ['B1', 'B2', 'B3'])
+    assert first_sql == second_sql
+    assert 'A1' not in first_sql and 'B1' not in second_sql
+    assert first_params == ['["A1", "A2"]'] and second_params == ['["B1", "B2", "B3"]']
+
+def test_large_id_lists_are_staged_with_bound_inserts(monkeypatch):
+    monkeypatch.setattr(snowflake_connector, 'ID_LIST_STAGE_THRESHOLD', 2)
+    conn = FakeConnection(threading.Event())
+    sql, params = bind_id_list(conn, ['A1', 'A2', 'A3'])
+    assert sql == "(SELECT ID FROM C360_ID_LIST_VARCHAR)" and params == []
+    insert_sql, rows = conn.statements[-1]
+    assert insert_sql == "INSERT INTO C360_ID_LIST_VARCHAR (ID) VALUES (?)"
+    assert rows == [('A1',), ('A2',), ('A3',)]
+
+def test_staged_statement_keeps_its_session_until_finished(monkeypatch):
+    monkeypatch.setattr(snowflake_connector, 'ENGINE_POLL_START', 0.01)
+    running = threading.Event()
+    running.set()
+    pool = SnowflakeConnectionPool(lambda: FakeConnection(running), max_size=2)
+    engine = AsyncQueryEngine(pool)
+    submitted = threading.Event()
+
+    def statement(conn):
+        submitted.set()
+        return "SELECT * FROM C360_ID_LIST_VARCHAR WHERE X = %s", [1]
+
+    future = engine.submit(engine.query(statement, as_pandas=False))
+    assert submitted.wait(2)
+    # While the query runs, its session is not back in the pool for someone else to stage on
+    threading.Event().wait(0.1)
+    assert pool.stats()['in_use'] == 1
+    running.clear()
+    assert future.result(2).num_rows == 1
+    assert pool.stats()['in_use'] == 0
+    statements = [sql for conn in pool._idle for sql, _ in conn[0].statements]
+    assert "SELECT * FROM C360_ID_LIST_VARCHAR WHERE X = ?" in statements
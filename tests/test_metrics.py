@@ -0,0 +1,55 @@
+import urllib.request
+import pytest
+import metrics
+import query_trace
+
+class FakeCache:
+    def __init__(self, **stats):
+        self._stats = stats
+
+    def stats(self):
+        return dict(self._stats)
+
+@pytest.fixture
+def caches(monkeypatch):
+    monkeypatch.setattr(query_trace, '_caches', {})
+    return query_trace.register_cache
+
+def test_stale_hits_are_not_counted_twice(caches):
+    caches('activity_frames', FakeCache(entries=3, hits=8, stale_hits=2, misses=2))
+    assert metrics._cache_hit_ratios() == [({'cache': 'activity_frames'}, 0.8)]
+    lookups = {labels['outcome']: value for labels, value in metrics._cache_lookups()}
+    assert lookups == {'hits': 6, 'stale_hits': 2, 'misses': 2}
+
+def test_refinements_count_as_served(caches):
+    caches('search_results', FakeCache(hits=1, refinements=2, misses=1))
+    assert metrics._cache_hit_ratios() == [({'cache': 'search_results'}, 0.75)]
+
+def test_scrape_reads_only_caches_that_exist(caches):
+    assert metrics._cache_stats() == {}
+    assert metrics._cache_hit_ratios() == []
+
+def test_rerun_cut_short_is_finished_by_the_next_one():
+    finished = []
+    query_trace.add_observer(on_rerun=finished.append)
+    try:
+        session = {}
+        first = query_trace.start_rerun('search', session)
+        # st.rerun() ends the script before it reaches first.finish()
+        second = query_trace.start_rerun('search', session)
+        second.finish()
+        query_trace.start_rerun('search', session)
+        assert finished == [first, second]
+    finally:
+        query_trace._rerun_observers.remove(finished.append)
+
+def test_prometheus_endpoint_binds_to_loopback():
+    server = metrics._serve_prometheus(metrics.MetricsRegistry(), metrics.METRICS_HOST, 0)
+    try:
+        host, port = server.server_address
+        assert host == '127.0.0.1'
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics', timeout=5) as response:
+            assert b'c360_rerun_duration_seconds' in response.read()
+    finally:
+        server.shutdown()
+        server.server_close()
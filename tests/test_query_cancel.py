@@ -0,0 +1,121 @@
+import itertools
+import threading
+from contextlib import contextmanager
+import pyarrow as pa
+import pytest
+import query_trace
+import snowflake_connector
+from snowflake_connector import QueryCancelledError, _execute, _fetch_on
+
+class Warehouse:
+    """Statements run until finish() or a cancel; like the connector, results are only waited for on fetch"""
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self.running = {}   # query id -> threading.Event set when it ends
+        self.cancelled = set()
+        self.cancel_sessions = []
+
+    def submit(self):
+        query_id = f'q{next(self._ids)}'
+        self.running[query_id] = threading.Event()
+        return query_id
+
+    def finish(self, query_id):
+        self.running[query_id].set()
+
+    def cancel(self, query_id, conn):
+        self.cancel_sessions.append(conn)
+        self.cancelled.add(query_id)
+        self.running[query_id].set()
+
+class FakeCursor:
+    def __init__(self, conn):
+        self._conn = conn
+        self.sfqid = None
+
+    def execute(self, sql, params=None):
+        assert 'CANCEL' in sql
+        self._conn.warehouse.cancel(params[0], self._conn)
+
+    def execute_async(self, sql, params=None):
+        self.sfqid = self._conn.warehouse.submit()
+
+    def get_results_from_sfqid(self, query_id):
+        pass  # the real connector only hooks the wait into the first fetch
+
+    def fetch_arrow_batches(self):
+        return iter([pa.table({'ID': [1]})])
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, warehouse):
+        self.warehouse = warehouse
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_query_status_throw_if_error(self, query_id):
+        if query_id in self.warehouse.cancelled:
+            raise snowflake_connector._snowflake().errors.ProgrammingError("SQL execution canceled")
+        return 'done' if self.warehouse.running[query_id].is_set() else 'running'
+
+    def is_still_running(self, status):
+        return status == 'running'
+
+@pytest.fixture
+def warehouse(monkeypatch):
+    warehouse = Warehouse()
+    monkeypatch.setattr(snowflake_connector, '_current_session_id', lambda: 's1')
+    monkeypatch.setattr(snowflake_connector, '_inflight', {})
+
+    @contextmanager
+    def pooled_connection():
+        yield FakeConnection(warehouse)
+
+    monkeypatch.setattr(snowflake_connector, 'pooled_connection', pooled_connection)
+    return warehouse
+
+def test_newer_statement_cancels_the_running_one(warehouse):
+    older, newer = FakeConnection(warehouse), FakeConnection(warehouse)
+    outcome = []
+
+    def run_older():
+        try:
+            _execute(older, "SELECT 1", None, cancel_key='search').close()
+            outcome.append('finished')
+        except QueryCancelledError:
+            outcome.append('cancelled')
+
+    thread = threading.Thread(target=run_older)
+    thread.start()
+    while not warehouse.running:
+        threading.Event().wait(0.01)
+    # The older statement is still registered while it runs
+    assert snowflake_connector._inflight == {('s1', 'search'): 'q1'}
+
+    threading.Timer(0.2, warehouse.finish, args=('q2',)).start()
+    _execute(newer, "SELECT 2", None, cancel_key='search').close()
+    thread.join(2)
+    assert outcome == ['cancelled']
+    assert warehouse.cancelled == {'q1'}
+    # Sent on a pooled session, never on the sessions the statements hold
+    assert all(conn not in (older, newer) for conn in warehouse.cancel_sessions)
+    assert snowflake_connector._inflight == {}
+
+def test_finished_statement_is_not_cancelled(warehouse):
+    conn = FakeConnection(warehouse)
+    for query_id in ('q1', 'q2'):
+        threading.Timer(0.1, warehouse.finish, args=(query_id,)).start()
+        _execute(conn, "SELECT 1", None, cancel_key='search').close()
+    snowflake_connector._cancel_executor.submit(lambda: None).result(2)
+    assert warehouse.cancelled == set() and snowflake_connector._inflight == {}
+
+def test_warehouse_time_is_counted_as_execute(warehouse):
+    record = query_trace.QueryRecord('search', "SELECT 1")
+    threading.Timer(0.2, warehouse.finish, args=('q1',)).start()
+    result = _fetch_on(FakeConnection(warehouse), "SELECT 1", None, 'search', False, record)
+    assert result.num_rows == 1
+    assert record.execute_ms >= 150 and record.fetch_ms < 100
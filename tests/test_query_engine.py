@@ -0,0 +1,81 @@
+import threading
+import pyarrow as pa
+import pytest
+import snowflake_connector
+from snowflake_connector import AsyncQueryEngine, SnowflakeConnectionPool
+
+class FakeCursor:
+    def __init__(self, conn):
+        self._conn = conn
+        self.sfqid = None
+
+    def execute_async(self, sql, params=None):
+        self.sfqid = 'q1'
+
+    def get_results_from_sfqid(self, query_id):
+        pass
+
+    def fetch_arrow_batches(self):
+        return iter([pa.table({'ID': [1]})])
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, running):
+        self._running = running
+        self.polls = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_query_status_throw_if_error(self, query_id):
+        self.polls += 1
+        return query_id
+
+    def is_still_running(self, status):
+        return self._running.is_set()
+
+    def is_closed(self):
+        return False
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setattr(snowflake_connector, 'ENGINE_POLL_START', 0.01)
+    monkeypatch.setattr(snowflake_connector, 'ENGINE_POLL_MAX', 0.01)
+    running = threading.Event()
+    running.set()
+    pooled, status = [], []
+
+    def connect_pooled():
+        pooled.append(FakeConnection(running))
+        return pooled[-1]
+
+    def connect_status():
+        status.append(FakeConnection(running))
+        return status[-1]
+
+    pool = SnowflakeConnectionPool(connect_pooled, max_size=2)
+    acquires = []
+    acquire = pool.acquire
+    monkeypatch.setattr(pool, 'acquire', lambda *args: acquires.append(1) or acquire(*args))
+    return AsyncQueryEngine(pool, connect_fn=connect_status), running, pooled, status, acquires
+
+def test_polls_go_through_one_status_session(engine):
+    engine, running, pooled, status, acquires = engine
+    threading.Timer(0.2, running.clear).start()
+    assert engine.run(engine.query("SELECT 1", as_pandas=False), timeout=5).num_rows == 1
+    assert len(status) == 1 and status[0].polls > 2
+    assert sum(conn.polls for conn in pooled) == 0
+    assert len(acquires) == 2  # submit and fetch
+
+def test_timeout_cancels_the_running_statement(engine, monkeypatch):
+    engine, running, *_ = engine
+    cancelled = threading.Event()
+    monkeypatch.setattr(snowflake_connector, 'cancel_query', lambda query_id: cancelled.set())
+    with pytest.raises(TimeoutError):
+        engine.run(engine.query("SELECT 1"), timeout=0.2)
+    assert cancelled.wait(2)
@@ -0,0 +1,24 @@
+import pandas as pd
+from result_transforms import rank_accounts
+
+def _accounts(rows):
+    return pd.DataFrame(rows, columns=['_ROW_ID', 'Name', 'Gamechanger ID', 'AMP Customer ID', 'Firefly ID'])
+
+def test_ranks_by_priority_then_name_then_row_id():
+    df = _accounts([
+        ('r5', 'Oak Grill', None, None, None),          # 4
+        ('r2', 'Blue Cafe', 'G2', None, None),          # 3
+        ('r4', 'Blue Cafe', 'G1', '11', 'F1'),          # 1
+        ('r1', 'Blue Cafe', 'G3', '12', 'F2'),          # 1, same name: row id breaks the tie
+        ('r3', 'Acme Diner', 'G4', '0', 'F3'),          # 3 - AMP ID 0 doesn't count
+        ('r6', 'Acme Diner', 'G5', '13', None),         # 2
+    ])
+    ranked = rank_accounts(df)
+    assert ranked['_ROW_ID'].tolist() == ['r1', 'r4', 'r6', 'r3', 'r2', 'r5']
+    assert ranked['_PRIORITY'].tolist() == [1, 1, 2, 3, 3, 4]
+
+def test_keeps_columns_and_index_of_each_row():
+    df = _accounts([('r1', 'Oak Grill', None, None, None), ('r2', 'Blue Cafe', 'G1', '11', 'F1')])
+    ranked = rank_accounts(df)
+    assert ranked.index.tolist() == [1, 0]
+    assert list(ranked.columns) == list(df.columns) + ['_PRIORITY']
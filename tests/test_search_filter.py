@@ -0,0 +1,18 @@
+import duckdb
+import pytest
+from account_search import SearchKey, _search_filter
+
+NAMES = ['100% Pure Juice', '100 Pure Juice', 'Red_Oak Grill', 'Red Oak Grill', 'Bang! Bistro', 'Bang Bistro']
+
+def matching(term):
+    """Names matched by the server-side name filter for `term`"""
+    con = duckdb.connect()
+    con.execute("CREATE TABLE a (NAME VARCHAR)")
+    con.executemany("INSERT INTO a VALUES (?)", [(name,) for name in NAMES])
+    where_clauses, params = _search_filter(SearchKey(term))
+    sql = f"SELECT NAME FROM a WHERE {' AND '.join(where_clauses)} ORDER BY NAME".replace('a.NAME', 'NAME')
+    return [row[0] for row in con.execute(sql.replace('%s', '?'), params).fetchall()]
+
+@pytest.mark.parametrize('term', ['0% p', 'd_oak', 'g! b', 'pure', '%', '_'])
+def test_name_filter_is_a_literal_substring(term):
+    assert matching(term) == sorted(name for name in NAMES if term in name.lower())